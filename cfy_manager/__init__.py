@@ -12,3 +12,9 @@
 #  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
+
+import sys
+
+if '--startup-profile' in sys.argv:
+    from .startup_profile import enable
+    enable()
@@ -13,23 +13,6 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from .amqp_postgres import AmqpPostgres  # NOQA
-from .cli import Cli  # NOQA
-from .composer import Composer  # NOQA
-from .manager import Manager  # NOQA
-from .manager_ip_setter import ManagerIpSetter  # NOQA
-from .mgmtworker import MgmtWorker  # NOQA
-from .nginx import Nginx  # NOQA
-from .postgresql_server import PostgresqlServer  # NOQA
-from .postgresql_client import PostgresqlClient # NOQA
-from .python import Python  # NOQA
-from .rabbitmq import RabbitMQ  # NOQA
-from .restservice import RestService  # NOQA
-from .sanity import Sanity  # NOQA
-from .stage import Stage  # NOQA
-from .usage_collector import UsageCollector  # NOQA
-from .patch.patch import Patch  # NOQA
-
 from components_factory import ComponentsFactory  # NOQA
 from service_components import SERVICE_COMPONENTS  # NOQA
 from service_components import MANAGER_SERVICE  # NOQA
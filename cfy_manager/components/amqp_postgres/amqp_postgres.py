@@ -17,7 +17,7 @@ from os.path import join
 
 from ..components_constants import LOG_DIR_KEY
 from ..base_component import BaseComponent
-from ..service_names import AMQP_POSTGRES
+from ..service_names import AMQP_POSTGRES, RESTSERVICE
 from ...config import config
 from ...logger import get_logger
 from ...utils.systemd import systemd
@@ -28,6 +28,9 @@ logger = get_logger(AMQP_POSTGRES)
 
 
 class AmqpPostgres(BaseComponent):
+    depends_on = ['RestService']
+    config_sections = [AMQP_POSTGRES, RESTSERVICE]
+    services = ['cloudify-amqp-postgres']
 
     def __init__(self, skip_installation):
         super(AmqpPostgres, self).__init__(skip_installation)
@@ -44,6 +47,10 @@ class AmqpPostgres(BaseComponent):
         systemd.restart(AMQP_POSTGRES)
         systemd.verify_alive(AMQP_POSTGRES)
 
+    def get_rendered_files(self):
+        self._setup_log_dir()
+        return systemd.get_rendered_files(AMQP_POSTGRES)
+
     def install(self):
         pass
 
@@ -15,7 +15,11 @@
 
 from ..components_dependencies import (
     DEPENDENCIES_ERROR_MESSAGES, COMPONENTS_DEPENDENCIES)
-from ...constants import CLOUDIFY_USER, CLOUDIFY_GROUP
+from ...constants import (
+    CLOUDIFY_USER,
+    CLOUDIFY_GROUP,
+    SANITY_MODE_FILE_PATH
+)
 from ...exceptions import ValidationError
 from ...utils.install import RpmPackageHandler
 from ...utils.certificates import use_supplied_certificates
@@ -26,15 +30,41 @@ from ...utils.files import (
     remove_files
 )
 
-SANITY_MODE_FILE_PATH = '/opt/manager/sanity_mode'
-
 
 class BaseComponent(object):
+    # Class names of the components that must finish installing/configuring
+    # before this one starts. Components that aren't part of the current
+    # execution are ignored, so this only needs to list direct dependencies.
+    depends_on = []
+    # Run only after all the other components finished (and, when run in
+    # reverse, before any of them), e.g. to check the whole manager
+    runs_last = False
+    # Config sections the component reads. When none of them changed
+    # since the last configure, `cfy_manager configure --converge` skips it
+    config_sections = []
+    # The systemd services the component restarts when it's configured
+    services = []
+    # Install the component's packages with the yum repos enabled, rather
+    # than only from the local rpms
+    packages_from_repos = False
 
     def __init__(self, skip_installation=False):
         self.logger = get_logger(self.__class__.__name__)
         self.skip_installation = skip_installation
 
+    def get_packages(self):
+        """Return the packages the component needs, as accepted by
+        `yum_install`.
+
+        The packages of all the components are installed together, in a
+        single transaction, after every component's `pre_install` and before
+        any component's `install`.
+        """
+        return []
+
+    def pre_install(self):
+        pass
+
     def install(self):
         pass
 
@@ -47,6 +77,23 @@ class BaseComponent(object):
     def stop(self):
         pass
 
+    def get_rendered_files(self):
+        """Return the contents `configure` would deploy, by destination path.
+
+        Used by `cfy_manager plan` to find out what changed, so it must not
+        change anything, apart from setting values in the config.
+        """
+        return {}
+
+    def reload(self):
+        """Make the component's services load their configuration again.
+
+        Components whose services can do that without a full restart
+        override this.
+        """
+        self.stop()
+        self.start()
+
     def remove(self):
         pass
 
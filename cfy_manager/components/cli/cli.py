@@ -14,7 +14,6 @@
 #  * limitations under the License.
 
 import errno
-import logging
 from os.path import join, expanduser
 from getpass import getuser
 
@@ -22,24 +21,23 @@ from ..components_constants import SOURCES, SECURITY
 from ..base_component import BaseComponent
 from ..service_names import CLI, MANAGER
 from ...config import config
-from ...logger import (get_logger,
-                       set_file_handlers_level,
-                       get_file_handlers_level)
+from ...logger import get_logger, secrets_masked_in_file_logs
 from ...utils import common
 from ...constants import EXTERNAL_CERT_PATH
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 
 logger = get_logger(CLI)
 
 
 class Cli(BaseComponent):
+    depends_on = ['Nginx']
+    config_sections = [CLI, MANAGER]
 
     def __init__(self, skip_installation):
         super(Cli, self).__init__(skip_installation)
 
-    def _install(self):
-        source_url = config[CLI][SOURCES]['cli_source_url']
-        yum_install(source_url)
+    def get_packages(self):
+        return [config[CLI][SOURCES]['cli_source_url']]
 
     def _set_colors(self, is_root):
         """
@@ -78,24 +76,17 @@ class Cli(BaseComponent):
             current_user))
         # we don't want the commands with the password to be printed
         # to log file
-        current_level = get_file_handlers_level()
-        set_file_handlers_level(logging.ERROR)
-        common.run(use_cmd)
-        common.run(set_cmd)
-        self._set_colors(is_root=False)
-
-        if current_user != 'root':
-            logger.info('Setting CLI for the root user...')
-            for cmd in (use_cmd, set_cmd):
-                root_cmd = ['sudo', '-u', 'root'] + cmd
-                common.run(root_cmd)
-            self._set_colors(is_root=True)
-        set_file_handlers_level(current_level)
-
-    def install(self):
-        logger.notice('Installing Cloudify CLI...')
-        self._install()
-        logger.notice('Cloudify CLI successfully installed')
+        with secrets_masked_in_file_logs(password):
+            common.run(use_cmd)
+            common.run(set_cmd)
+            self._set_colors(is_root=False)
+
+            if current_user != 'root':
+                logger.info('Setting CLI for the root user...')
+                for cmd in (use_cmd, set_cmd):
+                    root_cmd = ['sudo', '-u', 'root'] + cmd
+                    common.run(root_cmd)
+                self._set_colors(is_root=True)
 
     def configure(self):
         logger.notice('Configuring Cloudify CLI...')
@@ -13,48 +13,64 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import importlib
 
-from . import (
-    AmqpPostgres,
-    Manager,
-    ManagerIpSetter,
-    Nginx,
-    Python,
-    PostgresqlServer,
-    PostgresqlClient,
-    RabbitMQ,
-    RestService,
-    Stage,
-    Composer,
-    MgmtWorker,
-    Cli,
-    UsageCollector,
-    Patch,
-    Sanity
-)
+from ..exceptions import InputError
+
+# Component name -> the module (relative to this package) and the name of
+# the class that implements it. Modules are only imported when the
+# component is created, so commands only load the components they use.
+COMPONENTS = {
+    "manager": ("manager.manager", "Manager"),
+    "manager_ip_setter": ("manager_ip_setter.manager_ip_setter",
+                          "ManagerIpSetter"),
+    "nginx": ("nginx.nginx", "Nginx"),
+    "python": ("python.python", "Python"),
+    "postgresql_server": ("postgresql_server.postgresql_server",
+                          "PostgresqlServer"),
+    "postgresql_client": ("postgresql_client.postgresql_client",
+                          "PostgresqlClient"),
+    "rabbitmq": ("rabbitmq.rabbitmq", "RabbitMQ"),
+    "restservice": ("restservice.restservice", "RestService"),
+    "amqp_postgres": ("amqp_postgres.amqp_postgres", "AmqpPostgres"),
+    "stage": ("stage.stage", "Stage"),
+    "composer": ("composer.composer", "Composer"),
+    "mgmtworker": ("mgmtworker.mgmtworker", "MgmtWorker"),
+    "cli": ("cli.cli", "Cli"),
+    "usage_collector": ("usage_collector.usage_collector", "UsageCollector"),
+    "patch": ("patch.patch", "Patch"),
+    "sanity": ("sanity.sanity", "Sanity")
+}
+
+# Components that aren't part of cfy_manager can be registered under this
+# entry points group, with the component name as the entry point name
+COMPONENTS_ENTRY_POINTS = 'cloudify_manager.components'
+
+_PACKAGE = __name__.rpartition('.')[0]
 
 
 class ComponentsFactory:
     def __init__(self):
         pass
 
+    @staticmethod
+    def get_component_class(component_name):
+        if component_name in COMPONENTS:
+            module_name, class_name = COMPONENTS[component_name]
+            module = importlib.import_module(
+                '.{0}'.format(module_name), _PACKAGE)
+            return getattr(module, class_name)
+
+        # pkg_resources is slow to import, so it's only used for components
+        # that aren't built in
+        import pkg_resources
+        for entry_point in pkg_resources.iter_entry_points(
+                COMPONENTS_ENTRY_POINTS, component_name):
+            return entry_point.load()
+        raise InputError('Unknown component: {0}'.format(component_name))
+
     @staticmethod
     def create_component(component_name, skip_installation=False):
-        return {
-            "manager": Manager(skip_installation),
-            "manager_ip_setter": ManagerIpSetter(skip_installation),
-            "nginx": Nginx(skip_installation),
-            "python": Python(skip_installation),
-            "postgresql_server": PostgresqlServer(skip_installation),
-            "postgresql_client": PostgresqlClient(skip_installation),
-            "rabbitmq": RabbitMQ(skip_installation),
-            "restservice": RestService(skip_installation),
-            "amqp_postgres": AmqpPostgres(skip_installation),
-            "stage": Stage(skip_installation),
-            "composer": Composer(skip_installation),
-            "mgmtworker": MgmtWorker(skip_installation),
-            "cli": Cli(skip_installation),
-            "usage_collector": UsageCollector(skip_installation),
-            "patch": Patch(skip_installation),
-            "sanity": Sanity(skip_installation)
-        }[component_name]
+        component_class = ComponentsFactory.get_component_class(
+            component_name)
+        return component_class(skip_installation)
@@ -13,13 +13,14 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-import os
 import json
 
 from os.path import join, dirname
+from collections import OrderedDict
 
 from ..components_constants import (
     SOURCES,
+    CONSTANTS,
     SERVICE_USER,
     SERVICE_GROUP,
     SSL_INPUTS,
@@ -34,13 +35,18 @@ from ...constants import BASE_LOG_DIR, CLOUDIFY_USER
 from ...utils import common, files, sudoers
 from ...utils.systemd import systemd
 from ...utils.network import wait_for_port
-from ...utils.logrotate import set_logrotate, remove_logrotate
-from ...utils.users import create_service_user
+from ...utils.logrotate import (
+    set_logrotate,
+    remove_logrotate,
+    render_logrotate
+)
+from ...utils.users import add_user_to_group, create_service_user
 
 logger = get_logger(COMPOSER)
 
 HOME_DIR = join('/opt', 'cloudify-{0}'.format(COMPOSER))
 CONF_DIR = join(HOME_DIR, 'backend', 'conf')
+COMPOSER_CONFIG_PATH = join(CONF_DIR, 'prod.json')
 NODEJS_DIR = join('/opt', 'nodejs')
 LOG_DIR = join(BASE_LOG_DIR, COMPOSER)
 
@@ -50,6 +56,9 @@ COMPOSER_PORT = 3000
 
 
 class Composer(BaseComponent):
+    depends_on = ['RestService']
+    config_sections = [COMPOSER, POSTGRESQL_CLIENT, CONSTANTS, SSL_INPUTS]
+    services = ['cloudify-composer']
 
     def __init__(self, skip_installation):
         super(Composer, self).__init__(skip_installation)
@@ -80,10 +89,13 @@ class Composer(BaseComponent):
         systemd.verify_alive(COMPOSER)
         wait_for_port(COMPOSER_PORT)
 
-    def _start_and_validate_composer(self):
+    def _set_service_config(self):
         # Used in the service template
         config[COMPOSER][SERVICE_USER] = COMPOSER_USER
         config[COMPOSER][SERVICE_GROUP] = COMPOSER_GROUP
+
+    def _start_and_validate_composer(self):
+        self._set_service_config()
         systemd.configure(COMPOSER,
                           user=COMPOSER_USER, group=COMPOSER_GROUP)
 
@@ -107,22 +119,22 @@ class Composer(BaseComponent):
         create_service_user(COMPOSER_USER, COMPOSER_GROUP, HOME_DIR)
         # adding cfyuser to the composer group so that its files are r/w for
         # replication and snapshots
-        common.sudo(['usermod', '-aG', COMPOSER_GROUP, CLOUDIFY_USER])
+        add_user_to_group(CLOUDIFY_USER, COMPOSER_GROUP)
 
         logger.debug('Fixing permissions...')
-        common.chown(COMPOSER_USER, COMPOSER_GROUP, HOME_DIR)
-        common.chown(COMPOSER_USER, COMPOSER_GROUP, LOG_DIR)
+        with common.file_ops_batch():
+            common.chown(COMPOSER_USER, COMPOSER_GROUP, HOME_DIR)
+            common.chown(COMPOSER_USER, COMPOSER_GROUP, LOG_DIR)
 
-        common.chmod('g+w', CONF_DIR)
-        common.chmod('g+w', dirname(CONF_DIR))
-        common.chown(CLOUDIFY_USER, CLOUDIFY_USER, CONF_DIR)
+            common.chmod('g+w', CONF_DIR)
+            common.chmod('g+w', dirname(CONF_DIR))
+            common.chown(CLOUDIFY_USER, CLOUDIFY_USER, CONF_DIR)
 
-    def _update_composer_config(self):
+    def _get_composer_config(self):
         pg_cert_path = 'postgresql_client_cert_path'
         pg_key_path = 'postgresql_client_key_path'
-        config_path = os.path.join(CONF_DIR, 'prod.json')
         # We need to use sudo to read this or we break on configure
-        composer_config = json.loads(files.sudo_read(config_path))
+        composer_config = json.loads(files.sudo_read(COMPOSER_CONFIG_PATH))
 
         if config[SSL_INPUTS]['internal_manager_host']:
             composer_config['managerConfig']['ip'] = \
@@ -150,12 +162,16 @@ class Composer(BaseComponent):
                     sslrootcert=config['constants']['ca_cert_path']
                 )
 
-        content = json.dumps(composer_config, indent=4, sort_keys=True)
+        return json.dumps(composer_config, indent=4, sort_keys=True)
+
+    def _update_composer_config(self):
+        content = self._get_composer_config()
         # Using `write_to_file` because the path belongs to the composer
         # user, so we need to move with sudo
-        files.write_to_file(contents=content, destination=config_path)
-        common.chown(COMPOSER_USER, COMPOSER_GROUP, config_path)
-        common.chmod('640', config_path)
+        files.write_to_file(contents=content,
+                            destination=COMPOSER_CONFIG_PATH)
+        common.chown(COMPOSER_USER, COMPOSER_GROUP, COMPOSER_CONFIG_PATH)
+        common.chmod('640', COMPOSER_CONFIG_PATH)
 
     def _add_snapshot_sudo_command(self):
         sudoers.allow_user_to_sudo_command(
@@ -173,6 +189,16 @@ class Composer(BaseComponent):
         self._add_snapshot_sudo_command()
         self._start_and_validate_composer()
 
+    def get_rendered_files(self):
+        self._set_service_config()
+        rendered = OrderedDict([
+            (COMPOSER_CONFIG_PATH, self._get_composer_config())
+        ])
+        rendered.update(systemd.get_rendered_files(COMPOSER))
+        logrotate_path, logrotate_config = render_logrotate(COMPOSER)
+        rendered[logrotate_path] = logrotate_config
+        return rendered
+
     def install(self):
         if config[COMPOSER]['skip_installation']:
             logger.notice('Skipping Cloudify Composer installation.')
@@ -28,11 +28,9 @@ from ...config import config
 from ...logger import get_logger
 from ...utils import common
 from ...utils.certificates import use_supplied_certificates
-from ...utils.files import (replace_in_file,
-                            remove_files,
-                            touch)
+from ...utils.files import replace_in_file, remove_files
 from ...utils.logrotate import setup_logrotate
-from ...utils.sudoers import add_entry_to_sudoers
+from ...utils import sudoers
 from ...utils.users import create_service_user
 
 CONFIG_PATH = join(constants.COMPONENTS_DIR, MANAGER, CONFIG)
@@ -41,6 +39,8 @@ logger = get_logger(MANAGER)
 
 
 class Manager(BaseComponent):
+    config_sections = [MANAGER, RABBITMQ, SERVICES_TO_INSTALL]
+
     def __init__(self, skip_installation):
         super(Manager, self).__init__(skip_installation)
 
@@ -57,15 +57,14 @@ class Manager(BaseComponent):
         common.mkdir(constants.CLOUDIFY_HOME_DIR)
 
     def _create_sudoers_file_and_disable_sudo_requiretty(self):
-        common.remove(constants.CLOUDIFY_SUDOERS_FILE, ignore_failure=True)
-        touch(constants.CLOUDIFY_SUDOERS_FILE)
-        common.chmod('440', constants.CLOUDIFY_SUDOERS_FILE)
+        # The file is rewritten with only the entries of this run
+        sudoers.reset()
         entry = 'Defaults:{user} !requiretty'\
             .format(user=constants.CLOUDIFY_USER)
         description = 'Disable sudo requiretty for {0}'.format(
             constants.CLOUDIFY_USER
         )
-        add_entry_to_sudoers(entry, description)
+        sudoers.add_entry_to_sudoers(entry, description)
 
     def _get_selinux_state(self):
         try:
@@ -22,7 +22,7 @@ from ...config import config
 from ...logger import get_logger
 from ...utils import common
 from ...utils.systemd import systemd
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 
 
 MANAGER_IP_SETTER_DIR = join('/opt/cloudify', MANAGER_IP_SETTER)
@@ -31,13 +31,14 @@ logger = get_logger(MANAGER_IP_SETTER)
 
 
 class ManagerIpSetter(BaseComponent):
+    depends_on = ['Manager']
+    config_sections = [MANAGER_IP_SETTER, MANAGER]
+
     def __init__(self, skip_installation):
         super(ManagerIpSetter, self).__init__(skip_installation)
 
-    def _install(self):
-        sources = config[MANAGER_IP_SETTER][SOURCES]
-        for source in sources.values():
-            yum_install(source)
+    def get_packages(self):
+        return config[MANAGER_IP_SETTER][SOURCES].values()
 
     def _configure(self):
         if config[MANAGER]['set_manager_ip_on_boot']:
@@ -45,11 +46,6 @@ class ManagerIpSetter(BaseComponent):
         else:
             logger.info('Set manager ip on boot is disabled.')
 
-    def install(self):
-        logger.notice('Installing Manager IP Setter...')
-        self._install()
-        logger.notice('Manager IP Setter successfully installed')
-
     def configure(self):
         logger.notice('Configuring Manager IP Setter...')
         self._configure()
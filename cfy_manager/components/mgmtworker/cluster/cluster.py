@@ -14,7 +14,6 @@
 #  * limitations under the License.
 
 import json
-import requests
 from os.path import join
 
 from ...base_component import BaseComponent
@@ -48,7 +47,6 @@ from ....components.service_components import (
 )
 from ....utils.network import get_auth_headers
 from ....utils.files import write_to_tempfile
-from ....utils.install import yum_install
 from ....utils.network import wait_for_port
 
 REST_HOME_DIR = '/opt/manager'
@@ -63,6 +61,7 @@ SCRIPTS_PATH = join(COMPONENTS_DIR, MGMTWORKER, CLUSTER, SCRIPTS)
 class Cluster(BaseComponent):
     def _generic_cloudify_rest_request(self, host, port, path,
                                        method, data=None):
+        import requests
         url = 'http://{0}:{1}/api/{2}'.format(host, port, path)
         try:
             if method == 'get':
@@ -115,9 +114,14 @@ class Cluster(BaseComponent):
         )
         return result
 
-    def _verify_local_rest_service_alive(self, verify_rest_call=False):
-        # Restarting rest-service to read the new replicated rest-security.conf
-        systemd.restart(RESTSERVICE)
+    def _verify_local_rest_service_alive(self, verify_rest_call=False,
+                                         restart_once=False):
+        if restart_once:
+            systemd.restart_once(RESTSERVICE)
+        else:
+            # Restarting rest-service to read the new replicated
+            # rest-security.conf
+            systemd.restart(RESTSERVICE)
         systemd.verify_alive(RESTSERVICE)
         rest_port = config[RESTSERVICE]['port']
 
@@ -230,15 +234,13 @@ class Cluster(BaseComponent):
         )
         return result
 
-    def _install(self):
-        yum_install(config[PREMIUM][SOURCES]['premium_source_url'])
-
-    def install(self):
-        self._install()
+    def get_packages(self):
+        return [config[PREMIUM][SOURCES]['premium_source_url']]
 
     def configure(self):
-        # Need to restart the RESTSERVICE so flask could import premium
-        self._verify_local_rest_service_alive()
+        # Need to restart the RESTSERVICE so flask could import premium,
+        # unless it was already restarted after premium was installed
+        self._verify_local_rest_service_alive(restart_once=True)
         if _services_coexistence_assertion(MANAGER_SERVICE,
                                            DATABASE_SERVICE) and \
             _services_coexistence_assertion(MANAGER_SERVICE,
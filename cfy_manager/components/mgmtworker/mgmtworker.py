@@ -14,12 +14,14 @@
 #  * limitations under the License.
 
 from os.path import join, dirname
+from collections import OrderedDict
 
 from .cluster.cluster import Cluster
 
 from ..components_constants import (
     SOURCES,
     CONFIG,
+    CONSTANTS,
     HOME_DIR_KEY,
     LOG_DIR_KEY,
     SERVICE_USER,
@@ -27,17 +29,25 @@ from ..components_constants import (
     HOSTNAME
 )
 from ..base_component import BaseComponent
-from ..service_names import MGMTWORKER, CLUSTER, MANAGER, PREMIUM
+from ..service_names import (
+    MGMTWORKER,
+    CLUSTER,
+    MANAGER,
+    PREMIUM,
+    RABBITMQ,
+    RESTSERVICE
+)
 from ...config import config
 from ...logger import get_logger
 from ... import constants as const
 from ...utils import common, sudoers
 from ...utils.files import (
     deploy,
+    render_template,
     get_local_source_path
 )
 from ...utils.systemd import systemd
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 from ...exceptions import FileError
 
 
@@ -46,17 +56,29 @@ MGMTWORKER_VENV = join(HOME_DIR, 'env')
 CLUSTER_SERVICE_QUEUE = 'cluster_service_queue'
 LOG_DIR = join(const.BASE_LOG_DIR, MGMTWORKER)
 CONFIG_PATH = join(const.COMPONENTS_DIR, MGMTWORKER, CONFIG)
+BROKER_CONFIG_PATH = join(HOME_DIR, 'work', 'broker_config.json')
 
 logger = get_logger(MGMTWORKER)
 
 
 class MgmtWorker(BaseComponent):
+    depends_on = ['RestService']
+    config_sections = [
+        MGMTWORKER,
+        MANAGER,
+        RABBITMQ,
+        RESTSERVICE,
+        CLUSTER,
+        PREMIUM,
+        CONSTANTS,
+    ]
+    services = ['cloudify-mgmtworker']
+
     def __init__(self, skip_installation):
         super(MgmtWorker, self).__init__(skip_installation)
 
-    def _install(self):
-        source_url = config[MGMTWORKER][SOURCES]['mgmtworker_source_url']
-        yum_install(source_url)
+    def get_packages(self):
+        packages = [config[MGMTWORKER][SOURCES]['mgmtworker_source_url']]
 
         premium_source_url = config[PREMIUM][SOURCES]['premium_source_url']
         try:
@@ -66,19 +88,22 @@ class MgmtWorker(BaseComponent):
                 'premium package not found in manager resources package')
             logger.notice('premium will not be installed.')
         else:
-            logger.notice('Installing Cloudify Premium...')
+            logger.notice('Cloudify Premium will be installed')
             cluster = Cluster(skip_installation=False)
-            cluster.install()
+            packages.extend(cluster.get_packages())
+        return packages
 
-    def _deploy_mgmtworker_config(self):
+    def _set_config(self):
         config[MGMTWORKER][HOME_DIR_KEY] = HOME_DIR
         config[MGMTWORKER][LOG_DIR_KEY] = LOG_DIR
         config[MGMTWORKER][SERVICE_USER] = const.CLOUDIFY_USER
         config[MGMTWORKER][SERVICE_GROUP] = const.CLOUDIFY_GROUP
-        if config[CLUSTER]['enabled']:
+        if config[CLUSTER].get('enabled'):
             config[MGMTWORKER][CLUSTER_SERVICE_QUEUE] = \
                 'cluster_service_queue_{0}'.format(config[MANAGER][HOSTNAME])
 
+    def _deploy_mgmtworker_config(self):
+        self._set_config()
         self._deploy_broker_config()
         self._deploy_hooks_config()
         self._deploy_admin_token()
@@ -97,19 +122,16 @@ class MgmtWorker(BaseComponent):
         common.run(['sudo', script_path])
 
     def _deploy_broker_config(self):
-        file_name = 'broker_config.json'
-        work_dir = join(HOME_DIR, 'work')
-        broker_config_dst = join(work_dir, file_name)
         deploy(
-            src=join(CONFIG_PATH, file_name),
-            dst=broker_config_dst
+            src=join(CONFIG_PATH, 'broker_config.json'),
+            dst=BROKER_CONFIG_PATH
         )
 
         # The config contains credentials, do not let the world read it
-        common.chmod('440', broker_config_dst)
+        common.chmod('440', BROKER_CONFIG_PATH)
         common.chown(const.CLOUDIFY_USER,
                      const.CLOUDIFY_GROUP,
-                     broker_config_dst)
+                     BROKER_CONFIG_PATH)
 
     def _deploy_hooks_config(self):
         file_name = 'hooks.conf'
@@ -167,10 +189,14 @@ class MgmtWorker(BaseComponent):
         finally:
             self._exit_sanity_mode()
 
-    def install(self):
-        logger.notice('Installing Management Worker...')
-        self._install()
-        logger.notice('Management Worker successfully installed')
+    def get_rendered_files(self):
+        self._set_config()
+        rendered = OrderedDict([(
+            BROKER_CONFIG_PATH,
+            render_template(join(CONFIG_PATH, 'broker_config.json'))
+        )])
+        rendered.update(systemd.get_rendered_files(MGMTWORKER))
+        return rendered
 
     def configure(self):
         logger.notice('Configuring Management Worker...')
@@ -14,11 +14,12 @@
 #  * limitations under the License.
 
 from os.path import join
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 from ..components_constants import (
     SOURCES,
     CONFIG,
+    CONSTANTS,
     PRIVATE_IP,
     PUBLIC_IP,
     SSL_INPUTS,
@@ -26,17 +27,28 @@ from ..components_constants import (
     UNCONFIGURED_INSTALL,
 )
 from ..base_component import BaseComponent
-from ..service_names import NGINX, MANAGER
+from ..service_names import NGINX, MANAGER, RESTSERVICE
 from ... import constants
 from ...config import config
 from ...logger import get_logger
 from ...exceptions import ValidationError
 from ...utils import common
 from ...utils import certificates
+from ...utils.journal import journal
 from ...utils.systemd import systemd
-from ...utils.install import yum_install, yum_remove
-from ...utils.logrotate import set_logrotate, remove_logrotate
-from ...utils.files import remove_files, deploy, copy_notice, remove_notice
+from ...utils.install import yum_remove
+from ...utils.logrotate import (
+    set_logrotate,
+    remove_logrotate,
+    render_logrotate
+)
+from ...utils.files import (
+    remove_files,
+    deploy,
+    render_template,
+    copy_notice,
+    remove_notice
+)
 
 
 LOG_DIR = join(constants.BASE_LOG_DIR, NGINX)
@@ -47,20 +59,29 @@ logger = get_logger(NGINX)
 
 
 class Nginx(BaseComponent):
+    depends_on = ['Manager', 'RabbitMQ']
+    config_sections = [
+        NGINX,
+        MANAGER,
+        RESTSERVICE,
+        CONSTANTS,
+        SSL_INPUTS,
+        'networks',
+    ]
+    services = [NGINX]
+
     def __init__(self, skip_installation):
         super(Nginx, self).__init__(skip_installation)
 
-    def _install(self):
-        nginx_source_url = config[NGINX][SOURCES]['nginx_source_url']
-        yum_install(nginx_source_url)
+    def get_packages(self):
+        return [config[NGINX][SOURCES]['nginx_source_url']]
 
     def _deploy_unit_override(self):
         logger.debug('Creating systemd unit override...')
-        unit_override_path = '/etc/systemd/system/nginx.service.d'
-        common.mkdir(unit_override_path)
+        common.mkdir(UNIT_OVERRIDE_PATH)
         deploy(
             src=join(CONFIG_PATH, 'overrides.conf'),
-            dst=join(unit_override_path, 'overrides.conf')
+            dst=join(UNIT_OVERRIDE_PATH, 'overrides.conf')
         )
 
     def _generate_internal_certs(self):
@@ -90,9 +111,6 @@ class Nginx(BaseComponent):
             sign_key=config[SSL_INPUTS]['external_ca_key_path'],
             sign_key_password=config[SSL_INPUTS]['external_ca_key_password'],
         )
-        # don't store the password in the config file
-        if config[SSL_INPUTS]['external_ca_key_password']:
-            config[SSL_INPUTS]['external_ca_key_password'] = '<removed>'
 
     def _handle_internal_cert(self, has_ca_key):
         """
@@ -132,20 +150,29 @@ class Nginx(BaseComponent):
 
     def _handle_certs(self):
         if config[UNCONFIGURED_INSTALL] or config[CLEAN_DB]:
-            has_ca_key = certificates.handle_ca_cert()
-            self._handle_internal_cert(has_ca_key)
-            self._handle_external_cert()
+            journal.run_step('handle_certs', {
+                'networks': config['networks'],
+                'private_ip': config[MANAGER][PRIVATE_IP],
+                'public_ip': config[MANAGER][PUBLIC_IP],
+                'ssl_inputs': config[SSL_INPUTS],
+            }, self._generate_certs)
+            # don't store the password in the config file
+            if config[SSL_INPUTS]['external_ca_key_password']:
+                config[SSL_INPUTS]['external_ca_key_password'] = '<removed>'
         else:
             logger.info('Skipping certificate handling. '
                         'Pass the `--clean-db` flag in order to recreate '
                         'all certificates')
             return
 
-    def _deploy_nginx_config_files(self):
-        logger.info('Deploying Nginx configuration files...')
-        resource = namedtuple('Resource', 'src dst')
+    def _generate_certs(self):
+        has_ca_key = certificates.handle_ca_cert()
+        self._handle_internal_cert(has_ca_key)
+        self._handle_external_cert()
 
-        resources = [
+    def _get_config_resources(self):
+        resource = namedtuple('Resource', 'src dst')
+        return [
             resource(
                 src=join(CONFIG_PATH, 'http-external-rest-server.cloudify'),
                 dst='/etc/nginx/conf.d/http-external-rest-server.cloudify'
@@ -200,7 +227,9 @@ class Nginx(BaseComponent):
             )
         ]
 
-        for resource in resources:
+    def _deploy_nginx_config_files(self):
+        logger.info('Deploying Nginx configuration files...')
+        for resource in self._get_config_resources():
             deploy(resource.src, resource.dst)
 
         # remove the default configuration which reserves localhost:80 for a
@@ -227,11 +256,11 @@ class Nginx(BaseComponent):
         if output.aggr_stdout.strip() not in {'200', '401'}:
             raise ValidationError('Nginx HTTP check error: {0}'.format(output))
 
-    def _start_and_verify_service(self):
+    def _start_service(self):
         logger.info('Starting NGINX service...')
         systemd.enable(NGINX, append_prefix=False)
-        systemd.restart(NGINX, append_prefix=False)
-        systemd.verify_alive(NGINX, append_prefix=False)
+        # nginx picks up new configuration files and certificates on reload
+        systemd.request_restart(NGINX, append_prefix=False, reload=True)
 
     def _configure(self):
         common.mkdir(LOG_DIR)
@@ -240,12 +269,18 @@ class Nginx(BaseComponent):
         set_logrotate(NGINX)
         self._handle_certs()
         self._deploy_nginx_config_files()
-        self._start_and_verify_service()
+        self._start_service()
 
-    def install(self):
-        logger.notice('Installing NGINX...')
-        self._install()
-        logger.notice('NGINX successfully installed')
+    def get_rendered_files(self):
+        rendered = OrderedDict(
+            (resource.dst, render_template(resource.src))
+            for resource in self._get_config_resources()
+        )
+        rendered[join(UNIT_OVERRIDE_PATH, 'overrides.conf')] = \
+            render_template(join(CONFIG_PATH, 'overrides.conf'))
+        logrotate_path, logrotate_config = render_logrotate(NGINX)
+        rendered[logrotate_path] = logrotate_config
+        return rendered
 
     def configure(self):
         logger.notice('Configuring NGINX...')
@@ -276,3 +311,9 @@ class Nginx(BaseComponent):
         logger.notice('Stopping NGINX...')
         systemd.stop(NGINX, append_prefix=False)
         logger.notice('NGINX successfully stopped')
+
+    def reload(self):
+        logger.notice('Reloading NGINX...')
+        systemd.reload(NGINX, append_prefix=False)
+        systemd.verify_alive(NGINX, append_prefix=False)
+        logger.notice('NGINX successfully reloaded')
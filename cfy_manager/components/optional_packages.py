@@ -13,6 +13,7 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import tempfile
 from os.path import join
 
 from .components_constants import SOURCES, VENV
@@ -24,66 +25,64 @@ from ..config import config
 from ..logger import get_logger
 
 from ..utils import common
-from ..utils.install import pip_install
+from ..utils.install import build_wheels, pip_install_wheels
 from ..utils.files import get_local_source_path
 
 
 logger = get_logger(DEV)
 
+MGMTWORKER_PACKAGES = [
+    'rest_client_source_url',
+    'plugins_common_source_url',
+    'script_plugin_source_url',
+    'agent_source_url'
+]
+REST_PACKAGES = MGMTWORKER_PACKAGES + ['dsl_parser_source_url']
 
-def _install_packages(packages, venv, pip_constraints):
-    sources = config[DEV][SOURCES]
-    # this allows to upgrade modules if necessary.
-    logger.info(
-        'Installing Optional Packages in {0} venv...'.format(venv)
-    )
-
-    for package in packages:
-        if sources[package]:
-            pip_install(sources[package], venv, pip_constraints)
 
+def _get_optional_sources(packages):
+    sources = config[DEV][SOURCES]
+    return [sources[package] for package in packages if sources[package]]
 
-def _install_cloudify_manager_pip_packages(pip_constraints):
-    rest_venv = config[RESTSERVICE][VENV]
-    mgmtworker_venv = config[MGMTWORKER][VENV]
 
+def _extract_cloudify_manager_repo():
+    """Extract the cloudify-manager repository, and return its directory,
+    or None if it wasn't provided
+    """
     cloudify_manager_url = config[DEV][SOURCES]['cloudify_resources_url']
     if not cloudify_manager_url:
-        return
+        return None
 
     logger.info('Downloading cloudify-manager Repository...')
     manager_repo = get_local_source_path(cloudify_manager_url)
 
     logger.info('Extracting Manager Repository...')
-    tmp_dir = common.untar(manager_repo, unique_tmp_dir=True)
-    rest_service_dir = join(tmp_dir, 'rest-service')
-    resources_dir = join(tmp_dir, 'resources', 'rest-service', 'cloudify')
-    workflows_dir = join(tmp_dir, 'workflows')
-
-    logger.info('Installing Management Worker Plugins...')
-    pip_install(workflows_dir, mgmtworker_venv, pip_constraints)
-
-    logger.info('Installing REST Service...')
-    pip_install(rest_service_dir, rest_venv, pip_constraints)
+    return common.untar(manager_repo, unique_tmp_dir=True)
 
-    logger.info('Deploying Required Manager Resources...')
-    common.move(resources_dir, constants.MANAGER_RESOURCES_HOME)
 
-
-def _install_optional_pip_packages(pip_constraints):
-    rest_venv = config[RESTSERVICE][VENV]
-    mgmtworker_venv = config[MGMTWORKER][VENV]
-
-    mgmtworker_packages = [
-        'rest_client_source_url',
-        'plugins_common_source_url',
-        'script_plugin_source_url',
-        'agent_source_url'
-    ]
-    rest_packages = mgmtworker_packages + ['dsl_parser_source_url']
-
-    _install_packages(mgmtworker_packages, mgmtworker_venv, pip_constraints)
-    _install_packages(rest_packages, rest_venv, pip_constraints)
+def _install_pip_packages(venv_sources, pip_constraints):
+    """Build every source once into a wheelhouse, and then install each
+    venv's sources from it with a single pip run, all venvs side by side
+    """
+    all_sources = [source for sources in venv_sources.values()
+                   for source in sources]
+    if not all_sources:
+        return
+    wheelhouse = tempfile.mkdtemp()
+    config.add_temp_path_to_clean(wheelhouse)
+    wheels = build_wheels(all_sources, wheelhouse,
+                          venv=config[RESTSERVICE][VENV],
+                          constraints_file=pip_constraints)
+
+    logger.info('Installing Optional Packages...')
+    common.gather(*[
+        common.call_async(pip_install_wheels,
+                          [wheels[source] for source in sources],
+                          wheelhouse,
+                          venv=venv,
+                          constraints_file=pip_constraints)
+        for venv, sources in venv_sources.items() if sources
+    ])
 
 
 def _get_pip_constraints():
@@ -94,6 +93,24 @@ def _get_pip_constraints():
 
 def run():
     pip_constraints = _get_pip_constraints()
+    rest_venv = config[RESTSERVICE][VENV]
+    mgmtworker_venv = config[MGMTWORKER][VENV]
 
-    _install_optional_pip_packages(pip_constraints)
-    _install_cloudify_manager_pip_packages(pip_constraints)
+    venv_sources = {
+        mgmtworker_venv: _get_optional_sources(MGMTWORKER_PACKAGES),
+        rest_venv: _get_optional_sources(REST_PACKAGES)
+    }
+    manager_repo_dir = _extract_cloudify_manager_repo()
+    if manager_repo_dir:
+        venv_sources[mgmtworker_venv].append(
+            join(manager_repo_dir, 'workflows'))
+        venv_sources[rest_venv].append(
+            join(manager_repo_dir, 'rest-service'))
+
+    _install_pip_packages(venv_sources, pip_constraints)
+
+    if manager_repo_dir:
+        logger.info('Deploying Required Manager Resources...')
+        resources_dir = join(
+            manager_repo_dir, 'resources', 'rest-service', 'cloudify')
+        common.move(resources_dir, constants.MANAGER_RESOURCES_HOME)
@@ -17,20 +17,19 @@ from ...config import config
 from ...logger import get_logger
 from ..components_constants import SOURCES
 from ..base_component import BaseComponent
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 
 logger = get_logger('patch')
 
 
 class Patch(BaseComponent):
+    config_sections = ['patch']
+
     def __init__(self, skip_installation):
         super(Patch, self).__init__(skip_installation)
 
     def remove(self):
         yum_remove('patch')
 
-    def install(self):
-        logger.notice('Installing Patch...')
-        source_url = config['patch'][SOURCES]['patch_source_url']
-        yum_install(source_url)
-        logger.notice('Patch successfully installed')
+    def get_packages(self):
+        return [config['patch'][SOURCES]['patch_source_url']]
@@ -37,7 +37,6 @@ from ...config import config
 from ...logger import get_logger
 from ...utils import common, files
 from ...utils.install import (
-    yum_install,
     yum_remove,
     RpmPackageHandler
 )
@@ -58,18 +57,19 @@ logger = get_logger(POSTGRESQL_CLIENT)
 
 
 class PostgresqlClient(BaseComponent):
+    depends_on = ['Manager', 'Nginx']
+    config_sections = [POSTGRESQL_CLIENT, SSL_INPUTS]
+
     def __init__(self, skip_installation):
         super(PostgresqlClient, self).__init__(skip_installation)
 
-    def _install(self):
+    def get_packages(self):
         sources = config[POSTGRESQL_CLIENT][SOURCES]
-
-        logger.debug('Installing PostgreSQL Client libraries...')
-        yum_install(sources['ps_libs_rpm_url'])
-        yum_install(sources['ps_rpm_url'])
-
-        logger.debug('Installing python libs for PostgreSQL...')
-        yum_install(sources['psycopg2_rpm_url'])
+        return [
+            sources['ps_libs_rpm_url'],
+            sources['ps_rpm_url'],
+            sources['psycopg2_rpm_url']
+        ]
 
     def _create_postgres_group(self):
         logger.notice('Creating postgres group')
@@ -179,11 +179,6 @@ class PostgresqlClient(BaseComponent):
         self._create_postgres_pgpass_files()
         self._configure_ssl()
 
-    def install(self):
-        logger.notice('Installing PostgreSQL Client...')
-        self._install()
-        logger.notice('PostgreSQL successfully installed')
-
     def configure(self):
         logger.notice('Configuring PostgreSQL Client...')
         self._create_postgres_group()
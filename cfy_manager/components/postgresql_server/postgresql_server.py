@@ -17,6 +17,7 @@ import os
 import re
 from tempfile import mkstemp
 from os.path import join, isdir, islink
+from collections import OrderedDict
 
 from ..components_constants import (
     SOURCES,
@@ -35,9 +36,11 @@ from ..service_names import (
 from ... import constants
 from ...config import config
 from ...logger import get_logger
+from ...exceptions import FileError
 from ...utils import common, files
+from ...utils.journal import journal
 from ...utils.systemd import systemd
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 
 POSTGRESQL_SCRIPTS_PATH = join(constants.COMPONENTS_DIR, POSTGRESQL_SERVER,
                                SCRIPTS)
@@ -67,21 +70,22 @@ logger = get_logger(POSTGRESQL_SERVER)
 
 
 class PostgresqlServer(BaseComponent):
+    config_sections = [POSTGRESQL_SERVER, MANAGER, SSL_INPUTS]
+    services = [SYSTEMD_SERVICE_NAME]
+
     def __init__(self, skip_installation):
         super(PostgresqlServer, self).__init__(skip_installation)
 
-    def _install(self):
+    def get_packages(self):
         sources = config[POSTGRESQL_SERVER][SOURCES]
-
-        logger.debug('Installing PostgreSQL Server dependencies...')
-        yum_install(sources['libxslt_rpm_url'])
-
-        logger.debug('Installing PostgreSQL Server...')
-        yum_install(sources['ps_libs_rpm_url'])
-        yum_install(sources['ps_rpm_url'])
-        yum_install(sources['ps_contrib_rpm_url'])
-        yum_install(sources['ps_server_rpm_url'])
-        yum_install(sources['ps_devel_rpm_url'])
+        return [
+            sources['libxslt_rpm_url'],
+            sources['ps_libs_rpm_url'],
+            sources['ps_rpm_url'],
+            sources['ps_contrib_rpm_url'],
+            sources['ps_server_rpm_url'],
+            sources['ps_devel_rpm_url']
+        ]
 
     def _init_postgresql_server(self):
         logger.debug('Initializing PostreSQL Server DATA folder...')
@@ -94,7 +98,6 @@ class PostgresqlServer(BaseComponent):
 
         logger.debug('Installing PostgreSQL Server service...')
         systemd.enable(SYSTEMD_SERVICE_NAME, append_prefix=False)
-        systemd.restart(SYSTEMD_SERVICE_NAME, append_prefix=False)
 
         logger.debug('Setting PostgreSQL Server logs path...')
         ps_95_logs_path = join(PGSQL_LIB_DIR, '9.5', 'data', 'pg_log')
@@ -102,56 +105,55 @@ class PostgresqlServer(BaseComponent):
         if not isdir(ps_95_logs_path) and not islink(join(LOG_DIR, 'pg_log')):
             files.ln(source=ps_95_logs_path, target=LOG_DIR, params='-s')
 
-        logger.info('Starting PostgreSQL Server service...')
-        systemd.restart(SYSTEMD_SERVICE_NAME, append_prefix=False)
-
     def _read_old_file_lines(self, file_path):
-        temp_file_path = files.write_to_tempfile('')
-        common.copy(file_path, temp_file_path)
-        common.chmod('777', temp_file_path)
-        with open(temp_file_path, 'r') as f:
-            lines = f.readlines()
-        return lines
-
-    def _write_new_pgconfig_file(self, lines):
+        content = files.read_deployed(file_path)
+        if content is None:
+            raise FileError('{0} does not exist'.format(file_path))
+        return content.splitlines(True)
+
+    def _get_new_pgconfig(self, lines):
         """
         Recreate the pgconfig file based on listening address and SSL
         """
-        fd, temp_pgconfig_path = mkstemp()
+        new_lines = []
+        for line in lines:
+            if line.startswith('#listen_addresses = \'localhost\''):
+                line = line.replace('#listen_addresses = \'localhost\'',
+                                    'listen_addresses = \'{0}\''
+                                    .format(config[MANAGER][PRIVATE_IP]))
+            if config[POSTGRESQL_SERVER][SSL_ENABLED]:
+                if line.startswith('#ssl = off'):
+                    line = line.replace('#ssl = off', 'ssl = on')
+                if line.startswith('#ssl_ca_file = \'\''):
+                    line = line.replace('#ssl_ca_file = \'\'',
+                                        'ssl_ca_file = \'{0}\''.format(
+                                            PG_CA_CERT_PATH
+                                        ))
+            new_lines.append(line)
+        return ''.join(new_lines)
+
+    def _get_new_hba(self, lines, enable_remote_connections):
+        new_lines = []
+        for line in lines:
+            if line.startswith(('host', 'local')):
+                line = line.replace('ident', 'md5')
+            new_lines.append(line)
+        if not re.search(PG_HBA_LISTEN_ALL_REGEX_PATTERN,
+                         '\n'.join(lines)) and enable_remote_connections:
+            new_lines.append('host all all 0.0.0.0/0 md5\n')
+        if config[POSTGRESQL_SERVER][SSL_ENABLED] and not \
+                re.search(PG_HBA_HOSTSSL_REGEX_PATTERN, '\n'.join(lines)):
+            # This will require the client to supply a certificate as well
+            new_lines.append('hostssl all all 0.0.0.0/0 md5 clientcert=1')
+        return ''.join(new_lines)
+
+    @staticmethod
+    def _write_to_tempfile(content):
+        fd, temp_path = mkstemp()
         os.close(fd)
-        with open(temp_pgconfig_path, 'a') as f:
-            for line in lines:
-                if line.startswith('#listen_addresses = \'localhost\''):
-                    line = line.replace('#listen_addresses = \'localhost\'',
-                                        'listen_addresses = \'{0}\''
-                                        .format(config[MANAGER][PRIVATE_IP]))
-                if config[POSTGRESQL_SERVER][SSL_ENABLED]:
-                    if line.startswith('#ssl = off'):
-                        line = line.replace('#ssl = off', 'ssl = on')
-                    if line.startswith('#ssl_ca_file = \'\''):
-                        line = line.replace('#ssl_ca_file = \'\'',
-                                            'ssl_ca_file = \'{0}\''.format(
-                                                PG_CA_CERT_PATH
-                                            ))
-                f.write(line)
-        return temp_pgconfig_path
-
-    def _write_new_hba_file(self, lines, enable_remote_connections):
-        fd, temp_hba_path = mkstemp()
-        os.close(fd)
-        with open(temp_hba_path, 'a') as f:
-            for line in lines:
-                if line.startswith(('host', 'local')):
-                    line = line.replace('ident', 'md5')
-                f.write(line)
-            if not re.search(PG_HBA_LISTEN_ALL_REGEX_PATTERN,
-                             '\n'.join(lines)) and enable_remote_connections:
-                f.write('host all all 0.0.0.0/0 md5\n')
-            if config[POSTGRESQL_SERVER][SSL_ENABLED] and not \
-                    re.search(PG_HBA_HOSTSSL_REGEX_PATTERN, '\n'.join(lines)):
-                # This will require the client to supply a certificate as well
-                f.write('hostssl all all 0.0.0.0/0 md5 clientcert=1')
-        return temp_hba_path
+        with open(temp_path, 'w') as f:
+            f.write(content)
+        return temp_path
 
     def _configure_ssl(self):
         """
@@ -182,13 +184,14 @@ class PostgresqlServer(BaseComponent):
         logger.debug('Modifying {0}'.format(PG_HBA_CONF))
         common.copy(PG_HBA_CONF, '{0}.backup'.format(PG_HBA_CONF))
         lines = self._read_old_file_lines(PG_HBA_CONF)
-        temp_hba_path = self._write_new_hba_file(lines,
-                                                 enable_remote_connections)
+        temp_hba_path = self._write_to_tempfile(
+            self._get_new_hba(lines, enable_remote_connections))
         common.move(temp_hba_path, PG_HBA_CONF)
         common.chown(POSTGRES_USER, POSTGRES_USER, PG_HBA_CONF)
         if enable_remote_connections:
             lines = self._read_old_file_lines(PG_CONF_PATH)
-            temp_pg_conf_path = self._write_new_pgconfig_file(lines)
+            temp_pg_conf_path = self._write_to_tempfile(
+                self._get_new_pgconfig(lines))
             common.move(temp_pg_conf_path, PG_CONF_PATH)
             common.chown(POSTGRES_USER, POSTGRES_USER, PG_CONF_PATH)
             self._configure_ssl()
@@ -213,20 +216,41 @@ class PostgresqlServer(BaseComponent):
 
     def _configure(self):
         files.copy_notice(POSTGRESQL_SERVER)
-        self._init_postgresql_server()
+        # The password is only used (and then removed from the config)
+        # after the server is initialized
+        init_inputs = dict((key, value) for key, value
+                           in config[POSTGRESQL_SERVER].items()
+                           if key != POSTGRES_PASSWORD)
+        journal.run_step('init_server', init_inputs,
+                         self._init_postgresql_server)
+        # Not part of the step: the server may have been stopped since it
+        # ran (e.g. by `configure --clean-db`), and has to be running either
+        # way for the rest of the configuration
+        logger.info('Starting PostgreSQL Server service...')
+        systemd.start(SYSTEMD_SERVICE_NAME, append_prefix=False)
+        systemd.verify_alive(SYSTEMD_SERVICE_NAME, append_prefix=False)
         enable_remote_connections = \
             config[POSTGRESQL_SERVER][ENABLE_REMOTE_CONNECTIONS]
         self._update_configuration(enable_remote_connections)
         if config[POSTGRESQL_SERVER][POSTGRES_PASSWORD]:
             self._update_postgres_password()
 
-        systemd.restart(SYSTEMD_SERVICE_NAME, append_prefix=False)
-        systemd.verify_alive(SYSTEMD_SERVICE_NAME, append_prefix=False)
+        # Apply the updated configuration
+        systemd.request_restart(SYSTEMD_SERVICE_NAME, append_prefix=False)
 
-    def install(self):
-        logger.notice('Installing PostgreSQL Server...')
-        self._install()
-        logger.notice('PostgreSQL Server successfully installed')
+    def get_rendered_files(self):
+        rendered = OrderedDict()
+        enable_remote_connections = \
+            config[POSTGRESQL_SERVER][ENABLE_REMOTE_CONNECTIONS]
+        hba = files.read_deployed(PG_HBA_CONF)
+        if hba is not None:
+            rendered[PG_HBA_CONF] = self._get_new_hba(
+                hba.splitlines(True), enable_remote_connections)
+        pg_conf = files.read_deployed(PG_CONF_PATH)
+        if enable_remote_connections and pg_conf is not None:
+            rendered[PG_CONF_PATH] = self._get_new_pgconfig(
+                pg_conf.splitlines(True))
+        return rendered
 
     def configure(self):
         logger.notice('Configuring PostgreSQL Server...')
@@ -253,5 +277,11 @@ class PostgresqlServer(BaseComponent):
         systemd.stop(SYSTEMD_SERVICE_NAME, append_prefix=False)
         logger.notice('PostgreSQL Server successfully stopped')
 
+    def reload(self):
+        logger.notice('Reloading PostgreSQL Server...')
+        systemd.reload(SYSTEMD_SERVICE_NAME, append_prefix=False)
+        systemd.verify_alive(SYSTEMD_SERVICE_NAME, append_prefix=False)
+        logger.notice('PostgreSQL Server successfully reloaded')
+
     def validate_dependencies(self):
         super(PostgresqlServer, self).validate_dependencies()
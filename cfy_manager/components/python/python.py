@@ -17,7 +17,7 @@ from ..base_component import BaseComponent
 from ..service_names import PYTHON
 from ...config import config
 from ...logger import get_logger
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 from ...utils.files import copy_notice, remove_notice
 
 
@@ -25,24 +25,20 @@ logger = get_logger(PYTHON)
 
 
 class Python(BaseComponent):
+    config_sections = [PYTHON]
+    packages_from_repos = True
+
     def __init__(self, skip_installation):
         super(Python, self).__init__(skip_installation)
 
-    def _install(self):
+    def get_packages(self):
         if config[PYTHON]['install_python_compilers']:
-            logger.info('Installing Compilers...')
-            yum_install('python-devel', disable_all_repos=False)
-            yum_install('gcc', disable_all_repos=False)
-            yum_install('gcc-c++', disable_all_repos=False)
+            return ['python-devel', 'gcc', 'gcc-c++']
+        return []
 
     def _configure(self):
         copy_notice(PYTHON)
 
-    def install(self):
-        logger.notice('Installing Python dependencies...')
-        self._install()
-        logger.notice('Python dependencies successfully installed')
-
     def configure(self):
         logger.notice('Configuring Python dependencies...')
         self._configure()
@@ -15,6 +15,7 @@
 
 import json
 from os.path import join
+from collections import OrderedDict
 import socket
 import time
 
@@ -32,11 +33,14 @@ from ...utils import certificates, common
 from ...config import config
 from ...logger import get_logger
 from ...exceptions import ValidationError, NetworkError, ClusteringError
+from ...utils.journal import journal
+from ...utils.convergence import convergence
 from ...utils.systemd import systemd
-from ...utils.install import yum_install, yum_remove
+from ...utils.retries import RetryPolicy
+from ...utils.install import yum_remove
 from ...utils.network import wait_for_port, is_port_open
 from ...utils.common import sudo, remove as remove_file
-from ...utils.files import write_to_file, deploy
+from ...utils.files import write_to_file, deploy, render_template
 
 
 LOG_DIR = join(constants.BASE_LOG_DIR, RABBITMQ)
@@ -46,19 +50,30 @@ RABBITMQ_CONFIG_PATH = '/etc/cloudify/rabbitmq/rabbitmq.config'
 SECURE_PORT = 5671
 
 RABBITMQ_CTL = 'rabbitmqctl'
+# While the broker is still booting, rabbitmqctl can't reach the node
+RABBITMQCTL_RETRIES = RetryPolicy(
+    attempts=6,
+    delay=1,
+    max_total_wait=60,
+    retry_on_stderr=[
+        r'unable to (connect to|perform an operation on) node',
+        r'nodedown',
+        r'[Tt]ime(d)? ?out',
+    ]
+)
 logger = get_logger(RABBITMQ)
 
 
 class RabbitMQ(BaseComponent):
+    config_sections = [RABBITMQ, MANAGER, SERVICES_TO_INSTALL, 'networks']
+    services = ['cloudify-rabbitmq']
     component_name = 'rabbitmq'
 
     def __init__(self, skip_installation):
         super(RabbitMQ, self).__init__(skip_installation)
 
-    def _install(self):
-        sources = config[RABBITMQ][SOURCES]
-        for source in sources.values():
-            yum_install(source)
+    def get_packages(self):
+        return config[RABBITMQ][SOURCES].values()
 
     def _installing_manager(self):
         return MANAGER_SERVICE in config[SERVICES_TO_INSTALL]
@@ -69,24 +84,33 @@ class RabbitMQ(BaseComponent):
         common.chown('rabbitmq', 'rabbitmq', RABBITMQ_CONFIG_PATH)
 
     def _init_service(self):
-        logger.info('Initializing RabbitMQ...')
-        rabbit_config_path = join(HOME_DIR, 'rabbitmq.config')
-
         if not self._installing_manager():
             # If we're installing an external rabbit node, management plugin
             # must listen externally
             config[RABBITMQ]['management_only_local'] = False
+        journal.run_step('init_service', config[RABBITMQ], self._reset_service)
+        # Not part of the step: the service may have been stopped since it
+        # ran (e.g. by `configure --clean-db`), and has to be running either
+        # way for the rest of the configuration
+        systemd.start(RABBITMQ)
+        wait_for_port(SECURE_PORT)
+
+    def _reset_service(self):
+        logger.info('Initializing RabbitMQ...')
+        rabbit_config_path = join(HOME_DIR, 'rabbitmq.config')
 
         # Delete old mnesia node
         remove_file('/var/lib/rabbitmq/mnesia')
         remove_file(rabbit_config_path)
+        # The node was wiped, so it has to be restarted even if its
+        # configuration didn't change
+        convergence.mark_changed()
         self._deploy_configuration()
         systemd.systemctl('daemon-reload')
 
         # rabbitmq restart exits with 143 status code that is valid in
         # this case.
         systemd.restart(RABBITMQ, ignore_failure=True)
-        wait_for_port(SECURE_PORT)
 
     def _rabbitmqctl(self, command, **kwargs):
         nodename = config[RABBITMQ]['nodename']
@@ -96,14 +120,17 @@ class RabbitMQ(BaseComponent):
         return sudo(base_command + command, **kwargs)
 
     def user_exists(self, username):
-        output = self._rabbitmqctl(['list_users'], retries=5).aggr_stdout
+        output = self._rabbitmqctl(['list_users'],
+                                   retries=RABBITMQCTL_RETRIES).aggr_stdout
         return username in output
 
     def _delete_guest_user(self):
         if self.user_exists('guest'):
             logger.info('Disabling RabbitMQ guest user...')
-            self._rabbitmqctl(['clear_permissions', 'guest'], retries=5)
-            self._rabbitmqctl(['delete_user', 'guest'], retries=5)
+            self._rabbitmqctl(['clear_permissions', 'guest'],
+                              retries=RABBITMQCTL_RETRIES)
+            self._rabbitmqctl(['delete_user', 'guest'],
+                              retries=RABBITMQCTL_RETRIES)
 
     def _create_rabbitmq_user(self):
         rabbitmq_username = config[RABBITMQ]['username']
@@ -120,7 +147,7 @@ class RabbitMQ(BaseComponent):
                                '.*',
                                '.*',
                                '.*'],
-                              retries=5)
+                              retries=RABBITMQCTL_RETRIES)
             self._rabbitmqctl(['set_user_tags',
                                rabbitmq_username,
                                'administrator'])
@@ -364,14 +391,14 @@ class RabbitMQ(BaseComponent):
 
     def _start_rabbitmq(self):
         logger.info("Starting RabbitMQ Service...")
-        # rabbitmq restart exits with 143 status code that is valid
-        # in this case.
-        systemd.restart(RABBITMQ, ignore_failure=True)
+        # The service was already restarted with the new configuration
+        # when it was initialized, so only make sure it's running
+        systemd.start(RABBITMQ)
         wait_for_port(SECURE_PORT)
         if not config[RABBITMQ]['join_cluster']:
-            # Policies will be obtained from the cluster if we're joining
+            # Policies will be obtained from the cluster if we're joining.
+            # They're applied at runtime, so no restart is needed.
             self._set_policies()
-            systemd.restart(RABBITMQ)
 
     def _validate_rabbitmq_running(self):
         logger.info('Making sure RabbitMQ is live...')
@@ -407,10 +434,13 @@ class RabbitMQ(BaseComponent):
         self._validate_rabbitmq_running()
         self._possibly_join_cluster()
 
-    def install(self):
-        logger.notice('Installing RabbitMQ...')
-        self._install()
-        logger.notice('RabbitMQ successfully installed')
+    def get_rendered_files(self):
+        rendered = OrderedDict([(
+            RABBITMQ_CONFIG_PATH,
+            render_template(join(CONFIG_PATH, 'rabbitmq.config'))
+        )])
+        rendered.update(systemd.get_rendered_files(RABBITMQ))
+        return rendered
 
     def configure(self):
         logger.notice('Configuring RabbitMQ...')
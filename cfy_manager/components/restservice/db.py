@@ -15,9 +15,6 @@
 
 from os.path import join
 
-from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
-
 from .manager_config import make_manager_config
 from ..components_constants import (
     SCRIPTS,
@@ -52,6 +49,9 @@ REST_HOME_DIR = '/opt/manager'
 
 def _connect_to_db(query_func):
     def wrapper(*args, **kwargs):
+        # sqlalchemy is slow to import, and only needed for these queries
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import NullPool
         pg_config = config[POSTGRESQL_CLIENT]
         db_connection_string = \
             'postgres://{user}:{password}@{hostname_and_port}/{db}'.format(
@@ -99,7 +99,7 @@ def _get_provider_context():
     return context
 
 
-def _create_args_dict():
+def create_args_dict():
     """
     Create and return a dictionary with all the information necessary for the
     script that creates and populates the DB to run
@@ -180,7 +180,7 @@ def _run_script(script_name, args_dict=None, configs=None):
 
 def populate_db(configs=None):
     logger.notice('Populating DB and creating AMQP resources...')
-    args_dict = _create_args_dict()
+    args_dict = create_args_dict()
     _run_script('create_tables_and_add_defaults.py', args_dict, configs)
     logger.notice('DB populated and AMQP resources successfully created')
 
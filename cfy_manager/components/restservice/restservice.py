@@ -19,19 +19,21 @@ import json
 import random
 import string
 import subprocess
-import urllib2
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 from os.path import join, exists
 
 from . import db
 from ..components_constants import (
     ACTIVE_MANAGER_IP,
     ADMIN_PASSWORD,
+    AGENT,
     CLEAN_DB,
     CONFIG,
+    CONSTANTS,
     FLASK_SECURITY,
     HOME_DIR_KEY,
     LOG_DIR_KEY,
+    PROVIDER_CONTEXT,
     SCRIPTS,
     SECURITY,
     SOURCES,
@@ -41,6 +43,9 @@ from ..base_component import BaseComponent
 from ..service_names import (
     CLUSTER,
     MANAGER,
+    MGMTWORKER,
+    POSTGRESQL_CLIENT,
+    RABBITMQ,
     RESTSERVICE,
 )
 from ... import constants
@@ -50,15 +55,21 @@ from ...logger import (
 )
 from ...exceptions import BootstrapError, NetworkError, InputError
 from ...utils import common
+from ...utils.journal import journal
 from ...utils.systemd import systemd
-from ...utils.install import yum_install, yum_remove
+from ...utils.install import yum_remove
 from ...utils.network import get_auth_headers, wait_for_port
 from ...utils.files import (
     deploy,
+    render_template,
     write_to_file,
     sudo_read,
 )
-from ...utils.logrotate import set_logrotate, remove_logrotate
+from ...utils.logrotate import (
+    set_logrotate,
+    remove_logrotate,
+    render_logrotate
+)
 
 HOME_DIR = '/opt/manager'
 REST_VENV = join(HOME_DIR, 'env')
@@ -74,6 +85,28 @@ CLOUDIFY_LICENSE_PUBLIC_KEY_PATH = join(HOME_DIR, 'license_key.pem.pub')
 
 
 class RestService(BaseComponent):
+    depends_on = [
+        'Manager',
+        'Nginx',
+        'PostgresqlServer',
+        'PostgresqlClient',
+        'RabbitMQ',
+    ]
+    config_sections = [
+        RESTSERVICE,
+        MANAGER,
+        FLASK_SECURITY,
+        CLUSTER,
+        AGENT,
+        RABBITMQ,
+        POSTGRESQL_CLIENT,
+        PROVIDER_CONTEXT,
+        MGMTWORKER,
+        CONSTANTS,
+        'networks',
+    ]
+    services = ['cloudify-restservice']
+
     def __init__(self, skip_installation=False):
         super(RestService, self).__init__(skip_installation)
 
@@ -83,11 +116,9 @@ class RestService(BaseComponent):
         config[RESTSERVICE][LOG_DIR_KEY] = LOG_DIR
         config[RESTSERVICE][VENV] = REST_VENV
 
-    def _deploy_restservice_files(self):
-        logger.info('Deploying REST authorization, REST Service configuration'
-                    ' and Cloudify licenses public key...')
+    def _get_config_resources(self):
         resource = namedtuple('Resource', 'src dst')
-        resources = [
+        return [
             resource(
                 src=join(CONFIG_PATH, 'cloudify-rest.conf'),
                 dst=REST_CONFIG_PATH
@@ -100,7 +131,11 @@ class RestService(BaseComponent):
                 src=join(CONFIG_PATH, 'license_key.pem.pub'),
                 dst=CLOUDIFY_LICENSE_PUBLIC_KEY_PATH
             )]
-        for resource in resources:
+
+    def _deploy_restservice_files(self):
+        logger.info('Deploying REST authorization, REST Service configuration'
+                    ' and Cloudify licenses public key...')
+        for resource in self._get_config_resources():
             deploy(resource.src, resource.dst)
             common.chown(constants.CLOUDIFY_USER, constants.CLOUDIFY_GROUP,
                          resource.dst)
@@ -198,6 +233,7 @@ class RestService(BaseComponent):
                                                           rest_port)
 
         wait_for_port(rest_port)
+        import urllib2
         req = urllib2.Request(url, headers=get_auth_headers())
 
         try:
@@ -238,8 +274,11 @@ class RestService(BaseComponent):
         if not config[CLUSTER]['active_manager_ip']:
             if result == constants.DB_NOT_INITIALIZED or config[CLEAN_DB]:
                 logger.info('DB not initialized, creating DB...')
-                db.prepare_db()
-                db.populate_db(configs)
+                journal.run_step('create_db', {
+                    'db': config[POSTGRESQL_CLIENT],
+                    'flask_security': config[FLASK_SECURITY],
+                    'args': db.create_args_dict(),
+                }, self._create_db, configs)
                 config[CLUSTER]['enabled'] = True
             elif not config[CLEAN_DB]:
                 # Reinstalling the manager with the old DB
@@ -252,6 +291,10 @@ class RestService(BaseComponent):
         else:
             logger.info('Manager already in DB, ignoring configuration')
 
+    def _create_db(self, configs):
+        db.prepare_db()
+        db.populate_db(configs)
+
     def _generate_password(self, length=12):
         chars = string.ascii_lowercase + string.ascii_uppercase + string.digits
         password = ''.join(random.choice(chars) for _ in range(length))
@@ -262,6 +305,14 @@ class RestService(BaseComponent):
             config[MANAGER][SECURITY][ADMIN_PASSWORD] = \
                 self._generate_password()
 
+    def _generate_secrets(self):
+        self._set_admin_password()
+        self._generate_flask_security_config()
+        return {
+            ADMIN_PASSWORD: config[MANAGER][SECURITY][ADMIN_PASSWORD],
+            FLASK_SECURITY: config[FLASK_SECURITY]
+        }
+
     def _random_alphanumeric(self, result_len=31):
         """
         :return: random string of unique alphanumeric characters
@@ -294,8 +345,16 @@ class RestService(BaseComponent):
     def _configure(self):
         try:
             if config[CLEAN_DB]:
-                self._set_admin_password()
-                self._generate_flask_security_config()
+                # Reuse the secrets of a previous failed run, so the steps
+                # that depend on them don't have to be run again
+                secrets = journal.run_step(
+                    'generate_secrets',
+                    config[MANAGER][SECURITY][ADMIN_PASSWORD],
+                    self._generate_secrets
+                )
+                config[MANAGER][SECURITY][ADMIN_PASSWORD] = \
+                    secrets[ADMIN_PASSWORD]
+                config[FLASK_SECURITY] = secrets[FLASK_SECURITY]
             else:
                 self._validate_admin_password_and_security_config()
             self._make_paths()
@@ -322,12 +381,24 @@ class RestService(BaseComponent):
 
         common.remove('/opt/manager')
 
-    def install(self):
-        logger.notice('Installing Rest Service...')
-        yum_install(config[RESTSERVICE][SOURCES]['restservice_source_url'])
-        yum_install(config[RESTSERVICE][SOURCES]['agents_source_url'])
-
-        logger.notice('Rest Service successfully installed')
+    def get_rendered_files(self):
+        self._make_paths()
+        rendered = OrderedDict(
+            (resource.dst, render_template(resource.src))
+            for resource in self._get_config_resources()
+        )
+        rendered[REST_SECURITY_CONFIG_PATH] = \
+            json.dumps(self._get_flask_security())
+        rendered.update(systemd.get_rendered_files(RESTSERVICE))
+        logrotate_path, logrotate_config = render_logrotate(RESTSERVICE)
+        rendered[logrotate_path] = logrotate_config
+        return rendered
+
+    def get_packages(self):
+        return [
+            config[RESTSERVICE][SOURCES]['restservice_source_url'],
+            config[RESTSERVICE][SOURCES]['agents_source_url']
+        ]
 
     def configure(self):
         logger.notice('Configuring Rest Service...')
@@ -351,3 +422,11 @@ class RestService(BaseComponent):
         logger.notice('Stopping Restservice...')
         systemd.stop(RESTSERVICE)
         logger.notice('Restservice successfully stopped')
+
+    def reload(self):
+        logger.notice('Reloading Restservice...')
+        # gunicorn starts new workers with the new configuration on HUP,
+        # and gracefully shuts down the old ones
+        systemd.reload(RESTSERVICE, signal='HUP')
+        self._verify_restservice_alive()
+        logger.notice('Restservice successfully reloaded')
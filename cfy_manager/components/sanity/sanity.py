@@ -37,6 +37,10 @@ SANITY_WEB_SERVER_PORT = 12774
 
 
 class Sanity(BaseComponent):
+    # The sanity deployment needs the whole manager to be configured
+    runs_last = True
+    config_sections = [SANITY, MANAGER, CLUSTER]
+
     def __init__(self, skip_installation):
         super(Sanity, self).__init__(skip_installation)
         random_postfix = str(uuid.uuid4())
@@ -16,9 +16,11 @@
 import os
 import json
 from os.path import join
+from collections import OrderedDict
 
 from ..components_constants import (
     SOURCES,
+    CONSTANTS,
     SERVICE_USER,
     SERVICE_GROUP,
     HOME_DIR_KEY,
@@ -40,8 +42,12 @@ from ...utils import sudoers
 from ...utils import common, files
 from ...utils.systemd import systemd
 from ...utils.network import wait_for_port
-from ...utils.users import create_service_user
-from ...utils.logrotate import set_logrotate, remove_logrotate
+from ...utils.users import add_user_to_group, create_service_user
+from ...utils.logrotate import (
+    set_logrotate,
+    remove_logrotate,
+    render_logrotate
+)
 
 
 logger = get_logger(STAGE)
@@ -51,6 +57,7 @@ STAGE_GROUP = '{0}_group'.format(STAGE)
 
 HOME_DIR = join('/opt', 'cloudify-{0}'.format(STAGE))
 CONF_DIR = join(HOME_DIR, 'conf')
+APP_CONFIG_PATH = join(CONF_DIR, 'app.json')
 NODEJS_DIR = join('/opt', 'nodejs')
 LOG_DIR = join(BASE_LOG_DIR, STAGE)
 RESOURCES_DIR = join(HOME_DIR, 'resources')
@@ -60,6 +67,16 @@ NODE_EXECUTABLE_PATH = '/usr/bin/node'
 
 
 class Stage(BaseComponent):
+    depends_on = ['RestService']
+    config_sections = [
+        STAGE,
+        MANAGER,
+        POSTGRESQL_CLIENT,
+        CONSTANTS,
+        SSL_INPUTS,
+    ]
+    services = ['cloudify-stage']
+
     def __init__(self, skip_installation):
         super(Stage, self).__init__(skip_installation)
 
@@ -102,13 +119,14 @@ class Stage(BaseComponent):
         create_service_user(STAGE_USER, STAGE_GROUP, HOME_DIR)
 
         # For snapshot restore purposes
-        common.sudo(['usermod', '-aG', STAGE_GROUP, CLOUDIFY_USER])
+        add_user_to_group(CLOUDIFY_USER, STAGE_GROUP)
 
         logger.debug('Fixing permissions...')
-        common.chown(STAGE_USER, STAGE_GROUP, HOME_DIR)
-        common.chown(STAGE_USER, STAGE_GROUP, NODEJS_DIR)
-        common.chown(STAGE_USER, STAGE_GROUP, LOG_DIR)
-        common.chown(CLOUDIFY_USER, CLOUDIFY_GROUP, CONF_DIR)
+        with common.file_ops_batch():
+            common.chown(STAGE_USER, STAGE_GROUP, HOME_DIR)
+            common.chown(STAGE_USER, STAGE_GROUP, NODEJS_DIR)
+            common.chown(STAGE_USER, STAGE_GROUP, LOG_DIR)
+            common.chown(CLOUDIFY_USER, CLOUDIFY_GROUP, CONF_DIR)
 
     def _install_nodejs(self):
         logger.info('Installing NodeJS...')
@@ -124,7 +142,7 @@ class Stage(BaseComponent):
             allow_as=sudo_as,
         )
         common.chmod('a+rx', join(STAGE_RESOURCES, script_name))
-        common.sudo(['usermod', '-aG', CLOUDIFY_GROUP, STAGE_USER])
+        add_user_to_group(STAGE_USER, CLOUDIFY_GROUP)
 
     def _deploy_scripts(self):
         config[STAGE][HOME_DIR_KEY] = HOME_DIR
@@ -146,12 +164,11 @@ class Stage(BaseComponent):
             ],
         )
 
-    def _set_db_url(self):
+    def _get_app_config(self):
         pg_cert_path = 'postgresql_client_cert_path'
         pg_key_path = 'postgresql_client_key_path'
-        config_path = os.path.join(HOME_DIR, 'conf', 'app.json')
         # We need to use sudo to read this or we break on configure
-        stage_config = json.loads(files.sudo_read(config_path))
+        stage_config = json.loads(files.sudo_read(APP_CONFIG_PATH))
 
         host_details = config[POSTGRESQL_CLIENT]['host'].split(':')
         database_host = host_details[0]
@@ -175,13 +192,15 @@ class Stage(BaseComponent):
                     sslrootcert=config['constants']['ca_cert_path']
                 )
 
-        content = json.dumps(stage_config, indent=4, sort_keys=True)
+        return json.dumps(stage_config, indent=4, sort_keys=True)
 
+    def _set_db_url(self):
+        content = self._get_app_config()
         # Using `write_to_file` because the path belongs to the stage user, so
         # we need to move with sudo
-        files.write_to_file(contents=content, destination=config_path)
-        common.chown(STAGE_USER, STAGE_GROUP, config_path)
-        common.chmod('640', config_path)
+        files.write_to_file(contents=content, destination=APP_CONFIG_PATH)
+        common.chown(STAGE_USER, STAGE_GROUP, APP_CONFIG_PATH)
+        common.chmod('640', APP_CONFIG_PATH)
 
     def _set_internal_manager_ip(self):
         config_path = os.path.join(HOME_DIR, 'conf', 'manager.json')
@@ -201,11 +220,14 @@ class Stage(BaseComponent):
         systemd.verify_alive(STAGE)
         wait_for_port(8088)
 
-    def _start_and_validate_stage(self):
-        self._set_community_mode()
+    def _set_service_config(self):
         # Used in the service template
         config[STAGE][SERVICE_USER] = STAGE_USER
         config[STAGE][SERVICE_GROUP] = STAGE_GROUP
+
+    def _start_and_validate_stage(self):
+        self._set_community_mode()
+        self._set_service_config()
         systemd.configure(STAGE,
                           user=STAGE_USER, group=STAGE_GROUP)
 
@@ -232,6 +254,14 @@ class Stage(BaseComponent):
         self._add_snapshot_sudo_command()
         self._start_and_validate_stage()
 
+    def get_rendered_files(self):
+        self._set_service_config()
+        rendered = OrderedDict([(APP_CONFIG_PATH, self._get_app_config())])
+        rendered.update(systemd.get_rendered_files(STAGE))
+        logrotate_path, logrotate_config = render_logrotate(STAGE)
+        rendered[logrotate_path] = logrotate_config
+        return rendered
+
     def install(self):
         if config[STAGE]['skip_installation']:
             logger.info('Skipping Stage installation.')
@@ -269,3 +299,9 @@ class Stage(BaseComponent):
         logger.notice('Stopping Stage...')
         systemd.stop(STAGE)
         logger.notice('Stage successfully stopped')
+
+    def reload(self):
+        logger.notice('Reloading Stage...')
+        systemd.reload(STAGE)
+        self._verify_stage_alive()
+        logger.notice('Stage successfully reloaded')
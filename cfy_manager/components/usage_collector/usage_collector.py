@@ -13,18 +13,17 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from os.path import join
-from random import randint
+from os.path import join, exists
 
 from ... import constants
 from ...config import config
 from ...logger import get_logger
 from ...utils import common, files
-from ...exceptions import InputError
-from ..components_constants import SCRIPTS
+from ...utils.systemd import systemd
+from ...exceptions import InputError, ValidationError
+from ..components_constants import SCRIPTS, CONFIG
 from ..base_component import BaseComponent
 from ..service_names import USAGE_COLLECTOR
-from ...utils.install import RpmPackageHandler
 from ...utils.logrotate import set_logrotate, remove_logrotate
 
 
@@ -37,10 +36,22 @@ COLLECTOR_SCRIPTS = [('collect_cloudify_uptime', HOURS_INTERVAL),
                      ('collect_cloudify_usage', DAYS_INTERVAL)]
 SCRIPTS_DESTINATION_PATH = join('/opt/cloudify', USAGE_COLLECTOR)
 LOG_DIR = join(constants.BASE_LOG_DIR, USAGE_COLLECTOR)
+UNITS_DIR = '/usr/lib/systemd/system'
+UNIT_TEMPLATE = join(constants.COMPONENTS_DIR, USAGE_COLLECTOR, CONFIG,
+                     'cloudify-usage-collector.{0}')
+# The collectors used to run from cfyuser's crontab, see
+# `_remove_legacy_cron_jobs`
+CRONTAB = '/usr/bin/crontab'
+# Every run starts at a random time within this window after it is due, so
+# that the managers don't all report at once
+RANDOMIZED_DELAYS = {HOURS_INTERVAL: '1h', DAYS_INTERVAL: '24h'}
 logger = get_logger(USAGE_COLLECTOR)
 
 
 class UsageCollector(BaseComponent):
+    depends_on = ['Manager']
+    config_sections = [USAGE_COLLECTOR]
+
     def __init__(self, skip_installation):
         super(UsageCollector, self).__init__(skip_installation)
 
@@ -51,36 +62,26 @@ class UsageCollector(BaseComponent):
 
     def configure(self):
         logger.notice('Configuring Usage Collector...')
-        if self._configure():
-            logger.notice('Usage Collector successfully configured')
+        self._configure()
+        logger.notice('Usage Collector successfully configured')
 
     def remove(self):
         logger.notice('Removing Usage Collector...')
-        if self._validate_cronie_installed():
-            self._remove_cron_jobs()
+        self._remove_timers()
+        self._remove_legacy_cron_jobs()
         remove_logrotate(USAGE_COLLECTOR)
         common.remove(SCRIPTS_DESTINATION_PATH)
         common.remove(MANAGER_ID_PATH)
         logger.notice('Usage Collector successfully removed')
 
     def _configure(self):
-        if not self._validate_cronie_installed():
-            return False
         common.mkdir(LOG_DIR)
         common.chown(constants.CLOUDIFY_USER,
                      constants.CLOUDIFY_GROUP,
                      LOG_DIR)
         set_logrotate(USAGE_COLLECTOR)
-        self._remove_cron_jobs()
-        self._create_cron_jobs()
-        return True
-
-    def _validate_cronie_installed(self):
-        if not RpmPackageHandler.is_package_installed('cronie'):
-            logger.warning('Package cronie is not installed,'
-                           'unable to install Usage Collector')
-            return False
-        return True
+        self._remove_legacy_cron_jobs()
+        self._create_timers()
 
     def _deploy_collector_scripts(self):
         logger.info('Deploying Usage Collector scripts...')
@@ -100,61 +101,95 @@ class UsageCollector(BaseComponent):
                          destination_path)
         logger.info('Usage Collector scripts successfully deployed')
 
-    def _create_cron_jobs(self):
-        logger.info('Creating cron jobs for Usage Collector...')
+    @staticmethod
+    def _get_unit_name(collector):
+        return 'cloudify-{0}'.format(collector.replace('_', '-'))
 
+    def _create_timers(self):
+        logger.info('Creating systemd timers for Usage Collector...')
+        active, inactive = [], []
         for collector, interval_type in COLLECTOR_SCRIPTS:
-            active = config[USAGE_COLLECTOR][collector]['active']
-            if active:
+            if config[USAGE_COLLECTOR][collector]['active']:
                 interval = config[USAGE_COLLECTOR][collector][interval_type]
-                self._add_cron_job(collector, interval_type, interval)
+                self._deploy_timer(collector, interval_type, interval)
+                active.append(collector)
             else:
-                logger.notice('Deactivated {} cron job'.format(collector))
-
-        logger.info('Usage Collector cron jobs successfully created')
-
-    def _add_cron_job(self, script_name, interval_type, interval):
-        script_path = join(SCRIPTS_DESTINATION_PATH,
-                           '{}.py'.format(script_name))
-        time_string = self._get_cron_time_string(interval_type, interval)
-
-        # crontab job command
-        job = '{0} {1} {2} # {3}'.format(time_string,
-                                         MANAGER_PYTHON,
-                                         script_path,
-                                         script_name)
-
-        # Adding a new job to crontab
-        # Adding sudo manually, because common.sudo doesn't support parenthesis
-        cmd = '(sudo crontab -u {0} -l 2>/dev/null; echo "{1}") | ' \
-              'sudo crontab -u {0} -'.format(constants.CLOUDIFY_USER, job)
-        common.run([cmd], shell=True)
-
-    def _get_cron_time_string(self, interval_type, interval):
+                logger.notice('Deactivated {} timer'.format(collector))
+                inactive.append(collector)
+
+        self._remove_timers(inactive)
+        systemd.systemctl('daemon-reload')
+        for collector in active:
+            timer = '{0}.timer'.format(self._get_unit_name(collector))
+            systemd.systemctl('enable', timer, options=['--now'])
+            if not systemd.is_enabled(timer, append_prefix=False):
+                raise ValidationError(
+                    'The {0} timer was not enabled'.format(timer))
+        logger.info('Usage Collector timers successfully created')
+
+    def _deploy_timer(self, collector, interval_type, interval):
+        unit_name = self._get_unit_name(collector)
+        context = {
+            'collector': collector,
+            'service_name': unit_name,
+            'service_user': constants.CLOUDIFY_USER,
+            'service_group': constants.CLOUDIFY_GROUP,
+            'python': MANAGER_PYTHON,
+            'script_path': join(SCRIPTS_DESTINATION_PATH,
+                                '{}.py'.format(collector)),
+            'on_calendar': self._get_calendar_spec(interval_type, interval),
+            'randomized_delay': RANDOMIZED_DELAYS[interval_type]
+        }
+        for unit_type in ['service', 'timer']:
+            files.deploy(UNIT_TEMPLATE.format(unit_type),
+                         join(UNITS_DIR,
+                              '{0}.{1}'.format(unit_name, unit_type)),
+                         additional_context=context)
+
+    def _get_calendar_spec(self, interval_type, interval):
+        """Return a systemd OnCalendar expression running every `interval`
+        hours or days, starting from midnight or the 1st of the month
+        """
         if not isinstance(interval, int):
             raise InputError(
                 'The interval between collector runs ({}) must be integer'
                 .format(interval_type)
             )
 
-        random_minute = randint(0, 59)
         if interval_type == HOURS_INTERVAL:
-            return '{0} */{1} * * *'.format(random_minute, interval)
+            return '*-*-* 0/{0}:00:00'.format(interval)
         if interval_type == DAYS_INTERVAL:
-            random_hour = randint(0, 23)
-            return '{0} {1} */{2} * *'.format(random_minute,
-                                              random_hour,
-                                              interval)
-
-    def _remove_cron_jobs(self):
-        logger.info('Removing cron jobs of Usage Collector...')
-        for collector, _ in COLLECTOR_SCRIPTS:
-            self._delete_cron_job(collector)
-        logger.info('Usage Collector cron jobs successfully removed')
-
-    def _delete_cron_job(self, job_comment):
-        cmd = "sudo crontab -u {0} -l | " \
-              "grep -v '# {1}' | " \
-              "sudo crontab -u {0} -" \
-              .format(constants.CLOUDIFY_USER, job_comment)
-        common.run([cmd], shell=True)
+            return '*-*-1/{0} 00:00:00'.format(interval)
+
+    def _remove_timers(self, collectors=None):
+        if collectors is None:
+            collectors = [collector for collector, _ in COLLECTOR_SCRIPTS]
+        for collector in collectors:
+            unit_name = self._get_unit_name(collector)
+            timer_path = join(UNITS_DIR, '{0}.timer'.format(unit_name))
+            if not exists(timer_path):
+                continue
+            logger.info('Removing the {0} timer...'.format(collector))
+            systemd.systemctl('disable', '{0}.timer'.format(unit_name),
+                              ignore_failure=True, options=['--now'])
+            files.remove_files([
+                timer_path, join(UNITS_DIR, '{0}.service'.format(unit_name))])
+
+    def _remove_legacy_cron_jobs(self):
+        """Remove the collectors' crontab entries left by older versions"""
+        if not exists(CRONTAB):
+            return
+        crontab = common.sudo([CRONTAB, '-u', constants.CLOUDIFY_USER, '-l'],
+                              ignore_failures=True)
+        if crontab.returncode != 0:
+            return
+        lines = crontab.aggr_stdout.splitlines(True)
+        tags = ['# {0}'.format(collector)
+                for collector, _ in COLLECTOR_SCRIPTS]
+        kept = [line for line in lines
+                if not any(tag in line for tag in tags)]
+        if len(kept) == len(lines):
+            return
+        logger.info('Removing the Usage Collector cron jobs...')
+        common.sudo([CRONTAB, '-u', constants.CLOUDIFY_USER, '-'],
+                    stdin=''.join(kept))
@@ -17,10 +17,8 @@ import os
 import sys
 import platform
 import subprocess
-import netifaces
 from getpass import getuser
 from collections import namedtuple
-from ipaddress import ip_address
 from distutils.version import LooseVersion
 
 from .components_constants import (
@@ -51,7 +49,7 @@ from ..logger import get_logger
 from ..constants import USER_CONFIG_PATH
 from ..exceptions import ValidationError
 
-from ..utils.common import run, sudo
+from ..utils.common import run, sudo, probe, call_async, gather
 from ..utils.network import is_port_open
 
 logger = get_logger(VALIDATIONS)
@@ -118,6 +116,9 @@ def _validate_ip(ip_to_validate, check_local_interfaces=False):
     :return: Will break in case of error
     """
     logger.info('Validating IP address...')
+    # Only imported here, they are not needed by most commands
+    import netifaces
+    from ipaddress import ip_address
 
     try:
         # ip_address() requires a unicode string
@@ -330,16 +331,25 @@ def check_certificates(component,
                 )
             )
     elif cert_filename and key_filename:
-        _check_ssl_file(key_filename, kind='Key', password=password)
-        _check_ssl_file(cert_filename, kind='Cert')
         key_modulus_command = ['openssl', 'rsa', '-noout', '-modulus',
                                '-in', key_filename]
         if password:
-            key_filename += ['-passin', 'pass:{0}'.format(password)]
+            key_modulus_command += ['-passin', 'pass:{0}'.format(password)]
         cert_modulus_command = ['openssl', 'x509', '-noout', '-modulus',
                                 '-in', cert_filename]
-        key_modulus = sudo(key_modulus_command).aggr_stdout.strip()
-        cert_modulus = sudo(cert_modulus_command).aggr_stdout.strip()
+        # All of these are independent, so run them concurrently. If a
+        # file is invalid, its check's error is the one raised
+        _, _, key_modulus, cert_modulus = gather(
+            call_async(_check_ssl_file, key_filename, kind='Key',
+                       password=password),
+            call_async(_check_ssl_file, cert_filename, kind='Cert'),
+            call_async(probe, key_modulus_command, paths=[key_filename],
+                       use_sudo=True),
+            call_async(probe, cert_modulus_command, paths=[cert_filename],
+                       use_sudo=True),
+        )
+        key_modulus = key_modulus.aggr_stdout.strip()
+        cert_modulus = cert_modulus.aggr_stdout.strip()
         if cert_modulus != key_modulus:
             raise ValidationError('Key {0} ({1}.{2}) does not match the '
                                   'cert {3} ({1}.{4})'
@@ -522,10 +532,13 @@ def validate(components, skip_validations=False, only_install=False):
         _validate_postgres_ssl_certificates_provided()
         _validate_cert_inputs()
 
-    _validate_supported_distros()
-    _validate_openssl_version()
-    _validate_user_has_sudo_permissions()
-    _validate_sufficient_disk_space()
+    # Each of these only shells out and records errors, run them together
+    gather(
+        call_async(_validate_supported_distros),
+        call_async(_validate_openssl_version),
+        call_async(_validate_user_has_sudo_permissions),
+        call_async(_validate_sufficient_disk_space),
+    )
 
     if _errors:
         printable_error = 'Validation error(s):\n' \
@@ -13,17 +13,24 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from ruamel.yaml import YAML
-from ruamel.yaml.error import YAMLError
-from ruamel.yaml.comments import CommentedMap
-
 import collections
+import threading
 from os.path import isfile
 
 from .exceptions import InputError, BootstrapError
 from .constants import USER_CONFIG_PATH, DEFAULT_CONFIG_PATH
 
-yaml = YAML()
+_yaml = None
+
+
+def _get_yaml():
+    # ruamel is only imported once a command actually reads or writes the
+    # configuration, which keeps e.g. `cfy_manager --help` fast
+    global _yaml
+    if _yaml is None:
+        from ruamel.yaml import YAML
+        _yaml = YAML()
+    return _yaml
 
 
 def dict_merge(dct, merge_dct):
@@ -44,8 +51,37 @@ def dict_merge(dct, merge_dct):
             dct[k] = merge_dct[k]
 
 
-class Config(CommentedMap):
+class Config(collections.OrderedDict):
+    """The merged default and user configuration.
+
+    Components may be installed and configured from several threads at once
+    (see `cfy_manager install --jobs`), so every top-level mutation is done
+    under `lock`. Nested sections are owned by the component they belong to;
+    a component that writes to another one's section must declare it in its
+    `depends_on` so the two never run at the same time.
+    """
     TEMP_PATHS = 'temp_paths_to_remove'
+    lock = threading.RLock()
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super(Config, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self.lock:
+            super(Config, self).__delitem__(key)
+
+    def setdefault(self, key, default=None):
+        with self.lock:
+            return super(Config, self).setdefault(key, default)
+
+    def pop(self, key, *args):
+        with self.lock:
+            return super(Config, self).pop(key, *args)
+
+    def update(self, vals):
+        with self.lock:
+            super(Config, self).update(vals)
 
     def _load_defaults_config(self):
         default_config = self._load_yaml(DEFAULT_CONFIG_PATH)
@@ -60,9 +96,10 @@ class Config(CommentedMap):
 
     @staticmethod
     def _load_yaml(path_to_yaml):
+        from ruamel.yaml.error import YAMLError
         with open(path_to_yaml, 'r') as f:
             try:
-                return yaml.load(f)
+                return _get_yaml().load(f)
             except YAMLError as e:
                 raise InputError(
                     'User config file {0} is not a properly formatted '
@@ -70,24 +107,28 @@ class Config(CommentedMap):
                 )
 
     def dump_config(self):
-        self.pop(self.TEMP_PATHS, None)
-        with open(USER_CONFIG_PATH, 'w') as f:
-            try:
-                yaml.dump(CommentedMap(self, relax=True), f)
-            except YAMLError as e:
-                raise BootstrapError(
-                    'Could not dump config to {0}:\n{1}'.format(
-                        USER_CONFIG_PATH, e
+        from ruamel.yaml.error import YAMLError
+        from ruamel.yaml.comments import CommentedMap
+        with self.lock:
+            self.pop(self.TEMP_PATHS, None)
+            with open(USER_CONFIG_PATH, 'w') as f:
+                try:
+                    _get_yaml().dump(CommentedMap(self, relax=True), f)
+                except YAMLError as e:
+                    raise BootstrapError(
+                        'Could not dump config to {0}:\n{1}'.format(
+                            USER_CONFIG_PATH, e
+                        )
                     )
-                )
 
     def load_config(self):
         self._load_defaults_config()
         self._load_user_config()
 
     def add_temp_path_to_clean(self, new_path_to_remove):
-        paths_to_remove = self.setdefault(self.TEMP_PATHS, [])
-        paths_to_remove.append(new_path_to_remove)
+        with self.lock:
+            paths_to_remove = self.setdefault(self.TEMP_PATHS, [])
+            paths_to_remove.append(new_path_to_remove)
 
 
 config = Config()
@@ -29,9 +29,14 @@ SUDOERS_INCLUDE_DIR = '/etc/sudoers.d'
 CLOUDIFY_SUDOERS_FILE = join(SUDOERS_INCLUDE_DIR, CLOUDIFY_USER)
 INITIAL_INSTALL_FILE = join(CLOUDIFY_HOME_DIR, '.installed')
 INITIAL_CONFIGURE_FILE = join(CLOUDIFY_HOME_DIR, '.configured')
+JOURNAL_FILE_PATH = join(CLOUDIFY_HOME_DIR, '.journal')
+CONVERGENCE_STATE_PATH = join(CLOUDIFY_HOME_DIR, '.convergence')
+SOURCES_INDEX_PATH = join(CLOUDIFY_HOME_DIR, '.sources_index')
+SANITY_MODE_FILE_PATH = '/opt/manager/sanity_mode'
 
 BASE_RESOURCES_PATH = '/opt/cloudify'
 CLOUDIFY_SOURCES_PATH = join(BASE_RESOURCES_PATH, 'sources')
+DOWNLOAD_CACHE_PATH = join(CLOUDIFY_SOURCES_PATH, '.cache')
 MANAGER_RESOURCES_HOME = join(REST_HOME_DIR, 'resources')
 AGENT_ARCHIVES_PATH = '{0}/packages/agents'.format(MANAGER_RESOURCES_HOME)
 
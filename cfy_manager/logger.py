@@ -14,6 +14,7 @@
 #  * limitations under the License.
 
 import sys
+from contextlib import contextmanager
 from os import geteuid, getegid
 from os.path import join, isdir
 from subprocess import check_output
@@ -53,6 +54,7 @@ MSG_LEVEL_COLORS = {
 }
 
 FORMAT_MESSAGE = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DIR = join(BASE_LOG_DIR, 'manager')
 
 
 # region notice log level
@@ -100,6 +102,38 @@ def set_file_handlers_level(level):
             handler.setLevel(level)
 
 
+class _MaskSecretsFilter(logging.Filter):
+    def __init__(self, secrets):
+        logging.Filter.__init__(self)
+        self._secrets = [s for s in secrets if s]
+
+    def filter(self, record):
+        message = record.getMessage()
+        for secret in self._secrets:
+            message = message.replace(secret, '*' * 8)
+        record.msg, record.args = message, ()
+        return True
+
+
+@contextmanager
+def secrets_masked_in_file_logs(*secrets):
+    """Replace `secrets` with asterisks in what goes to the log file.
+
+    Unlike lowering the file handlers' level, this doesn't lose the
+    records of other components logging at the same time.
+    """
+    mask = _MaskSecretsFilter(secrets)
+    handlers = [h for h in logging.getLogger().handlers
+                if isinstance(h, logging.FileHandler)]
+    for handler in handlers:
+        handler.addFilter(mask)
+    try:
+        yield
+    finally:
+        for handler in handlers:
+            handler.removeFilter(mask)
+
+
 def _setup_logger():
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
@@ -122,7 +156,7 @@ def setup_console_logger(verbose=False, init=[]):
 
 
 def _create_log_dir():
-    log_dir = join(BASE_LOG_DIR, 'manager')
+    log_dir = LOG_DIR
     if not isdir(log_dir):
         # Need to call subprocess directly, because utils.common depends on the
         # logger, and we'd get a cyclical import
@@ -17,6 +17,8 @@
 import logging
 import os
 import sys
+import Queue
+import threading
 from time import time
 from traceback import format_exception
 
@@ -42,6 +44,7 @@ from .components.components_constants import (
     PUBLIC_IP,
     ADMIN_PASSWORD,
     CLEAN_DB,
+    SOURCES,
     UNCONFIGURED_INSTALL
 )
 from .config import config
@@ -49,6 +52,7 @@ from .encryption.encryption import update_encryption_key
 from .networks.networks import add_networks
 from .exceptions import BootstrapError
 from .constants import INITIAL_CONFIGURE_FILE, INITIAL_INSTALL_FILE
+from .startup_profile import STARTUP_PROFILE_FLAG
 from .logger import (
     get_file_handlers_level,
     get_logger,
@@ -57,7 +61,18 @@ from .logger import (
 )
 from .utils import CFY_UMASK
 from .utils.common import run
+from .utils.journal import journal
+from .utils.profiling import CommandProfiler
+from .utils.tracing import tracer
+from .utils.convergence import convergence
+from .utils.install import install_packages
+from .utils.network import is_url
+from .utils.downloads import download_cache
+from .utils.run_context import running
+from .utils import sudoers
+from .utils.systemd import systemd
 from .utils.files import (
+    read_deployed,
     remove as _remove,
     remove_temp_files,
     touch
@@ -127,8 +142,29 @@ POSTGRES_PASSWORD_HELP_MSG = (
     "Used together with --join-cluster flag when joining to an existing "
     "cluster with an external database."
 )
+JOBS_HELP_MSG = (
+    'The number of components to install/configure at the same time. '
+    'Components are only run concurrently with the ones they do not depend '
+    'on. Defaults to 1, which runs all components one after the other.'
+)
+SERVICES_JOBS_HELP_MSG = (
+    'The number of components to start/stop at the same time. Components '
+    'are started once the ones they depend on are running, and stopped '
+    'once the ones that depend on them are stopped. Defaults to 4.'
+)
+RELOAD_HELP_MSG = (
+    'Make the services load their configuration without a full restart, '
+    'where they support it (e.g. nginx and the REST service). The others, '
+    'such as RabbitMQ, are restarted.'
+)
+CONVERGE_HELP_MSG = (
+    'Only reconfigure the components whose configuration changed since the '
+    'last configure, and only restart services whose files changed. '
+    'Cannot be used together with --clean-db.'
+)
 
 components = []
+DEFAULT_SERVICES_JOBS = 4
 
 
 @argh.decorators.arg('-s', '--sans', help=TEST_CA_GENERATE_SAN_HELP_TEXT,
@@ -318,11 +354,14 @@ def _create_initial_configure_file():
 
 def _finish_configuration(only_install=None):
     remove_temp_files()
+    journal.clear()
     _create_initial_install_file()
     if not only_install:
         _print_finish_message()
         _create_initial_configure_file()
     _print_time()
+    if not only_install:
+        convergence.save(components)
     config.dump_config()
 
 
@@ -385,6 +424,161 @@ def _create_component_objects():
         )
 
 
+def _run_components(method_name, jobs=1, reverse=False):
+    """Call `method_name` on every component that isn't skipped.
+
+    With a single job the components are run one after the other, in
+    installation order. Otherwise each component is started as soon as all
+    of its `depends_on` components have finished, so independent components
+    run side by side in up to `jobs` threads. Components that have
+    `runs_last` wait for all the others.
+    With `reverse`, the order is reversed: components are run after all
+    the components that depend on them have finished (e.g. to stop them).
+    """
+    if jobs <= 1:
+        ordered = reversed(components) if reverse else components
+        for component in ordered:
+            # Checked right before running, because some components set
+            # 'skip' during install if they don't find the install package
+            if not component.skip_installation:
+                _run_component(component, method_name)
+        return
+    _run_components_in_parallel(method_name, jobs, reverse)
+
+
+def _run_component(component, method_name):
+    name = component.__class__.__name__
+    if method_name == 'configure' and convergence.enabled \
+            and convergence.is_unchanged(component):
+        logger.info('{0} is unchanged since the last configure, '
+                    'skipping it'.format(name))
+        return
+    with running(name, method_name), tracer.span(method_name, 'component'):
+        try:
+            getattr(component, method_name)()
+        finally:
+            # Before the services are restarted, and even if a later
+            # component fails
+            sudoers.flush()
+        systemd.apply_restarts()
+
+
+def _run_components_in_parallel(method_name, jobs, reverse=False):
+    component_names = set(c.__class__.__name__ for c in components)
+    pending = list(reversed(components) if reverse else components)
+    finished = set()
+    running = {}
+    failures = []
+    results = Queue.Queue()
+
+    def _run_in_thread(component):
+        try:
+            _run_component(component, method_name)
+        except BaseException:
+            results.put((component, sys.exc_info()))
+        else:
+            results.put((component, None))
+
+    def _dependencies(component):
+        name = component.__class__.__name__
+        if component.runs_last:
+            return component_names - set([name])
+        return set(component.depends_on) & component_names
+
+    def _is_ready(component):
+        if reverse:
+            name = component.__class__.__name__
+            return all(other.__class__.__name__ in finished
+                       for other in components
+                       if name in _dependencies(other))
+        return _dependencies(component) <= finished
+
+    while pending or running:
+        progressed = False
+        # Stop scheduling new components once one of them failed, but let
+        # the ones that are already running finish
+        for component in pending[:] if not failures else []:
+            if not _is_ready(component):
+                continue
+            name = component.__class__.__name__
+            if component.skip_installation:
+                pending.remove(component)
+                finished.add(name)
+                progressed = True
+            elif len(running) < jobs:
+                pending.remove(component)
+                thread = threading.Thread(target=_run_in_thread,
+                                          args=(component,),
+                                          name=name)
+                thread.daemon = True
+                running[name] = thread
+                thread.start()
+                progressed = True
+        if not running:
+            if failures or not pending:
+                break
+            if not progressed:
+                raise BootstrapError(
+                    'Could not resolve the dependencies of: {0}'.format(
+                        ', '.join(c.__class__.__name__ for c in pending)))
+            continue
+        component, exc_info = _wait_for_result(results)
+        name = component.__class__.__name__
+        running.pop(name).join()
+        if exc_info:
+            failures.append(exc_info)
+        else:
+            finished.add(name)
+
+    if failures:
+        type_, value, traceback = failures[0]
+        raise type_, value, traceback
+
+
+def _download_sources():
+    """Fetch the URL sources of all the components at once, rather than
+    one by one as each component needs them
+    """
+    urls = []
+    for component in components:
+        if component.skip_installation:
+            continue
+        for section in component.config_sections:
+            section_config = config.get(section)
+            if not isinstance(section_config, dict):
+                continue
+            sources = section_config.get(SOURCES) or {}
+            urls.extend(source for source in sources.values()
+                        if isinstance(source, basestring) and is_url(source))
+    with tracer.span('download sources', 'packages'):
+        download_cache.prefetch(urls)
+
+
+def _install_packages(jobs=1):
+    """Install the packages of all the components in a single transaction,
+    after their `pre_install` and before their `install`
+    """
+    _run_components('pre_install', jobs)
+    sources = []
+    for component in components:
+        if component.skip_installation:
+            continue
+        disable_all_repos = not component.packages_from_repos
+        sources.extend((source, disable_all_repos)
+                       for source in component.get_packages())
+    with tracer.span('install packages', 'packages'):
+        install_packages(sources)
+
+
+def _wait_for_result(results):
+    # A get() without a timeout can't be interrupted with Ctrl+C
+    while True:
+        try:
+            return results.get(timeout=1)
+        except Queue.Empty:
+            pass
+
+
 def install_args(f):
     """Apply all the args that are used by `cfy_manager install`"""
     args = [
@@ -434,6 +628,7 @@ def sanity_check(verbose=False, private_ip=None):
 
 
 @argh.arg('--only-install', help=ONLY_INSTALL_HELP_MSG, default=False)
+@argh.arg('-j', '--jobs', help=JOBS_HELP_MSG)
 @install_args
 def install(verbose=False,
             private_ip=None,
@@ -443,7 +638,8 @@ def install(verbose=False,
             join_cluster=None,
             database_ip=None,
             postgres_password=None,
-            only_install=None):
+            only_install=None,
+            jobs=1):
     """ Install Cloudify Manager """
 
     _prepare_execution(
@@ -462,23 +658,20 @@ def install(verbose=False,
     validate(components=components, only_install=only_install)
     set_globals(only_install=only_install)
 
-    for component in components:
-        if not component.skip_installation:
-            component.install()
+    _download_sources()
+    _install_packages(jobs)
+    _run_components('install', jobs)
 
     if not only_install:
-        for component in components:
-            # Separate check because some components set 'skip' if they don't
-            # find the install package, and because if we're set to only
-            # install then we shouldn't configure
-            if not component.skip_installation:
-                component.configure()
+        _run_components('configure', jobs)
 
     config[UNCONFIGURED_INSTALL] = only_install
     logger.notice('Installation finished successfully!')
     _finish_configuration(only_install)
 
 
+@argh.arg('-j', '--jobs', help=JOBS_HELP_MSG)
+@argh.arg('--converge', help=CONVERGE_HELP_MSG)
 @install_args
 def configure(verbose=False,
               private_ip=None,
@@ -487,9 +680,17 @@ def configure(verbose=False,
               clean_db=False,
               join_cluster=None,
               database_ip=None,
-              postgres_password=None):
+              postgres_password=None,
+              jobs=1,
+              converge=False):
     """ Configure Cloudify Manager """
 
+    if converge and clean_db:
+        raise BootstrapError(
+            '--converge cannot be used together with --clean-db'
+        )
+    convergence.enabled = converge
+
     _prepare_execution(
         verbose,
         private_ip,
@@ -509,15 +710,54 @@ def configure(verbose=False,
             if not component.skip_installation:
                 component.stop()
 
-    for component in components:
-        if not component.skip_installation:
-            component.configure()
+    _run_components('configure', jobs)
 
     config[UNCONFIGURED_INSTALL] = False
     logger.notice('Configuration finished successfully!')
     _finish_configuration()
 
 
+def plan(verbose=False):
+    """ Show what `cfy_manager configure` would change, without changing
+    anything """
+
+    _prepare_execution(verbose)
+    _validate_manager_prepared('plan')
+    set_globals()
+    logger.notice('Comparing the configuration with the deployed files...')
+
+    to_configure = []
+    for component in components:
+        if component.skip_installation:
+            continue
+        name = component.__class__.__name__
+        with running(name, 'plan'):
+            rendered = component.get_rendered_files()
+        changed_files = [path for path, content in rendered.items()
+                         if read_deployed(path) != content]
+        changes = ['{0} would change'.format(path) for path in changed_files]
+        if not convergence.is_unchanged(component):
+            changes.insert(0, 'Its configuration changed since the last '
+                              'configure')
+        if not changes:
+            continue
+        to_configure.append(name)
+        logger.notice('{0} would be configured:'.format(name))
+        for change in changes:
+            logger.info('  {0}'.format(change))
+        if changed_files and component.services:
+            logger.info('  Services to restart: {0}'.format(
+                ', '.join(component.services)))
+
+    if to_configure:
+        logger.notice('`cfy_manager configure` would configure: {0}'.format(
+            ', '.join(to_configure)))
+    else:
+        logger.notice('The deployed files match the configuration, '
+                      'nothing to configure')
+    _print_time()
+
+
 def remove(verbose=False, force=False):
     """ Uninstall Cloudify Manager """
 
@@ -538,47 +778,62 @@ def remove(verbose=False, force=False):
     if _is_manager_configured():
         _remove(INITIAL_CONFIGURE_FILE)
 
+    journal.clear()
+
     logger.notice('Cloudify Manager successfully removed!')
     _print_time()
 
 
-def start(verbose=False):
+def _start_components(jobs):
+    logger.notice('Starting Cloudify Manager services...')
+    _run_components('start', jobs)
+    logger.notice('Cloudify Manager services successfully started!')
+
+
+def _stop_components(jobs):
+    logger.notice('Stopping Cloudify Manager services...')
+    _run_components('stop', jobs, reverse=True)
+    logger.notice('Cloudify Manager services successfully stopped!')
+
+
+@argh.arg('-j', '--jobs', help=SERVICES_JOBS_HELP_MSG)
+def start(verbose=False, jobs=DEFAULT_SERVICES_JOBS):
     """ Start Cloudify Manager services """
 
     _prepare_execution(verbose)
     _validate_manager_prepared('start')
-    logger.notice('Starting Cloudify Manager services...')
-    for component in components:
-        if not component.skip_installation:
-            component.start()
-    logger.notice('Cloudify Manager services successfully started!')
+    _start_components(jobs)
     _print_time()
 
 
-def stop(verbose=False, force=False):
+@argh.arg('-j', '--jobs', help=SERVICES_JOBS_HELP_MSG)
+def stop(verbose=False, force=False, jobs=DEFAULT_SERVICES_JOBS):
     """ Stop Cloudify Manager services """
 
     _prepare_execution(verbose)
     _validate_manager_prepared('stop')
     _validate_force(force, 'stop')
-
-    logger.notice('Stopping Cloudify Manager services...')
-    for component in components:
-        if not component.skip_installation:
-            component.stop()
-    logger.notice('Cloudify Manager services successfully stopped!')
+    _stop_components(jobs)
     _print_time()
 
 
-def restart(verbose=False, force=False):
+@argh.arg('-j', '--jobs', help=SERVICES_JOBS_HELP_MSG)
+@argh.arg('--reload', help=RELOAD_HELP_MSG)
+def restart(verbose=False, force=False, jobs=DEFAULT_SERVICES_JOBS,
+            reload=False):
     """ Restart Cloudify Manager services """
 
     _prepare_execution(verbose)
     _validate_manager_prepared('restart')
     _validate_force(force, 'restart')
 
-    stop(verbose, force)
-    start(verbose)
+    if reload:
+        logger.notice('Reloading Cloudify Manager services...')
+        _run_components('reload', jobs)
+        logger.notice('Cloudify Manager services successfully reloaded!')
+    else:
+        _stop_components(jobs)
+        _start_components(jobs)
     _print_time()
 
 
@@ -586,10 +841,25 @@ def main():
     # Set the umask to 0022; restore it later.
     current_umask = os.umask(CFY_UMASK)
     """Main entry point"""
-    argh.dispatch_commands([
+    parser = argh.ArghParser()
+    # Handled (and removed from sys.argv) by the package __init__, so that
+    # the imports of this module are measured too; declared for --help only
+    parser.add_argument(
+        STARTUP_PROFILE_FLAG,
+        action='store_true',
+        help='Print a breakdown of the time spent importing modules'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the command, and write the stats (pstats) and a '
+             'summary next to cfy_manager.log'
+    )
+    parser.add_commands([
         validate_command,
         install,
         configure,
+        plan,
         remove,
         start,
         stop,
@@ -602,6 +872,23 @@ def main():
         update_encryption_key,
         generate_test_cert,
     ])
+    parser.add_argument(
+        '--trace-file',
+        help='Write a trace of the components and commands run, in the '
+             'Chrome trace format (chrome://tracing, ui.perfetto.dev)'
+    )
+    profiler = CommandProfiler()
+
+    def _pre_call(namespace):
+        profiler.start(namespace)
+        if namespace.trace_file:
+            tracer.start(namespace.trace_file)
+
+    try:
+        parser.dispatch(pre_call=_pre_call)
+    finally:
+        profiler.stop()
+        tracer.stop()
     os.umask(current_umask)
 
 
@@ -0,0 +1,112 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Import-time profiling for `cfy_manager --startup-profile`.
+
+This module is deliberately stdlib-only and is installed from the package
+`__init__`, before `main` and its dependencies are imported, so that the
+whole import graph of a `cfy_manager` invocation is measured.
+"""
+
+import sys
+import time
+import atexit
+import __builtin__
+
+STARTUP_PROFILE_FLAG = '--startup-profile'
+REPORT_LIMIT = 30
+
+_original_import = __builtin__.__import__
+_timings = []
+# Time spent in nested imports, per level of the currently running imports
+_nested = []
+_start_time = None
+
+
+def _candidate_names(name, globals, level):
+    """Fully qualified names an `import` statement may resolve to"""
+    if level == 0 or not globals or not name:
+        return [name] if name else []
+    package = globals.get('__package__') or globals.get('__name__', '')
+    if '__path__' not in globals and not globals.get('__package__'):
+        package = package.rpartition('.')[0]
+    if level > 1:
+        package = package.rsplit('.', level - 1)[0]
+    candidates = ['{0}.{1}'.format(package, name)] if package else []
+    if level < 0:
+        # Python 2 implicit relative imports fall back to absolute ones
+        candidates.append(name)
+    return candidates
+
+
+def _is_loaded(name):
+    # Failed implicit relative imports are cached as None in sys.modules
+    return sys.modules.get(name) is not None
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=None,
+                     level=-1):
+    candidates = _candidate_names(name, globals, level)
+    if not candidates or any(_is_loaded(c) for c in candidates):
+        return _original_import(name, globals, locals, fromlist, level)
+
+    _nested.append(0.0)
+    start = time.time()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.time() - start
+        nested = _nested.pop()
+        if _nested:
+            _nested[-1] += elapsed
+        module = next((c for c in candidates if _is_loaded(c)), name)
+        _timings.append((module, elapsed, elapsed - nested))
+
+
+def format_report(limit=REPORT_LIMIT):
+    total = sum(own for _, _, own in _timings)
+    lines = [
+        'Startup profile: {0} modules imported in {1:.1f} ms '
+        '({2:.1f} ms since startup)'.format(
+            len(_timings), total * 1000,
+            (time.time() - _start_time) * 1000),
+        '{0:>12} {1:>10}  {2}'.format('cumulative', 'self', 'module'),
+    ]
+    slowest = sorted(_timings, key=lambda t: t[1], reverse=True)[:limit]
+    for module, cumulative, own in slowest:
+        lines.append('{0:>9.1f} ms {1:>7.1f} ms  {2}'.format(
+            cumulative * 1000, own * 1000, module))
+    return '\n'.join(lines)
+
+
+def _print_report():
+    sys.stderr.write(format_report() + '\n')
+
+
+def enable(argv=None):
+    """Start recording imports and print a breakdown when the process exits.
+
+    The flag is removed from `argv`, so that it may be passed anywhere on
+    the command line without confusing the command parser.
+    """
+    global _start_time
+    argv = sys.argv if argv is None else argv
+    while STARTUP_PROFILE_FLAG in argv:
+        argv.remove(STARTUP_PROFILE_FLAG)
+    if __builtin__.__import__ is _profiled_import:
+        return
+    _start_time = time.time()
+    __builtin__.__import__ = _profiled_import
+    atexit.register(_print_report)
@@ -0,0 +1,99 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cfy_manager.config import config
+from cfy_manager.utils import convergence, install
+from cfy_manager.utils.run_context import running
+
+SECTION = 'convergence_test'
+
+
+class FakeComponent(object):
+    config_sections = [SECTION]
+
+    def get_packages(self):
+        return ['fake-package']
+
+
+class ConvergenceTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.state_path = os.path.join(tmpdir, 'state.json')
+        components_dir = os.path.join(tmpdir, 'components')
+        self.template = os.path.join(
+            components_dir, 'fake', 'config', 'fake.conf')
+        os.makedirs(os.path.dirname(self.template))
+        self._write(self.template, 'port={{ port }}')
+
+        self.package_versions = {'fake-package': 'fake-package-1.0-1.noarch'}
+        self._patch(convergence, 'COMPONENTS_DIR', components_dir)
+        self._patch(install, 'installed_versions',
+                    lambda sources: dict((source,
+                                          self.package_versions[source])
+                                         for source in sources))
+        self._patch(convergence, '_manager_version', lambda: '5.0.0')
+        self.addCleanup(config.pop, SECTION, None)
+        config[SECTION] = {'port': 80}
+
+        self.component = FakeComponent()
+        state = convergence.Convergence(self.state_path)
+        with running('FakeComponent', 'configure'):
+            state.record_template(self.template)
+        state.save([self.component])
+
+    def _patch(self, obj, name, value):
+        self.addCleanup(setattr, obj, name, getattr(obj, name))
+        setattr(obj, name, value)
+
+    @staticmethod
+    def _write(path, contents):
+        with open(path, 'w') as f:
+            f.write(contents)
+
+    def _is_unchanged(self):
+        return convergence.Convergence(self.state_path).is_unchanged(
+            self.component)
+
+    def test_unchanged(self):
+        self.assertTrue(self._is_unchanged())
+
+    def test_config_changed(self):
+        config[SECTION] = {'port': 8080}
+        self.assertFalse(self._is_unchanged())
+
+    def test_template_changed(self):
+        self._write(self.template, 'port={{ port }}\nlisten=0.0.0.0')
+        self.assertFalse(self._is_unchanged())
+
+    def test_package_upgraded(self):
+        self.package_versions['fake-package'] = 'fake-package-1.1-1.noarch'
+        self.assertFalse(self._is_unchanged())
+
+    def test_manager_upgraded(self):
+        self._patch(convergence, '_manager_version', lambda: '5.0.1')
+        self.assertFalse(self._is_unchanged())
+
+    def test_only_files_from_components_dir_are_recorded(self):
+        state = convergence.Convergence(self.state_path)
+        with running('FakeComponent', 'configure'):
+            state.record_template('/etc/hosts')
+        self.assertEqual([self.template],
+                         state._get_templates('FakeComponent'))
@@ -0,0 +1,55 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import unittest
+
+from cfy_manager.utils.downloads import DownloadCache
+
+SHA256 = 'ab' * 32
+
+
+class ParseUrlTest(unittest.TestCase):
+    def test_plain_url(self):
+        self.assertEqual(
+            ('https://example.com/rpms/foo-1.0-1.x86_64.rpm',
+             'foo-1.0-1.x86_64.rpm', None),
+            DownloadCache._parse_url(
+                'https://example.com/rpms/foo-1.0-1.x86_64.rpm'))
+
+    def test_sha256_fragment(self):
+        self.assertEqual(
+            ('https://example.com/rpms/foo-1.0-1.x86_64.rpm',
+             'foo-1.0-1.x86_64.rpm', SHA256),
+            DownloadCache._parse_url(
+                'https://example.com/rpms/foo-1.0-1.x86_64.rpm'
+                '#sha256={0}'.format(SHA256.upper())))
+
+    def test_other_fragment_is_ignored(self):
+        self.assertEqual(
+            ('https://example.com/foo.tar.gz', 'foo.tar.gz', None),
+            DownloadCache._parse_url('https://example.com/foo.tar.gz#top'))
+
+    def test_query_is_not_part_of_the_filename(self):
+        url, filename, sha256 = DownloadCache._parse_url(
+            'https://example.com/get/foo.rpm?token=1#sha256={0}'
+            .format(SHA256))
+        self.assertEqual('https://example.com/get/foo.rpm?token=1', url)
+        self.assertEqual('foo.rpm', filename)
+        self.assertEqual(SHA256, sha256)
+
+    def test_url_without_a_path(self):
+        self.assertEqual(
+            ('https://example.com', 'download', None),
+            DownloadCache._parse_url('https://example.com'))
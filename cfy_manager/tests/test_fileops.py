@@ -0,0 +1,239 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Both file operations backends, the in-process one used when running as
+root and the helper used otherwise, must leave files with the same
+ownership and modes, which must also be those the coreutils commands they
+replaced would have set.
+"""
+
+import os
+import grp
+import pwd
+import stat
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from cfy_manager.exceptions import FileError
+from cfy_manager.utils import fileops
+from cfy_manager.utils.common import LocalFileOps, FileOpsHelper
+
+IS_ROOT = os.geteuid() == 0
+SYMBOLIC_MODES = [
+    'g+rw,o-rwx',
+    'u=rwx,go=rx',
+    '+x',
+    'a-w',
+    'o+t',
+    'g+s',
+    'u+X,g-r',
+    'ug=r,o=',
+    '=r',
+    'g+w,+t',
+    '640',
+    '2750',
+]
+
+
+def _other_user_and_group():
+    for user in ('nobody', 'daemon'):
+        try:
+            uid = pwd.getpwnam(user).pw_uid
+        except KeyError:
+            continue
+        return user, grp.getgrgid(pwd.getpwuid(uid).pw_gid).gr_name
+    raise unittest.SkipTest('No unprivileged user to chown files to')
+
+
+def _snapshot(root):
+    """The type, mode and ownership of everything under `root`"""
+    result = {}
+    for current, dirs, files in os.walk(root):
+        for name in [''] + dirs + files:
+            path = os.path.join(current, name)
+            st = os.lstat(path)
+            result[os.path.relpath(path, root)] = (
+                stat.S_IFMT(st.st_mode),
+                oct(stat.S_IMODE(st.st_mode)),
+                st.st_uid,
+                st.st_gid
+            )
+    return result
+
+
+def _make_tree(root):
+    os.makedirs(os.path.join(root, 'dir', 'subdir'))
+    for path, mode in [('file', 0o644),
+                       ('dir/script', 0o755),
+                       ('dir/subdir/secret', 0o600)]:
+        with open(os.path.join(root, path), 'w') as f:
+            f.write(path)
+        os.chmod(os.path.join(root, path), mode)
+    os.chmod(os.path.join(root, 'dir', 'subdir'), 0o2750)
+    os.symlink('file', os.path.join(root, 'link'))
+
+
+class FileOpsBackendsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.helper = FileOpsHelper(use_sudo=False)
+        self.backends = {
+            'local': LocalFileOps(),
+            'helper': self.helper
+        }
+
+    def tearDown(self):
+        self.helper.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _roots(self, *names):
+        roots = []
+        for name in names:
+            root = os.path.join(self.tmpdir, name)
+            _make_tree(root)
+            roots.append(root)
+        return roots
+
+    def _run_everywhere(self, operation, *args):
+        """Run the operation through both backends, each on its own copy
+        of the tree (`{root}` in the args is replaced with it), and return
+        the snapshots of the trees, by backend
+        """
+        snapshots = {}
+        for name, backend in self.backends.items():
+            root, = self._roots(name)
+            backend.call(operation, *[
+                arg.format(root=root) if isinstance(arg, str) else arg
+                for arg in args])
+            snapshots[name] = _snapshot(root)
+        return snapshots
+
+    def _run_coreutils(self, command):
+        root, = self._roots('coreutils')
+        subprocess.check_call(
+            [arg.format(root=root) for arg in command])
+        return _snapshot(root)
+
+    def test_chmod(self):
+        for mode in SYMBOLIC_MODES:
+            for path in ['{root}/file', '{root}/dir/subdir']:
+                snapshots = self._run_everywhere('chmod', mode, path)
+                expected = self._run_coreutils(['chmod', mode, path])
+                self.assertEqual(snapshots['local'], expected,
+                                 'chmod {0} {1}'.format(mode, path))
+                self.assertEqual(snapshots['helper'], expected,
+                                 'chmod {0} {1}'.format(mode, path))
+                shutil.rmtree(self.tmpdir)
+                os.mkdir(self.tmpdir)
+
+    def test_chmod_recursive(self):
+        snapshots = self._run_everywhere('chmod', 'g-w,o+rX', '{root}', True)
+        expected = self._run_coreutils(['chmod', '-R', 'g-w,o+rX', '{root}'])
+        self.assertEqual(snapshots['local'], expected)
+        self.assertEqual(snapshots['helper'], expected)
+
+    def test_apply_mode_rejects_invalid_modes(self):
+        for mode in ['g+q', 'z+r', '8', 'u']:
+            self.assertRaises(ValueError, fileops.apply_mode, mode, 0o644)
+        for backend in self.backends.values():
+            self.assertRaises(FileError, backend.call, 'chmod', 'g+q',
+                              self.tmpdir)
+
+    def test_apply_mode_without_proc_umask(self):
+        # Kernels older than 4.7 don't report the umask in /proc; the
+        # caller's umask must not be used instead of CFY_UMASK then
+        original_proc_umask = fileops._proc_umask
+        fileops._proc_umask = lambda: None
+        original_umask = os.umask(0o077)
+        try:
+            self.assertEqual(0o755, fileops.apply_mode('+x', 0o644))
+        finally:
+            os.umask(original_umask)
+            fileops._proc_umask = original_proc_umask
+
+    def test_copy_onto_itself_fails(self):
+        # shutil raises shutil.Error here, which the helper must report
+        # rather than exit on
+        root, = self._roots('root')
+        path = os.path.join(root, 'file')
+        for backend in self.backends.values():
+            self.assertRaises(FileError, backend.call, 'move', path, path)
+            backend.call('touch', os.path.join(root, 'touched'))
+
+    def test_mkdir(self):
+        snapshots = self._run_everywhere('mkdir', '{root}/new/nested')
+        expected = self._run_coreutils(['mkdir', '-p', '{root}/new/nested'])
+        self.assertEqual(snapshots['local'], expected)
+        self.assertEqual(snapshots['helper'], expected)
+
+    def test_copy(self):
+        snapshots = self._run_everywhere('copy', '{root}/dir', '{root}/copy')
+        expected = self._run_coreutils(
+            ['cp', '-rp', '{root}/dir', '{root}/copy'])
+        self.assertEqual(snapshots['local'], expected)
+        self.assertEqual(snapshots['helper'], expected)
+
+    def test_move_to_new_destination(self):
+        snapshots = self._run_everywhere(
+            'move', '{root}/dir/script', '{root}/moved')
+        expected = self._run_coreutils(
+            ['mv', '{root}/dir/script', '{root}/moved'])
+        self.assertEqual(snapshots['local'], snapshots['helper'])
+        # Like `cp` + `rm`, the new file is owned by whoever moved it, and
+        # gets the source's mode, limited by the umask
+        self.assertEqual(snapshots['local']['moved'][:2],
+                         expected['moved'][:2])
+        self.assertEqual(snapshots['local']['moved'][2:],
+                         (os.geteuid(), os.getegid()))
+        self.assertNotIn('dir/script', snapshots['local'])
+
+    def test_move_to_existing_destination(self):
+        if not IS_ROOT:
+            raise unittest.SkipTest('Changing ownership requires root')
+        user, group = _other_user_and_group()
+        snapshots = {}
+        for name, backend in self.backends.items():
+            root, = self._roots(name)
+            destination = os.path.join(root, 'dir', 'subdir', 'secret')
+            fileops.chown(user, group, destination)
+            backend.call('move', os.path.join(root, 'file'), destination)
+            with open(destination) as f:
+                self.assertEqual(f.read(), 'file')
+            snapshots[name] = _snapshot(root)
+        self.assertEqual(snapshots['local'], snapshots['helper'])
+        # An existing destination keeps its owner and mode
+        self.assertEqual(snapshots['local']['dir/subdir/secret'][1:], (
+            oct(0o600),
+            pwd.getpwnam(user).pw_uid,
+            grp.getgrnam(group).gr_gid
+        ))
+        self.assertNotIn('file', snapshots['local'])
+
+    def test_chown_recursive(self):
+        if not IS_ROOT:
+            raise unittest.SkipTest('Changing ownership requires root')
+        user, group = _other_user_and_group()
+        snapshots = self._run_everywhere(
+            'chown', user, group, '{root}', True)
+        expected = self._run_coreutils(
+            ['chown', '-R', '{0}:{1}'.format(user, group), '{root}'])
+        self.assertEqual(snapshots['local'], expected)
+        self.assertEqual(snapshots['helper'], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
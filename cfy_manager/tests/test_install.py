@@ -0,0 +1,74 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import unittest
+
+from cfy_manager.utils import install
+
+RPM_URL = 'https://example.com/rpms/foo-1.0-1.x86_64.rpm#sha256={0}'.format(
+    'ab' * 32)
+LOCAL_RPM = '/opt/cloudify/downloads/foo-1.0-1.x86_64.rpm'
+
+
+class _FakeRpmHandler(object):
+    def __init__(self, source_path):
+        self.source_path = source_path
+        self.package_name = 'foo'
+
+    def is_rpm_installed(self):
+        return False
+
+    @staticmethod
+    def is_package_installed(name):
+        return False
+
+
+class InstallSourcesTest(unittest.TestCase):
+    def setUp(self):
+        self.local_sources = []
+        self.commands = []
+        self._patch('get_local_source_path', self._get_local_source_path)
+        self._patch('RpmPackageHandler', _FakeRpmHandler)
+        self._patch('sudo', lambda command, **kwargs:
+                    self.commands.append(command))
+
+    def _patch(self, name, value):
+        self.addCleanup(setattr, install, name, getattr(install, name))
+        setattr(install, name, value)
+
+    def _get_local_source_path(self, source):
+        self.local_sources.append(source)
+        return LOCAL_RPM
+
+    def test_is_rpm_source(self):
+        self.assertTrue(install.is_rpm_source(RPM_URL))
+        self.assertTrue(install.is_rpm_source('/tmp/foo.rpm'))
+        self.assertTrue(install.is_rpm_source('foo-*.rpm'))
+        self.assertFalse(install.is_rpm_source('foo'))
+        self.assertFalse(install.is_rpm_source('https://example.com/foo'))
+
+    def test_yum_install_url_with_sha256(self):
+        installed = []
+        self._patch('_install_rpm', installed.append)
+        install.yum_install(RPM_URL)
+        self.assertEqual([RPM_URL], self.local_sources)
+        self.assertEqual([LOCAL_RPM], installed)
+
+    def test_install_packages_url_with_sha256(self):
+        install.install_packages([(RPM_URL, True)])
+        self.assertEqual([RPM_URL], self.local_sources)
+        self.assertEqual(
+            [['yum', 'install', '-y', '--disablerepo=*', LOCAL_RPM]],
+            self.commands)
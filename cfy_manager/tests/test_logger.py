@@ -0,0 +1,59 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+from cfy_manager.logger import secrets_masked_in_file_logs
+
+
+class SecretsMaskedInFileLogsTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.log_file = os.path.join(tmpdir, 'test.log')
+        self.handler = logging.FileHandler(self.log_file)
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        self.addCleanup(root.removeHandler, self.handler)
+        self.addCleanup(self.handler.close)
+        self.addCleanup(root.setLevel, root.level)
+        root.setLevel(logging.DEBUG)
+        self.logger = logging.getLogger('test_logger')
+
+    def _logged(self):
+        self.handler.flush()
+        with open(self.log_file) as f:
+            return f.read().splitlines()
+
+    def test_masks_only_the_secret(self):
+        with secrets_masked_in_file_logs('hunter2'):
+            self.logger.debug('Running: %s', ['cfy', '-p', 'hunter2'])
+            self.logger.debug('Logged by another component')
+        self.assertEqual([
+            "Running: ['cfy', '-p', '********']",
+            'Logged by another component'
+        ], self._logged())
+
+    def test_unmasked_after_failure(self):
+        with self.assertRaises(ValueError):
+            with secrets_masked_in_file_logs('hunter2'):
+                raise ValueError()
+        self.logger.debug('hunter2')
+        self.assertEqual(['hunter2'], self._logged())
+        self.assertEqual([], self.handler.filters)
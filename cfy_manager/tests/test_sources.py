@@ -0,0 +1,189 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import json
+import shutil
+import struct
+import hashlib
+import tempfile
+import unittest
+
+from cfy_manager.exceptions import FileError
+from cfy_manager.utils import sources
+
+STRING_TYPE = 6
+INT32_TYPE = 4
+
+
+def _header(tags):
+    """An rpm header structure with the (tag, type, value) `tags`"""
+    index = b''
+    data = b''
+    for tag, value_type, value in tags:
+        if value_type == INT32_TYPE:
+            # int32 values are aligned to 4 bytes
+            data += b'\0' * (-len(data) % 4)
+            encoded = struct.pack('>i', value)
+        else:
+            encoded = value + b'\0'
+        index += struct.pack('>iIiI', tag, value_type, len(data), 1)
+        data += encoded
+    intro = sources.RPM_HEADER_MAGIC + b'\x01' + b'\0' * 4 + \
+        struct.pack('>II', len(index) // 16, len(data))
+    return intro + index + data
+
+
+def make_rpm(name=b'foo', version=b'1.0', release=b'1.el7', epoch=None,
+             arch=b'x86_64', payload=b'payload'):
+    lead = sources.RPM_LEAD_MAGIC + b'\0' * (sources.RPM_LEAD_SIZE - 4)
+    # A 5 byte signature data store, so it needs 3 bytes of padding
+    signature = _header([(1004, STRING_TYPE, b'sigs')])
+    padding = b'\0' * (-len(signature) % 8)
+    tags = [(1000, STRING_TYPE, name),
+            (1001, STRING_TYPE, version),
+            (1002, STRING_TYPE, release),
+            (1022, STRING_TYPE, arch),
+            (1004, STRING_TYPE, b'an unindexed summary')]
+    if epoch is not None:
+        tags.append((1003, INT32_TYPE, epoch))
+    return lead + signature + padding + _header(tags) + payload
+
+
+class ReadRpmHeaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def _write(self, contents, filename='foo.rpm'):
+        path = os.path.join(self.tmpdir, filename)
+        with open(path, 'wb') as f:
+            f.write(contents)
+        return path
+
+    def test_fields(self):
+        path = self._write(make_rpm(epoch=2))
+        self.assertEqual({
+            'name': b'foo',
+            'version': b'1.0',
+            'release': b'1.el7',
+            'epoch': 2,
+            'arch': b'x86_64'
+        }, sources.read_rpm_header(path))
+
+    def test_no_epoch(self):
+        path = self._write(make_rpm())
+        header = sources.read_rpm_header(path)
+        self.assertIsNone(header['epoch'])
+        self.assertEqual('foo-1.0-1.el7.x86_64', sources.rpm_full_name(header))
+
+    def test_signature_padding(self):
+        rpm = make_rpm()
+        signature_end = sources.RPM_LEAD_SIZE + 16 + 16 + 5
+        self.assertEqual(b'\0\0\0', rpm[signature_end:signature_end + 3])
+        self.assertEqual(sources.RPM_HEADER_MAGIC,
+                         rpm[signature_end + 3:signature_end + 6])
+        self.assertEqual(b'foo',
+                         sources.read_rpm_header(self._write(rpm))['name'])
+
+    def test_bad_lead_magic(self):
+        path = self._write(b'\0' * 4 + make_rpm()[4:])
+        self.assertRaises(FileError, sources.read_rpm_header, path)
+
+    def test_bad_header_magic(self):
+        rpm = make_rpm()
+        rpm = rpm[:sources.RPM_LEAD_SIZE] + b'\0\0\0' + \
+            rpm[sources.RPM_LEAD_SIZE + 3:]
+        self.assertRaises(FileError, sources.read_rpm_header,
+                          self._write(rpm))
+
+    def test_truncated(self):
+        rpm = make_rpm(payload=b'')
+        for length in [0, 50, sources.RPM_LEAD_SIZE + 10, len(rpm) - 1]:
+            path = self._write(rpm[:length])
+            self.assertRaises(FileError, sources.read_rpm_header, path)
+
+    def test_missing_file(self):
+        self.assertRaises(FileError, sources.read_rpm_header,
+                          os.path.join(self.tmpdir, 'missing.rpm'))
+
+
+class SourcesIndexTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.directory = os.path.join(tmpdir, 'sources')
+        os.mkdir(self.directory)
+        self.cache_path = os.path.join(tmpdir, 'index.json')
+        self.rpm = self._write('foo-1.0-1.el7.x86_64.rpm', make_rpm())
+
+        self.headers_read = []
+        original_read = sources.read_rpm_header
+
+        def _read_rpm_header(path):
+            self.headers_read.append(os.path.basename(path))
+            return original_read(path)
+        self.addCleanup(setattr, sources, 'read_rpm_header', original_read)
+        sources.read_rpm_header = _read_rpm_header
+
+    def _write(self, filename, contents):
+        path = os.path.join(self.directory, filename)
+        with open(path, 'wb') as f:
+            f.write(contents)
+        return path
+
+    def _index(self):
+        return sources.SourcesIndex(self.directory, self.cache_path)
+
+    def test_match_does_not_read_headers(self):
+        self._write('bar.rpm', b'not an rpm')
+        self.assertEqual([self.rpm], self._index().match('foo-*.rpm'))
+        self.assertEqual([], self.headers_read)
+
+    def test_bad_rpm_does_not_break_other_lookups(self):
+        bad_rpm = self._write('bar.rpm', b'not an rpm')
+        index = self._index()
+        self.assertEqual(b'foo', index.get_rpm_header(self.rpm)['name'])
+        self.assertRaises(FileError, index.get_rpm_header, bad_rpm)
+
+    def test_cache_reused_by_size_and_mtime(self):
+        self._index().get_rpm_header(self.rpm)
+        header = self._index().get_rpm_header(self.rpm)
+        self.assertEqual(b'foo', header['name'])
+        self.assertEqual(['foo-1.0-1.el7.x86_64.rpm'], self.headers_read)
+
+    def test_modified_rpm_is_read_again(self):
+        self._index().get_rpm_header(self.rpm)
+        self._write('foo-1.0-1.el7.x86_64.rpm', make_rpm(version=b'1.1'))
+        stat = os.stat(self.rpm)
+        os.utime(self.rpm, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(b'1.1',
+                         self._index().get_rpm_header(self.rpm)['version'])
+        self.assertEqual(2, len(self.headers_read))
+
+    def test_invalid_cache_entries_are_ignored(self):
+        with open(self.cache_path, 'w') as f:
+            json.dump({'foo-1.0-1.el7.x86_64.rpm': 'garbage'}, f)
+        self.assertEqual(b'foo',
+                         self._index().get_rpm_header(self.rpm)['name'])
+
+    def test_sha256_only_when_asked_for(self):
+        index = self._index()
+        self.assertNotIn('sha256', index.get_rpm_header(self.rpm))
+        with open(self.rpm, 'rb') as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(expected, index.get_sha256(self.rpm))
+        self.assertEqual(expected, self._index().get_rpm_header(
+            self.rpm)['sha256'])
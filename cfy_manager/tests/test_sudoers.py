@@ -0,0 +1,86 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import unittest
+from collections import OrderedDict
+
+from cfy_manager.utils import sudoers
+from cfy_manager.utils.sudoers import SudoersBuilder
+
+SUDOERS_PATH = '/etc/sudoers.d/cfyuser'
+ENTRIES = OrderedDict([
+    ('Defaults:cfyuser !requiretty', 'Disable requiretty for cfyuser'),
+    ('cfyuser    ALL=(root) NOPASSWD:/usr/bin/systemctl restart nginx',
+     'Allow cfyuser to restart nginx'),
+])
+
+
+class _VisudoResult(object):
+    returncode = 0
+
+
+class SudoersRenderTest(unittest.TestCase):
+    def test_round_trip(self):
+        content = SudoersBuilder.render(ENTRIES)
+        self.assertEqual(list(ENTRIES.items()),
+                         SudoersBuilder._parse(content))
+
+    def test_parse_ignores_unmanaged_files(self):
+        content = SudoersBuilder.render(ENTRIES)
+        self.assertEqual([], SudoersBuilder._parse(
+            content.replace(sudoers.SUDOERS_HEADER, '# My own sudoers')))
+        self.assertEqual([], SudoersBuilder._parse(None))
+
+
+class SudoersFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.files = {}
+        self._patch('read_deployed', self.files.get)
+        self._patch('write', lambda content, path:
+                    self.files.__setitem__(path, content))
+        self._patch('rename', lambda source, destination:
+                    self.files.__setitem__(destination,
+                                           self.files.pop(source)))
+        self._patch('chown', lambda *args: None)
+        self._patch('chmod', lambda *args: None)
+        self._patch('sudo', lambda *args, **kwargs: _VisudoResult())
+        self.builder = SudoersBuilder(SUDOERS_PATH)
+
+    def _patch(self, name, value):
+        self.addCleanup(setattr, sudoers, name, getattr(sudoers, name))
+        setattr(sudoers, name, value)
+
+    def _flushed_entries(self):
+        return SudoersBuilder._parse(self.files[SUDOERS_PATH])
+
+    def test_existing_entries_are_kept(self):
+        self.files[SUDOERS_PATH] = SudoersBuilder.render(
+            OrderedDict([('old entry', 'old')]))
+        self.builder.add('new entry', 'new')
+        self.builder.flush()
+        self.assertEqual([('old entry', 'old'), ('new entry', 'new')],
+                         self._flushed_entries())
+
+    def test_reset_keeps_the_entries_of_this_run(self):
+        self.files[SUDOERS_PATH] = SudoersBuilder.render(
+            OrderedDict([('old entry', 'old')]))
+        self.builder.add('first entry', 'first')
+        self.builder.flush()
+        self.builder.reset()
+        self.builder.add('second entry', 'second')
+        self.builder.flush()
+        self.assertEqual([('first entry', 'first'),
+                          ('second entry', 'second')],
+                         self._flushed_entries())
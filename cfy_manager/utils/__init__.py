@@ -15,7 +15,7 @@
 
 import os
 
-CFY_UMASK = 0022
+from .fileops import CFY_UMASK
 
 
 def subprocess_preexec():
@@ -21,7 +21,17 @@ import tempfile
 from os.path import join
 from contextlib import contextmanager
 
-from .common import sudo, remove, chown, copy, move
+from .common import (
+    sudo,
+    probe,
+    remove,
+    chmod,
+    chown,
+    copy,
+    move,
+    file_ops_batch
+)
+from .convergence import convergence
 from ..components.components_constants import SSL_INPUTS
 from ..config import config
 from ..constants import SSL_CERTS_TARGET_DIR, CLOUDIFY_USER, CLOUDIFY_GROUP
@@ -164,7 +174,9 @@ def load_cert_metadata(filename=const.CERT_METADATA_FILE_PATH):
     try:
         # Don't use open because file permissions may cause us to load
         # nothing then stomp the contents if we do
-        return json.loads(sudo(['cat', filename]).aggr_stdout)
+        return json.loads(
+            probe(['cat', filename], paths=[filename], use_sudo=True)
+            .aggr_stdout)
     except ProcessExecutionError:
         return {}
 
@@ -292,6 +304,7 @@ def _generate_ssl_certificate(ips,
             ]
         sudo(x509_command)
         remove(csr_path)
+    convergence.mark_changed()
 
     logger.debug('Generated SSL certificate: {0} and key: {1}'.format(
         cert_path, key_path
@@ -339,6 +352,7 @@ def generate_ca_cert(cert_path=const.CA_CERT_PATH,
             '-keyout', key_path,
             '-config', conf_path,
         ])
+    convergence.mark_changed()
 
 
 def create_pkcs12():
@@ -508,17 +522,17 @@ def use_supplied_certificates(component_name,
 
     logger.info('Setting certificate ownership and permissions.')
 
-    for path in cert_destination, key_destination, ca_destination:
-        if path:
-            sudo(['chown', '{owner}.{group}'.format(owner=owner, group=group),
-                  path])
-    # Make key only readable by user and group
-    if key_destination:
-        sudo(['chmod', '440', key_destination])
-    # Make certs readable by anyone
-    for path in cert_destination, ca_destination:
-        if path:
-            sudo(['chmod', '444', path])
+    with file_ops_batch():
+        for path in cert_destination, key_destination, ca_destination:
+            if path:
+                chown(owner, group, path)
+        # Make key only readable by user and group
+        if key_destination:
+            chmod('440', key_destination)
+        # Make certs readable by anyone
+        for path in cert_destination, ca_destination:
+            if path:
+                chmod('444', path)
 
     logger.info('Updating configured certification locations.')
     if cert_destination:
@@ -14,23 +14,89 @@
 #  * limitations under the License.
 
 import os
+import sys
+import time
+import base64
 import glob
+import json
+import errno
 import shlex
+import atexit
 import tempfile
+import threading
 import subprocess
+from collections import deque
+from contextlib import contextmanager
 
 from ..config import config
 from ..logger import get_logger
-from ..exceptions import ProcessExecutionError
+from ..exceptions import FileError, ProcessExecutionError
 
-from . import subprocess_preexec
+from . import fileops, subprocess_preexec
+from .convergence import convergence
+from .retries import get_retry_policy
+from .run_context import current_component, current_phase, running
+from .tracing import tracer
 
 logger = get_logger('utils')
 
+# How many lines of a streamed command's output are kept, for errors
+STREAM_TAIL_LINES = 100
+
+
+def _stream_output(pipe, tail, size):
+    for line in iter(pipe.readline, b''):
+        size[0] += len(line)
+        line = line.rstrip('\n')
+        tail.append(line)
+        logger.debug(line)
+    pipe.close()
+
+
+def _communicate_streaming(proc, stdin):
+    """Like `communicate`, but log the output lines as they are read.
+
+    Only the last STREAM_TAIL_LINES lines of stdout and stderr are kept,
+    as `aggr_stdout` and `aggr_stderr`. The total size of the output is
+    stored as `output_size`.
+    """
+    tails = []
+    readers = []
+    size = [0]
+    for pipe in proc.stdout, proc.stderr:
+        tail = deque(maxlen=STREAM_TAIL_LINES)
+        tails.append(tail)
+        if pipe is None:
+            continue
+        reader = threading.Thread(target=_stream_output,
+                                  args=(pipe, tail, size))
+        reader.daemon = True
+        reader.start()
+        readers.append(reader)
+    try:
+        if stdin:
+            proc.stdin.write(stdin)
+        proc.stdin.close()
+    except IOError as e:
+        # The process may exit without reading all of its input
+        if e.errno not in (errno.EPIPE, errno.EINVAL):
+            raise
+    for reader in readers:
+        reader.join()
+    proc.wait()
+    proc.output_size = size[0]
+    return tuple('\n'.join(tail) for tail in tails)
+
 
 def run(command, retries=0, stdin=b'', ignore_failures=False,
-        globx=False, shell=False, env=None, stdout=None):
-    # TODO: add ability to *log* output, instead of just printing to stdout
+        globx=False, shell=False, env=None, stdout=None, stream=False):
+    """Run `command`, and return the process with its output.
+
+    `retries` is a RetryPolicy, or a number of times to retry with the
+    default backoff.
+    With `stream`, the output is logged line by line while the command
+    runs, and only its tail is kept in memory.
+    """
     if isinstance(command, str) and not shell:
         command = shlex.split(command)
     stderr = subprocess.PIPE
@@ -40,21 +106,41 @@ def run(command, retries=0, stdin=b'', ignore_failures=False,
         for arg in command:
             glob_command.append(glob.glob(arg))
         command = glob_command
-    logger.debug('Running: {0}'.format(command))
-    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=stdout,
-                            stderr=stderr, shell=shell, env=env,
-                            preexec_fn=subprocess_preexec)
-    proc.aggr_stdout, proc.aggr_stderr = proc.communicate(input=stdin)
-    if proc.returncode != 0:
+    retry_policy = get_retry_policy(retries)
+    delays = retry_policy.delays()
+    while True:
+        logger.debug('Running: {0}'.format(command))
+        start = time.time()
+        proc = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                stdout=stdout, stderr=stderr, shell=shell,
+                                env=env, preexec_fn=subprocess_preexec)
+        if stream:
+            proc.aggr_stdout, proc.aggr_stderr = \
+                _communicate_streaming(proc, stdin)
+        else:
+            proc.aggr_stdout, proc.aggr_stderr = \
+                proc.communicate(input=stdin)
+            proc.output_size = \
+                len(proc.aggr_stdout or '') + len(proc.aggr_stderr or '')
+        tracer.add_command(command, start, time.time() - start,
+                           proc.returncode, proc.output_size)
+        if proc.returncode == 0:
+            return proc
+
         command_str = ' '.join(command)
-        if retries:
-            logger.warn('Failed running command: {0}. Retrying. '
-                        '({1} left)'.format(command_str, retries))
-            proc = run(command, retries - 1)
-        elif not ignore_failures:
-            msg = 'Failed running command: {0} ({1}).'.format(
-                command_str, proc.aggr_stderr)
-            raise ProcessExecutionError(msg, proc.returncode)
+        delay = None
+        if retry_policy.should_retry(proc.returncode, proc.aggr_stderr):
+            delay = next(delays, None)
+        if delay is None:
+            break
+        logger.warn('Failed running command: {0}. Retrying in {1:.1f}s.'
+                    .format(command_str, delay))
+        time.sleep(delay)
+
+    if not ignore_failures:
+        msg = 'Failed running command: {0} ({1}).'.format(
+            command_str, proc.aggr_stderr)
+        raise ProcessExecutionError(msg, proc.returncode)
     return proc
 
 
@@ -68,35 +154,320 @@ def sudo(command, *args, **kwargs):
     return run(command=command, *args, **kwargs)
 
 
+# At most this many background calls (see call_async) run at once
+MAX_ASYNC_CALLS = 16
+_async_slots = threading.BoundedSemaphore(MAX_ASYNC_CALLS)
+
+
+class AsyncResult(object):
+    """A call running in a background thread, see `call_async`"""
+    def __init__(self, func, args, kwargs):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+        # Whatever the call does is still on behalf of the current component
+        context = current_component(), current_phase()
+        thread = threading.Thread(target=self._run,
+                                  args=(context, func, args, kwargs))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, context, func, args, kwargs):
+        try:
+            with _async_slots, running(*context):
+                self._result = func(*args, **kwargs)
+        except BaseException:
+            self._exc_info = sys.exc_info()
+        finally:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self):
+        # Waiting with a timeout keeps the main thread interruptible
+        while not self._done.wait(0.5):
+            pass
+
+    def result(self):
+        """Wait for the call, and return its result or raise its error"""
+        self.wait()
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+def call_async(func, *args, **kwargs):
+    return AsyncResult(func, args, kwargs)
+
+
+def run_async(command, **kwargs):
+    """`run` in the background; get the process with `.result()`"""
+    return call_async(run, command, **kwargs)
+
+
+def sudo_async(command, **kwargs):
+    return call_async(sudo, command, **kwargs)
+
+
+def gather(*results):
+    """Wait for all the async `results`, and return their values in order.
+
+    If any of the calls failed, the error of the first one (in argument
+    order) is raised, but only after all of them are done.
+    """
+    for result in results:
+        result.wait()
+    return [result.result() for result in results]
+
+
+class ProbeCache(object):
+    """Results of read-only commands (probes), kept for the current run.
+
+    A result is reused as long as the files the probe reads are unchanged
+    (same mtime, size and inode). File operations done through `file_ops`
+    also invalidate the results for the paths they touch, in case they
+    were too quick to change an mtime.
+    """
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_state(path):
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        return st.st_mtime, st.st_size, st.st_ino
+
+    def get(self, key, paths, compute):
+        """Return the cached result for `key`, or `compute()` it"""
+        try:
+            state = [self._file_state(path) for path in paths]
+        except OSError:
+            # We can't tell whether the files change, so don't cache
+            return compute()
+        key = (key, tuple(paths))
+        with self._lock:
+            cached = self._results.get(key)
+        if cached is not None and cached[0] == state:
+            logger.debug('Using the cached result of: {0}'.format(key[0]))
+            return cached[1]
+        result = compute()
+        with self._lock:
+            self._results[key] = (state, result)
+        return result
+
+    def invalidate(self, path):
+        """Forget the results of probes reading `path`, or files under it"""
+        prefix = path.rstrip('/') + '/'
+        with self._lock:
+            for key in list(self._results):
+                if any(p == path or p.startswith(prefix) for p in key[1]):
+                    del self._results[key]
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+probe_cache = ProbeCache()
+
+
+def probe(command, paths=(), use_sudo=False, **kwargs):
+    """Run a read-only `command`, reusing its result from earlier in the run.
+
+    `paths` are the files the command reads; the result is recomputed once
+    any of them changes. Only use this for commands with no side effects,
+    whose output depends on nothing but these files.
+    """
+    key = (tuple(command), use_sudo, tuple(sorted(kwargs.items())))
+    runner = sudo if use_sudo else run
+    return probe_cache.get(key, paths,
+                           lambda: runner(list(command), **kwargs))
+
+
+def _invalidate_probes(operation, args):
+    if operation == 'read':
+        return
+    if operation == 'batch':
+        for batched_operation, batched_args in args[0]:
+            _invalidate_probes(batched_operation, batched_args)
+        return
+    for arg in args:
+        if isinstance(arg, basestring) and arg.startswith('/'):
+            probe_cache.invalidate(arg)
+
+
+def _get_file_op_result(operation, args, response):
+    if 'error' in response:
+        if operation == 'batch':
+            description = '{0} batched file operations (rolled back)'.format(
+                len(args[0]))
+        else:
+            description = ' '.join(str(arg) for arg in (operation,) + args)
+        raise FileError('Failed running {0}: {1}'.format(
+            description, response['error']))
+    return response['result']
+
+
+class LocalFileOps(object):
+    """Does the file operations in this process, when running as root"""
+    def call(self, operation, *args):
+        response = fileops.handle({'op': operation, 'args': args})
+        _invalidate_probes(operation, args)
+        return _get_file_op_result(operation, args, response)
+
+    def close(self):
+        pass
+
+
+class FileOpsHelper(object):
+    """Client for the privileged file operations helper (`utils.fileops`).
+
+    The helper is started with sudo on first use, and then does all the
+    file operations of this run, so that each of them doesn't have to fork
+    sudo and a coreutils binary. It exits once its stdin is closed.
+    """
+    def __init__(self, use_sudo=True):
+        self._use_sudo = use_sudo
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        helper_path = os.path.splitext(fileops.__file__)[0] + '.py'
+        command = [sys.executable, '-Es', helper_path]
+        if self._use_sudo:
+            command.insert(0, 'sudo')
+        logger.debug('Starting the file operations helper...')
+        self._proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            close_fds=True,
+            preexec_fn=subprocess_preexec
+        )
+        atexit.register(self.close)
+
+    def call(self, operation, *args):
+        request = json.dumps({'op': operation, 'args': args})
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            self._proc.stdin.write(request + '\n')
+            self._proc.stdin.flush()
+            response = self._proc.stdout.readline()
+        _invalidate_probes(operation, args)
+        if not response:
+            raise FileError(
+                'The file operations helper exited unexpectedly while '
+                'running: {0}'.format(request))
+        return _get_file_op_result(operation, args, json.loads(response))
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                self._proc.stdin.close()
+                self._proc.wait()
+            self._proc = None
+
+
+# Both expose the same API; sudo (and the helper) is only needed when not
+# already running as root
+file_ops = LocalFileOps() if os.geteuid() == 0 else FileOpsHelper()
+
+
+class _FileOpsBatch(object):
+    def __init__(self):
+        self.operations = []
+        self.callbacks = []
+
+
+_batches = threading.local()
+
+
+def _file_op(operation, *args, **kwargs):
+    """Run a file operation, or add it to this thread's current batch.
+
+    `on_success` is called once the operation has been done.
+    """
+    on_success = kwargs.get('on_success')
+    batch = getattr(_batches, 'current', None)
+    if batch is not None and operation in fileops.BATCH_OPERATIONS:
+        batch.operations.append([operation, args])
+        if on_success:
+            batch.callbacks.append(on_success)
+        return
+    file_ops.call(operation, *args)
+    if on_success:
+        on_success()
+
+
+@contextmanager
+def file_ops_batch():
+    """Run the mkdir/copy/chmod/chown calls of this block in one go.
+
+    The operations are only done when the block exits (so their effects
+    are not visible inside of it), in a single call to the file operations
+    backend. If one of them fails, all of them are rolled back.
+    """
+    if getattr(_batches, 'current', None) is not None:
+        # Nested batches are part of the outer one
+        yield
+        return
+    batch = _batches.current = _FileOpsBatch()
+    try:
+        yield
+    finally:
+        _batches.current = None
+    if batch.operations:
+        logger.debug('Running {0} batched file operations...'.format(
+            len(batch.operations)))
+        file_ops.call('batch', batch.operations)
+        for callback in batch.callbacks:
+            callback()
+
+
 def mkdir(folder, use_sudo=True):
     if os.path.isdir(folder):
         return
     logger.debug('Creating Directory: {0}'.format(folder))
-    cmd = ['mkdir', '-p', folder]
     if use_sudo:
-        sudo(cmd)
+        _file_op('mkdir', folder)
     else:
-        run(cmd)
+        run(['mkdir', '-p', folder])
 
 
 def chmod(mode, path, recursive=False):
     logger.debug('chmoding {0}: {1}'.format(path, mode))
-    command = ['chmod']
-    if recursive:
-        command.append('-R')
-    command += [mode, path]
-    sudo(command)
+    _file_op('chmod', mode, path, recursive)
 
 
 def chown(user, group, path):
     logger.debug('chowning {0} by {1}:{2}...'.format(
         path, user, group))
-    sudo(['chown', '-R', '{0}:{1}'.format(user, group), path])
+    _file_op('chown', user, group, path, True)
 
 
 def remove(path, ignore_failure=False):
     logger.debug('Removing {0}...'.format(path))
-    sudo(['rm', '-rf', path], ignore_failures=ignore_failure)
+    try:
+        file_ops.call('remove', path)
+    except FileError:
+        if not ignore_failure:
+            raise
+
+
+def write(contents, destination):
+    """Write `contents` to `destination` as root, in place"""
+    _file_op('write', destination, base64.b64encode(contents))
+
+
+def rename(source, destination):
+    _file_op('rename', source, destination)
 
 
 def untar(source,
@@ -111,7 +482,8 @@ def untar(source,
     tar_command = ['tar', '-xvf', source, '-C', destination, '--strip=1']
     if skip_old_files:
         tar_command.append('--skip-old-files')
-    sudo(tar_command)
+    # -v lists every extracted file, which can be a lot for big archives
+    sudo(tar_command, stream=True)
 
     return destination
 
@@ -122,15 +494,26 @@ def ensure_destination_dir_exists(destination):
         logger.debug(
             'Path does not exist: {0}. Creating it...'.format(
                 destination_dir))
-        sudo(['mkdir', '-p', destination_dir])
+        _file_op('mkdir', destination_dir)
 
 
 def copy(source, destination):
+    convergence.record_template(source)
+    source_hash = convergence.hash_source(source, destination)
+    if convergence.is_current(destination, source_hash):
+        logger.debug('{0} is unchanged, not copying it'.format(destination))
+        return
     ensure_destination_dir_exists(destination)
-    sudo(['cp', '-rp', source, destination])
+    _file_op('copy', source, destination,
+             on_success=lambda: convergence.record(destination, source_hash))
 
 
 def move(source, destination, rename_only=False):
+    source_hash = convergence.hash_source(source, destination)
+    if convergence.is_current(destination, source_hash):
+        logger.debug('{0} is unchanged, not moving it'.format(destination))
+        file_ops.call('remove', source)
+        return
     ensure_destination_dir_exists(destination)
-    sudo(['cp', source, destination])
-    sudo(['rm', source])
+    file_ops.call('move', source, destination)
+    convergence.record(destination, source_hash)
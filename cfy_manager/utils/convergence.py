@@ -0,0 +1,238 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from os.path import isfile
+
+from .run_context import current_component
+
+from ..config import config
+from ..logger import get_logger
+from ..constants import (
+    COMPONENTS_DIR,
+    CONVERGENCE_STATE_PATH,
+    JOURNAL_FILE_PATH,
+    SANITY_MODE_FILE_PATH,
+    SOURCES_INDEX_PATH
+)
+
+logger = get_logger('Convergence')
+
+# Files that are rewritten on every run, regardless of the configuration
+UNTRACKED_PATHS = [
+    CONVERGENCE_STATE_PATH,
+    JOURNAL_FILE_PATH,
+    SANITY_MODE_FILE_PATH,
+    SOURCES_INDEX_PATH
+]
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path):
+    """Return the sha256 of the file's contents, or None if it can't be read
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def _manager_version():
+    # pkg_resources is slow to import, so it's only used by the commands
+    # that compare components with their last configure
+    import pkg_resources
+    try:
+        return pkg_resources.get_distribution(
+            'cloudify-manager-install').version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+class Convergence(object):
+    """Tracks what each component was last configured with.
+
+    Every file deployed by a component (through `common.copy`/`common.move`,
+    so also `files.deploy` and `files.write_to_file`) is recorded with the
+    hash of its contents, and once configure finishes, so is the hash of
+    the config sections each component reads (`config_sections`).
+
+    The component's hash also covers the contents of the templates it
+    deployed from `COMPONENTS_DIR`, the cfy_manager version, and the
+    installed versions of the component's packages, so that upgrading any
+    of them reconfigures the component even if the config didn't change.
+
+    When `enabled` (`cfy_manager configure --converge`), components whose
+    hash and files are unchanged are skipped, files that already have the
+    same contents aren't rewritten, and services are only restarted if one
+    of their component's files changed.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._state = None
+        self._changed = set()
+        self._templates = {}
+        self._lock = threading.RLock()
+        self.enabled = False
+
+    def _load(self):
+        if self._state is None:
+            self._state = {'components': {}, 'files': {}}
+            if isfile(self._path):
+                from .files import sudo_read
+                self._state = json.loads(sudo_read(self._path))
+            self._state.setdefault('templates', {})
+        return self._state
+
+    @staticmethod
+    def _is_tracked(path):
+        return current_component() \
+            and path not in UNTRACKED_PATHS \
+            and not path.startswith(tempfile.gettempdir())
+
+    @staticmethod
+    def _hash_component(component, templates):
+        from .install import installed_versions
+        inputs = {
+            'config': dict((section, config.get(section))
+                           for section in component.config_sections),
+            'templates': dict((path, file_hash(path)) for path in templates),
+            'manager_version': _manager_version(),
+            'packages': installed_versions(component.get_packages())
+        }
+        serialized = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(serialized).hexdigest()
+
+    def _get_templates(self, name):
+        """The templates the component deployed in this run, or in the last
+        configure if it didn't run now
+        """
+        if name in self._templates:
+            return sorted(self._templates[name])
+        return self._load()['templates'].get(name, [])
+
+    def record_template(self, path):
+        """Record that the current component deployed the template (or any
+        other file) at `path`, if it comes from `COMPONENTS_DIR`
+        """
+        component = current_component()
+        if not component \
+                or not path.startswith(os.path.join(COMPONENTS_DIR, '')):
+            return
+        with self._lock:
+            self._templates.setdefault(component, set()).add(path)
+
+    def hash_source(self, source, destination):
+        """Return the hash of `source`, if writing it to `destination` is
+        tracked; otherwise it isn't needed, and None is returned
+        """
+        if not self._is_tracked(destination):
+            return None
+        return file_hash(source)
+
+    def is_current(self, path, source_hash):
+        """Is `path` known to already have the contents hashed by
+        `source_hash`, and was it not modified since it was written?
+        """
+        if not self.enabled or not source_hash or not self._is_tracked(path):
+            return False
+        with self._lock:
+            recorded = self._load()['files'].get(path)
+        return bool(recorded) \
+            and recorded['hash'] == source_hash \
+            and recorded['stat'] is not None \
+            and recorded['stat'] == _file_stat(path)
+
+    def record(self, path, source_hash):
+        """Record that `path` was written by the current component"""
+        if not self._is_tracked(path):
+            return
+        component = current_component()
+        with self._lock:
+            files = self._load()['files']
+            recorded = files.get(path)
+            if not source_hash or not recorded \
+                    or recorded['hash'] != source_hash:
+                self._changed.add(component)
+            if source_hash:
+                files[path] = {
+                    'hash': source_hash,
+                    'stat': _file_stat(path),
+                    'component': component
+                }
+            else:
+                files.pop(path, None)
+
+    def mark_changed(self):
+        """Mark the current component as changed, for changes that weren't
+        made through `common.copy`/`common.move`
+        """
+        with self._lock:
+            self._changed.add(current_component())
+
+    def has_changes(self):
+        """Did the current component change any of its files in this run?"""
+        with self._lock:
+            return current_component() in self._changed
+
+    def is_unchanged(self, component):
+        """Are the component's hash and files the same as they were at the
+        end of the last configure?
+        """
+        name = component.__class__.__name__
+        with self._lock:
+            state = self._load()
+            current_hash = self._hash_component(
+                component, self._get_templates(name))
+            if state['components'].get(name) != current_hash:
+                return False
+            return all(
+                recorded['stat'] is not None
+                and recorded['stat'] == _file_stat(path)
+                for path, recorded in state['files'].items()
+                if recorded['component'] == name
+            )
+
+    def save(self, components):
+        from .files import write_to_file
+        with self._lock:
+            state = self._load()
+            for component in components:
+                name = component.__class__.__name__
+                templates = self._get_templates(name)
+                state['templates'][name] = templates
+                state['components'][name] = self._hash_component(
+                    component, templates)
+            write_to_file(state, self._path, json_dump=True)
+
+
+convergence = Convergence(CONVERGENCE_STATE_PATH)
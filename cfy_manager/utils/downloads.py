@@ -0,0 +1,185 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+import socket
+import hashlib
+import threading
+from collections import defaultdict
+from os.path import basename, dirname, isfile, join
+from urlparse import urldefrag, urlparse
+
+from . import common
+from .retries import RetryPolicy
+
+from ..logger import get_logger
+from ..exceptions import NetworkError
+from ..constants import DOWNLOAD_CACHE_PATH
+
+logger = get_logger('Downloads')
+
+# curl exit codes for failures that may go away when retried: couldn't
+# resolve or connect, partial transfer, timeout, TLS handshake, empty reply
+# and failed receive
+CURL_RETRY_CODES = [6, 7, 18, 28, 35, 52, 56]
+# The server doesn't support range requests, so a download can't resume
+CURL_RANGE_ERROR = 33
+DOWNLOAD_RETRIES = RetryPolicy(attempts=3, delay=2, backoff=2,
+                               retry_on_codes=CURL_RETRY_CODES)
+SHA256_FRAGMENT = 'sha256='
+
+
+class DownloadCache(object):
+    """Downloaded sources, stored by the sha256 of their contents.
+
+    Each download is kept as `<cache>/sha256/<hash>/<filename>`, and the
+    manifest maps its URL to the hash, so that a URL is only fetched once,
+    however many times the manager is installed. A URL can state the hash
+    it's expected to have as a `#sha256=<hash>` fragment; the download is
+    then verified, and skipped if the cache (which several nodes may share)
+    already has that file.
+
+    Interrupted downloads are resumed with an HTTP range request.
+    """
+    def __init__(self, directory):
+        self._directory = directory
+        self._manifest_path = join(directory, 'manifest.json')
+        self._manifest = None
+        self._lock = threading.Lock()
+        self._url_locks = defaultdict(threading.Lock)
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            from .files import read_deployed
+            try:
+                self._manifest = json.loads(
+                    read_deployed(self._manifest_path) or '{}')
+            except ValueError:
+                logger.debug('Ignoring the invalid download manifest {0}'
+                             .format(self._manifest_path))
+                self._manifest = {}
+        return self._manifest
+
+    def _save_manifest(self):
+        new_path = '{0}.new'.format(self._manifest_path)
+        common.write(json.dumps(self._manifest, indent=2, sort_keys=True,
+                                separators=(',', ': ')),
+                     new_path)
+        common.rename(new_path, self._manifest_path)
+
+    def _get_path(self, sha256, filename):
+        return join(self._directory, 'sha256', sha256, filename)
+
+    @staticmethod
+    def _parse_url(url):
+        """Return the URL without its fragment, the name of the file it
+        points to, and the sha256 it is expected to have (if any)
+        """
+        url, fragment = urldefrag(url)
+        expected_sha256 = None
+        if fragment.startswith(SHA256_FRAGMENT):
+            expected_sha256 = fragment[len(SHA256_FRAGMENT):].lower()
+        filename = basename(urlparse(url).path) or 'download'
+        return url, filename, expected_sha256
+
+    def get(self, url):
+        """Return the local path of the file at `url`, downloading it only
+        if it isn't in the cache yet
+        """
+        source_url = url
+        url, filename, expected_sha256 = self._parse_url(url)
+        with self._lock:
+            url_lock = self._url_locks[url]
+        with url_lock:
+            path = self.get_cached(source_url)
+            if path:
+                logger.debug('Using the cached download of {0}'.format(url))
+                return path
+            return self._download(url, filename, expected_sha256)
+
+    def get_cached(self, url):
+        """Return the local path of the file at `url` if it is already in
+        the cache, or None
+        """
+        url, filename, expected_sha256 = self._parse_url(url)
+        with self._lock:
+            entry = self._load_manifest().get(url)
+        sha256 = expected_sha256 or (entry and entry['sha256'])
+        if sha256 and isfile(self._get_path(sha256, filename)):
+            return self._get_path(sha256, filename)
+        return None
+
+    def prefetch(self, urls):
+        """Download all the `urls` that aren't cached yet, concurrently"""
+        urls = sorted(set(urls))
+        if urls:
+            logger.info('Fetching {0} sources...'.format(len(urls)))
+        common.gather(*[common.call_async(self.get, url) for url in urls])
+
+    def _download(self, url, filename, expected_sha256):
+        partial_dir = join(self._directory, 'partial')
+        common.mkdir(partial_dir)
+        # Named by host as well, for caches that are shared between nodes
+        partial_path = join(partial_dir, '{0}.{1}'.format(
+            hashlib.sha1(url).hexdigest(), socket.gethostname()))
+
+        logger.info('Downloading: {0}'.format(url))
+        self._curl(url, partial_path)
+
+        sha256sum = common.sudo(['sha256sum', partial_path])
+        sha256 = sha256sum.aggr_stdout.split()[0]
+        if expected_sha256 and sha256 != expected_sha256:
+            common.remove(partial_path)
+            raise NetworkError(
+                'The download of {0} has sha256 {1}, but {2} was expected'
+                .format(url, sha256, expected_sha256))
+
+        path = self._get_path(sha256, filename)
+        common.mkdir(dirname(path))
+        common.rename(partial_path, path)
+        with self._lock:
+            self._load_manifest()[url] = {
+                'sha256': sha256,
+                'filename': filename
+            }
+            self._save_manifest()
+        return path
+
+    @staticmethod
+    def _curl(url, destination):
+        curl_cmd = [
+            'curl',
+            '--silent',
+            '--show-error',
+            '--location',
+            '--fail',
+            '--continue-at', '-',
+            '--output', destination,
+            url
+        ]
+        result = common.sudo(list(curl_cmd), retries=DOWNLOAD_RETRIES,
+                             ignore_failures=True)
+        if result.returncode == CURL_RANGE_ERROR:
+            logger.debug('{0} does not support resuming, downloading it '
+                         'from the start'.format(url))
+            common.remove(destination)
+            result = common.sudo(list(curl_cmd), retries=DOWNLOAD_RETRIES,
+                                 ignore_failures=True)
+        if result.returncode != 0:
+            raise NetworkError('Failed downloading {0}: {1}'.format(
+                url, result.aggr_stderr))
+
+
+download_cache = DownloadCache(DOWNLOAD_CACHE_PATH)
@@ -0,0 +1,394 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""File operations that need root, done in-process.
+
+When run as a script (as root, via sudo), this serves requests read as JSON
+lines from stdin, and writes one JSON line per response to stdout. This
+lets a single privileged process do all the file operations of a
+`cfy_manager` run, instead of forking a `sudo` plus a coreutils binary for
+each of them. See `utils.common.file_ops` for the client.
+
+This module must only use the stdlib: it is executed by path, outside of
+the cfy_manager package.
+"""
+
+import os
+import re
+import grp
+import pwd
+import sys
+import json
+import stat
+import errno
+import base64
+import shutil
+import tempfile
+
+# The umask cfy_manager runs with, and sets for the commands it runs
+CFY_UMASK = 0o022
+SYMBOLIC_MODE = re.compile(r'^([ugoa]*)([-+=])([rwxXst]*|[ugo])$')
+WHO_BITS = {
+    'u': stat.S_IRWXU | stat.S_ISUID,
+    'g': stat.S_IRWXG | stat.S_ISGID,
+    'o': stat.S_IRWXO | stat.S_ISVTX,
+}
+PERM_BITS = {
+    'r': stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH,
+    'w': stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH,
+    'x': stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH,
+    's': stat.S_ISUID | stat.S_ISGID,
+    't': stat.S_ISVTX,
+}
+EXECUTE_BITS = PERM_BITS['x']
+
+
+def _proc_umask():
+    """The process umask as reported by the kernel (since Linux 4.7), or
+    None. Unlike os.umask(), reading it doesn't change it, which wouldn't
+    be safe with other threads creating files at the same time.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except IOError:
+        pass
+    return None
+
+
+def _umask():
+    umask = _proc_umask()
+    # Older kernels don't report it. cfy_manager sets CFY_UMASK before it
+    # does anything else, and the helper is started with it too
+    return CFY_UMASK if umask is None else umask
+
+
+def apply_mode(mode, current_mode, is_dir=False):
+    """Return the permission bits `chmod <mode>` would set.
+
+    `mode` is either octal (`640`) or symbolic, as in chmod(1): a comma
+    separated list of `[ugoa]*[-+=][rwxXst]*` clauses, e.g. `g+rw,o-rwx`.
+    """
+    # As with chmod, directories keep their setuid/setgid bits unless
+    # they're explicitly changed
+    kept = stat.S_IMODE(current_mode) & (stat.S_ISUID | stat.S_ISGID) \
+        if is_dir else 0
+    if re.match(r'^[0-7]{1,5}$', mode):
+        return int(mode, 8) | (kept if len(mode) < 5 else 0)
+    new_mode = stat.S_IMODE(current_mode)
+    for clause in mode.split(','):
+        match = SYMBOLIC_MODE.match(clause)
+        if not match:
+            raise ValueError('Invalid mode: {0}'.format(mode))
+        who, operator, perms = match.groups()
+        if 'a' in who:
+            who = 'ugo'
+        if who:
+            mask = 0
+            for w in who:
+                mask |= WHO_BITS[w]
+        else:
+            # Like chmod, `+x` (no "who") is limited by the umask
+            mask = (WHO_BITS['u'] | WHO_BITS['g'] | WHO_BITS['o']) \
+                & ~_umask()
+        if perms in WHO_BITS:
+            # Copy the permissions of another class, e.g. `g=u`
+            shift = {'u': 6, 'g': 3, 'o': 0}[perms]
+            copied = (new_mode >> shift) & 0o7
+            bits = copied << 6 | copied << 3 | copied
+        else:
+            bits = 0
+            for perm in perms:
+                if perm == 'X':
+                    if is_dir or new_mode & EXECUTE_BITS:
+                        bits |= EXECUTE_BITS
+                else:
+                    bits |= PERM_BITS[perm]
+        bits &= mask
+        if operator == '+':
+            new_mode |= bits
+        elif operator == '-':
+            new_mode &= ~bits
+        else:
+            if 's' not in perms:
+                mask &= ~kept
+            new_mode = (new_mode & ~mask) | bits
+    return new_mode
+
+
+def _walk(path):
+    """Yield `path` and, if it's a directory, everything under it"""
+    yield path
+    if os.path.isdir(path) and not os.path.islink(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                yield os.path.join(root, name)
+
+
+def mkdir(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+
+def chmod(mode, path, recursive=False):
+    paths = _walk(path) if recursive else [path]
+    for current in paths:
+        if current != path and os.path.islink(current):
+            continue
+        st = os.stat(current)
+        os.chmod(current, apply_mode(
+            mode, st.st_mode, is_dir=stat.S_ISDIR(st.st_mode)))
+
+
+def _uid(user):
+    if user in (None, '', -1):
+        return -1
+    if str(user).isdigit():
+        return int(user)
+    return pwd.getpwnam(user).pw_uid
+
+
+def _gid(group):
+    if group in (None, '', -1):
+        return -1
+    if str(group).isdigit():
+        return int(group)
+    return grp.getgrnam(group).gr_gid
+
+
+def chown(user, group, path, recursive=False):
+    uid, gid = _uid(user), _gid(group)
+    os.chown(path, uid, gid)
+    if recursive:
+        for current in _walk(path):
+            if current != path:
+                os.lchown(current, uid, gid)
+
+
+def remove(path):
+    """rm -rf"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+        return
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _copy_preserving(source, destination):
+    """Copy a single file, directory or symlink like `cp -p`"""
+    st = os.lstat(source)
+    if stat.S_ISLNK(st.st_mode):
+        if os.path.lexists(destination):
+            os.remove(destination)
+        os.symlink(os.readlink(source), destination)
+    elif stat.S_ISDIR(st.st_mode):
+        if not os.path.isdir(destination):
+            os.mkdir(destination)
+        shutil.copystat(source, destination)
+    else:
+        shutil.copy2(source, destination)
+    os.lchown(destination, st.st_uid, st.st_gid)
+
+
+def copy(source, destination):
+    """cp -rp"""
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    if not os.path.isdir(source) or os.path.islink(source):
+        _copy_preserving(source, destination)
+        return
+    for root, dirs, files in os.walk(source):
+        target_root = os.path.join(
+            destination, os.path.relpath(root, source))
+        _copy_preserving(root, os.path.normpath(target_root))
+        # Subdirectories are created when the walk gets to them
+        links = [d for d in dirs if os.path.islink(os.path.join(root, d))]
+        for name in files + links:
+            _copy_preserving(os.path.join(root, name),
+                             os.path.join(target_root, name))
+    # Directories are copied before their contents, fix their timestamps
+    for root, dirs, _ in os.walk(source):
+        target_root = os.path.normpath(os.path.join(
+            destination, os.path.relpath(root, source)))
+        shutil.copystat(root, target_root)
+
+
+def move(source, destination):
+    """`cp` followed by `rm`: an existing destination keeps its owner and
+    mode, a new one is owned by root and gets the source's mode
+    """
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    existed = os.path.exists(destination)
+    shutil.copyfile(source, destination)
+    if not existed:
+        os.chmod(destination,
+                 stat.S_IMODE(os.stat(source).st_mode) & ~_umask())
+    os.remove(source)
+
+
+def rename(source, destination):
+    """Atomically replace `destination` (on the same filesystem)"""
+    os.rename(source, destination)
+
+
+def touch(path):
+    with open(path, 'a'):
+        os.utime(path, None)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read())
+
+
+def write(path, encoded_contents):
+    with open(path, 'wb') as f:
+        f.write(base64.b64decode(encoded_contents))
+
+
+def _restore_stats(stats):
+    for path, st in reversed(stats):
+        os.lchown(path, st.st_uid, st.st_gid)
+        if not stat.S_ISLNK(st.st_mode):
+            # After the chown, which may have cleared setuid/setgid
+            os.chmod(path, stat.S_IMODE(st.st_mode))
+
+
+def _prepare_stats_change(path, recursive=False):
+    paths = _walk(path) if recursive else [path]
+    stats = [(p, os.lstat(p)) for p in paths]
+    return lambda: _restore_stats(stats), None
+
+
+def _prepare_chown(user, group, path, recursive=False):
+    return _prepare_stats_change(path, recursive)
+
+
+def _prepare_chmod(mode, path, recursive=False):
+    return _prepare_stats_change(path, recursive)
+
+
+def _prepare_mkdir(path):
+    created = None
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        created, path = path, os.path.dirname(path)
+    if created is None:
+        return None, None
+    return lambda: remove(created), None
+
+
+def _prepare_copy(source, destination):
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    if not os.path.lexists(destination):
+        return lambda: remove(destination), None
+    backup_dir = tempfile.mkdtemp(prefix='cfy-fileops-')
+    copy(destination, backup_dir)
+    backup = os.path.join(backup_dir, os.path.basename(destination))
+
+    def undo():
+        remove(destination)
+        copy(backup, destination)
+    return undo, lambda: remove(backup_dir)
+
+
+# Operations that may be batched, and how to prepare for undoing them
+BATCH_OPERATIONS = {
+    'mkdir': _prepare_mkdir,
+    'chmod': _prepare_chmod,
+    'chown': _prepare_chown,
+    'copy': _prepare_copy,
+}
+
+
+def batch(operations):
+    """Run `[[op, args], ...]` in order.
+
+    If any of them fails, the ones that already ran (including the failed
+    one, which may have been partially done) are undone, in reverse order.
+    """
+    undos, cleanups = [], []
+    try:
+        for operation, args in operations:
+            if operation not in BATCH_OPERATIONS:
+                raise ValueError(
+                    'Cannot batch operation: {0}'.format(operation))
+            undo, cleanup = BATCH_OPERATIONS[operation](*args)
+            undos.append(undo)
+            cleanups.append(cleanup)
+            OPERATIONS[operation](*args)
+    except Exception:
+        exc_info = sys.exc_info()
+        for undo in reversed(undos):
+            if undo is None:
+                continue
+            try:
+                undo()
+            except (OSError, IOError):
+                # Keep undoing the rest, and report the original error
+                pass
+        raise exc_info[0], exc_info[1], exc_info[2]
+    finally:
+        for cleanup in cleanups:
+            if cleanup is not None:
+                cleanup()
+
+
+OPERATIONS = {
+    'mkdir': mkdir,
+    'chmod': chmod,
+    'chown': chown,
+    'remove': remove,
+    'copy': copy,
+    'move': move,
+    'rename': rename,
+    'touch': touch,
+    'read': read,
+    'write': write,
+    'batch': batch,
+}
+
+
+def handle(request):
+    """Run a single `{"op": ..., "args": [...]}` request"""
+    try:
+        result = OPERATIONS[request['op']](*request.get('args', []))
+    except EnvironmentError as e:
+        # Also shutil.Error, which isn't an OSError/IOError in python 2
+        return {'error': str(e), 'errno': e.errno}
+    except (KeyError, ValueError, TypeError) as e:
+        return {'error': '{0}: {1}'.format(type(e).__name__, e)}
+    return {'result': result}
+
+
+def serve(requests=sys.stdin, responses=sys.stdout):
+    for line in iter(requests.readline, ''):
+        response = handle(json.loads(line))
+        responses.write(json.dumps(response) + '\n')
+        responses.flush()
+
+
+if __name__ == '__main__':
+    serve()
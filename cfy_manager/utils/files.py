@@ -16,14 +16,17 @@
 import os
 import re
 import json
+import errno
+import base64
 from glob import glob
 from tempfile import mkstemp
 from os.path import join, isabs
 
-from jinja2 import Environment, FileSystemLoader
-
-from .network import is_url, curl_download
-from .common import move, sudo, copy, remove
+from .network import is_url
+from .downloads import download_cache
+from .sources import sources_index
+from .common import move, sudo, copy, remove, file_ops
+from .convergence import convergence
 
 from ..config import config
 from ..logger import get_logger
@@ -32,7 +35,7 @@ from ..constants import CLOUDIFY_SOURCES_PATH, COMPONENTS_DIR
 
 logger = get_logger('Files')
 
-_template_env = Environment(loader=FileSystemLoader('/'))
+_template_env = None
 
 
 def _read(path):
@@ -41,10 +44,23 @@ def _read(path):
 
 
 def sudo_read(path):
-    # This will probably fail with binary files
-    # If we start needing it for such files, the best approach is likely:
-    # copy to tmpfile; chown; read; delete tmpfile
-    return sudo(['cat', path]).aggr_stdout
+    return base64.b64decode(file_ops.call('read', path))
+
+
+def read_deployed(path):
+    """Return the contents of a deployed file, or None if it doesn't exist.
+
+    sudo is only used if the current user isn't allowed to read the file.
+    """
+    try:
+        return _read(path)
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            return None
+    try:
+        return sudo_read(path)
+    except FileError:
+        return None
 
 
 def replace_in_file(this, with_this, in_here):
@@ -74,7 +90,7 @@ def ln(source, target, params=None):
 
 def get_local_source_path(source_url):
     if is_url(source_url):
-        return curl_download(source_url)
+        return download_cache.get(source_url)
     # If it's already an absolute path, just return it
     if isabs(source_url):
         return source_url
@@ -86,7 +102,11 @@ def get_local_source_path(source_url):
 
 def get_glob_path(path):
     if '*' in path:
-        matching_paths = glob(path)
+        if os.path.dirname(path) == CLOUDIFY_SOURCES_PATH:
+            # Listed once, rather than globbed for every source
+            matching_paths = sources_index.match(path)
+        else:
+            matching_paths = glob(path)
         if not matching_paths:
             raise FileError(
                 'Could not locate source matching {0}'.format(path)
@@ -131,13 +151,28 @@ def remove_temp_files():
 def remove_files(file_list, ignore_failure=False):
     for path in file_list:
         logger.debug('Removing {0}...'.format(path))
-        sudo(['rm', '-rf', path], ignore_failures=ignore_failure)
+        remove(path, ignore_failure=ignore_failure)
 
 
-def deploy(src, dst, render=True):
+def render_template(src, additional_context=None):
+    """Render the template at `src` with the current config, and any
+    additional template variables
+    """
+    global _template_env
+    if _template_env is None:
+        # jinja2 is only needed by the commands that deploy files
+        from jinja2 import Environment, FileSystemLoader
+        _template_env = Environment(loader=FileSystemLoader('/'))
+    convergence.record_template(src)
+    template = _template_env.get_template(src)
+    context = dict(config)
+    context.update(additional_context or {})
+    return template.render(**context)
+
+
+def deploy(src, dst, render=True, additional_context=None):
     if render:
-        template = _template_env.get_template(src)
-        content = template.render(**config)
+        content = render_template(src, additional_context)
         write_to_file(content, dst)
     else:
         copy(src, dst)
@@ -164,4 +199,4 @@ def temp_copy(source):
 
 def touch(file_path):
     """ Create an empty file in the provided path """
-    sudo(['touch', file_path])
+    file_ops.call('touch', file_path)
@@ -13,13 +13,80 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import os
+import threading
+from os.path import join
+from urlparse import urldefrag
+
 from ..logger import get_logger
+from ..exceptions import FileError
 
-from .common import run, sudo
+from .common import call_async, gather, move, probe_cache, run, sudo
 from .files import get_local_source_path
+from .network import is_url
+from .downloads import download_cache
+from .sources import sources_index, rpm_full_name
 
 logger = get_logger('yum')
 
+# Changes whenever packages are installed or removed, so rpm queries can be
+# cached until it does
+RPM_DB_PATH = '/var/lib/rpm/Packages'
+
+# One line per installed package, see InstalledPackages
+RPM_QUERY_FORMAT = '%{NAME}\t%{VERSION}\t%{RELEASE}\t%{ARCH}\n'
+
+# Only one rpm transaction can run at a time; yum would otherwise sit
+# waiting for the lock, and rpm -e fails outright
+_transaction_lock = threading.Lock()
+
+
+class InstalledPackages(object):
+    """The packages installed on this machine, read with a single `rpm -qa`.
+
+    A package can be looked up the way `rpm -q` accepts it: by name,
+    name.arch, name-version, name-version-release or
+    name-version-release.arch. The snapshot is kept until the rpmdb changes,
+    or until `refresh` is called after a transaction.
+    """
+    def __contains__(self, package):
+        return package in self._get_packages()
+
+    def get(self, package):
+        """Return the name-version-release.arch of the installed `package`,
+        or None if it isn't installed
+        """
+        return self._get_packages().get(package)
+
+    def _get_packages(self):
+        return probe_cache.get('rpm -qa', [RPM_DB_PATH], self._load)
+
+    @staticmethod
+    def _load():
+        logger.debug('Listing the installed packages...')
+        result = run(['rpm', '-qa', '--qf', RPM_QUERY_FORMAT],
+                     ignore_failures=True)
+        packages = {}
+        for line in result.aggr_stdout.splitlines():
+            fields = line.split('\t')
+            if len(fields) != 4:
+                continue
+            name, version, release, arch = fields
+            nvr = '{0}-{1}-{2}'.format(name, version, release)
+            full_name = '{0}.{1}'.format(nvr, arch)
+            for spelling in [name, '{0}.{1}'.format(name, arch),
+                             '{0}-{1}'.format(name, version), nvr,
+                             full_name]:
+                packages[spelling] = full_name
+        return packages
+
+    @staticmethod
+    def refresh():
+        probe_cache.invalidate(RPM_DB_PATH)
+
+
+installed_packages = InstalledPackages()
+
 
 class RpmPackageHandler(object):
 
@@ -35,39 +102,27 @@ class RpmPackageHandler(object):
             logger.debug(
                 'Removing existing package sources for package '
                 'with name: {0}'.format(self.package_name))
-            sudo(['rpm', '--noscripts', '-e', self.package_name])
+            with _transaction_lock:
+                try:
+                    sudo(['rpm', '--noscripts', '-e', self.package_name])
+                finally:
+                    installed_packages.refresh()
 
     @staticmethod
     def is_package_installed(name):
-        installed = run(['rpm', '-q', name], ignore_failures=True)
-        if installed.returncode == 0:
-            return True
-        return False
+        return name in installed_packages
 
     def is_rpm_installed(self):
         """Returns true if provided rpm is already installed.
         """
-        src_query = run(['rpm', '-qp', self.source_path])
-        source_name = src_query.aggr_stdout.rstrip('\n\r')
-
-        return self.is_package_installed(source_name)
+        header = sources_index.get_rpm_header(self.source_path)
+        return self.is_package_installed(rpm_full_name(header))
 
     def get_rpm_package_name(self):
         """Returns the package name according to the info provided in the
         source file.
         """
-        split_index = ' : '
-        package_details = {}
-        package_details_query = run(['rpm', '-qpi', self.source_path])
-        rows = package_details_query.aggr_stdout.split('\n')
-        # split raw data according to the ' : ' index
-        for row in rows:
-            if split_index in row:
-                first_columb_index = row.index(split_index)
-                key = row[:first_columb_index].strip()
-                value = row[first_columb_index + len(split_index):].strip()
-                package_details[key] = value
-        return package_details['Name']
+        return sources_index.get_rpm_header(self.source_path)['name']
 
 
 def _yum_install(package, package_name=None, disable_all_repos=True):
@@ -76,7 +131,11 @@ def _yum_install(package, package_name=None, disable_all_repos=True):
     install_cmd = ['yum', 'install', '-y', '--disablerepo=*', package]
     if not disable_all_repos:
         install_cmd.remove('--disablerepo=*')
-    sudo(install_cmd)
+    with _transaction_lock:
+        try:
+            sudo(install_cmd, stream=True)
+        finally:
+            installed_packages.refresh()
 
 
 def _install_rpm(rpm_path):
@@ -100,17 +159,20 @@ def _install_rpm(rpm_path):
 
 
 def _install_yum_package(package_name, disable_all_repos=True):
-    is_installed = run(
-        ['yum', '-q', 'list', 'installed', package_name],
-        ignore_failures=True
-    )
-    if is_installed.returncode == 0:
+    if package_name in installed_packages:
         logger.debug('Package {0} is already installed.'.format(
             package_name))
         return
     _yum_install(package=package_name, disable_all_repos=disable_all_repos)
 
 
+def is_rpm_source(source):
+    """Is `source` an rpm (a path or a URL, possibly with a `#sha256=`
+    fragment), rather than the name of a yum-repo based package?
+    """
+    return urldefrag(source)[0].endswith('.rpm')
+
+
 def yum_install(source, disable_all_repos=True):
     """Installs a package using yum.
 
@@ -123,23 +185,17 @@ def yum_install(source, disable_all_repos=True):
     If the source is a package name, it will check whether it is already
     installed. If it is, it will do nothing. It not, it will install it.
 
-    If the source is a url to an rpm and the file doesn't already exist
-    in a predesignated archives file path (${CLOUDIFY_SOURCES_PATH}/),
-    it will download it. It will then use that file to check if the
-    package is already installed. If it is, it will do nothing. If not,
-    it will install it.
-
-    NOTE: This will currently not take into considerations situations
-    in which a file was partially downloaded. If a file is partially
-    downloaded, a re-download will not take place and rather an
-    installation will be attempted, which will obviously fail since
-    the rpm file is incomplete.
-    ALSO NOTE: you cannot provide `yum_install` with a space
+    If the source is a url to an rpm, it will be downloaded into the
+    download cache (see `downloads.DownloadCache`), unless it is already
+    there. It will then use that file to check if the package is already
+    installed. If it is, it will do nothing. If not, it will install it.
+
+    NOTE: you cannot provide `yum_install` with a space
     separated array of packages as you can with `yum install`. You must
     provide one package per invocation.
     """
     # source is a url or a local file name
-    if source.endswith('.rpm'):
+    if is_rpm_source(source):
         local_path = get_local_source_path(source)
         _install_rpm(local_path)
     # source is the name of a yum-repo based package name
@@ -148,10 +204,95 @@ def yum_install(source, disable_all_repos=True):
                              disable_all_repos=disable_all_repos)
 
 
+def installed_versions(sources):
+    """Return the name-version-release.arch of the installed package of
+    each of `sources` (anything `yum_install` accepts), by source.
+
+    Nothing is downloaded: an rpm URL that isn't in the download cache, or
+    any rpm whose header can't be read, maps to None, as does a package
+    that isn't installed.
+    """
+    versions = {}
+    for source in sources:
+        package_name = source
+        if is_rpm_source(source):
+            try:
+                if is_url(source):
+                    local_path = download_cache.get_cached(source)
+                else:
+                    local_path = get_local_source_path(source)
+                package_name = local_path and \
+                    sources_index.get_rpm_header(local_path)['name']
+            except FileError as e:
+                logger.debug('Could not find the package of {0}: {1}'
+                             .format(source, e))
+                package_name = None
+        versions[source] = installed_packages.get(package_name) \
+            if package_name else None
+    return versions
+
+
+def install_packages(sources):
+    """Install all the packages in a single yum transaction.
+
+    `sources` are (source, disable_all_repos) pairs, where source is
+    anything `yum_install` accepts. Packages that are already installed
+    are skipped, and other installed versions of the local rpms are
+    removed first, like `yum_install` does. The yum repos are only enabled
+    if one of the packages that need them isn't installed yet.
+    """
+    to_install = []
+    to_remove = []
+    disable_all_repos = True
+    for source, source_disable_all_repos in sources:
+        if is_rpm_source(source):
+            rpm_handler = RpmPackageHandler(get_local_source_path(source))
+            package_name = rpm_handler.package_name
+            if rpm_handler.is_rpm_installed():
+                logger.debug('Package {0} is already installed.'.format(
+                    package_name))
+                continue
+            if rpm_handler.is_package_installed(package_name):
+                to_remove.append(package_name)
+            package = rpm_handler.source_path
+        else:
+            package_name = package = source
+            if package in installed_packages:
+                logger.debug('Package {0} is already installed.'.format(
+                    package_name))
+                continue
+            disable_all_repos = disable_all_repos and source_disable_all_repos
+        if package not in to_install:
+            logger.debug('Will install {0}'.format(package_name))
+            to_install.append(package)
+
+    with _transaction_lock:
+        try:
+            if to_remove:
+                logger.debug('Removing existing versions of: {0}'.format(
+                    ', '.join(to_remove)))
+                sudo(['rpm', '--noscripts', '-e'] +
+                     sorted(set(to_remove)))
+            if not to_install:
+                logger.info('All packages are already installed')
+                return
+            logger.info('Installing {0} packages...'.format(len(to_install)))
+            install_cmd = ['yum', 'install', '-y']
+            if disable_all_repos:
+                install_cmd.append('--disablerepo=*')
+            sudo(install_cmd + to_install, stream=True)
+        finally:
+            installed_packages.refresh()
+
+
 def yum_remove(package, ignore_failures=False):
     logger.info('yum removing {0}...'.format(package))
     try:
-        sudo(['yum', 'remove', '-y', package])
+        with _transaction_lock:
+            try:
+                sudo(['yum', 'remove', '-y', package], stream=True)
+            finally:
+                installed_packages.refresh()
     except BaseException:
         msg = 'Package `{0}` may not been removed successfully'.format(package)
         if not ignore_failures:
@@ -173,4 +314,59 @@ def pip_install(source, venv='', constraints_file=None):
         log_message += ' using constraints file {0}'.format(constraints_file)
 
     logger.info(log_message)
-    sudo(cmdline)
+    sudo(cmdline, stream=True)
+
+
+def _get_pip(venv=''):
+    return '{0}/bin/pip'.format(venv) if venv else 'pip'
+
+
+def build_wheels(sources, wheelhouse, venv='', constraints_file=None):
+    """Build a wheel of each of the sources, and of their dependencies,
+    into `wheelhouse`.
+
+    The sources are built side by side, each one only once however many
+    times it's listed. Returns the path of each source's wheel, by source.
+    """
+    pip_cmd = _get_pip(venv)
+    constraints = ['-c', constraints_file] if constraints_file else []
+
+    def _build_wheel(index, source):
+        # Built into a directory of its own, so we know which wheel it is
+        source_dir = join(wheelhouse, 'sources', str(index))
+        sudo([pip_cmd, 'wheel', '--no-deps', '--wheel-dir', source_dir,
+              source] + constraints, stream=True)
+        wheel_name = os.listdir(source_dir)[0]
+        wheel = join(wheelhouse, wheel_name)
+        move(join(source_dir, wheel_name), wheel)
+        return wheel
+
+    unique_sources = []
+    for source in sources:
+        if source not in unique_sources:
+            unique_sources.append(source)
+    logger.info('Building wheels of {0} sources...'.format(
+        len(unique_sources)))
+    wheels = gather(*[call_async(_build_wheel, index, source)
+                      for index, source in enumerate(unique_sources)])
+
+    logger.info('Building wheels of their dependencies...')
+    sudo([pip_cmd, 'wheel', '--wheel-dir', wheelhouse,
+          '--find-links', wheelhouse] + constraints + wheels, stream=True)
+    return dict(zip(unique_sources, wheels))
+
+
+def pip_install_wheels(wheels, wheelhouse, venv='', constraints_file=None):
+    """Install the `wheels` in a single pip run, with their dependencies
+    taken only from `wheelhouse`
+    """
+    cmdline = [_get_pip(venv), 'install', '--upgrade', '--no-index',
+               '--find-links', wheelhouse] + wheels
+    log_message = 'Installing {0} packages'.format(len(wheels))
+    if venv:
+        log_message += ' in virtualenv {0}'.format(venv)
+    if constraints_file:
+        cmdline.extend(['-c', constraints_file])
+
+    logger.info(log_message)
+    sudo(cmdline, stream=True)
@@ -0,0 +1,111 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+import hashlib
+import threading
+from os.path import isfile
+
+from .files import sudo_read, write_to_file
+from .common import remove
+from .run_context import current_component, current_phase
+
+from ..logger import get_logger
+from ..constants import JOURNAL_FILE_PATH
+
+logger = get_logger('Journal')
+
+STEP_DONE = 'done'
+STEP_FAILED = 'failed'
+
+
+def _hash_inputs(inputs):
+    serialized = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(serialized).hexdigest()
+
+
+class Journal(object):
+    """A persistent record of the steps that completed in previous runs.
+
+    Steps are keyed by component, phase and step name, and remember a hash
+    of their inputs. When a failed install/configure is rerun, the steps
+    that completed with the same inputs are skipped, up until the first
+    step that previously failed, or whose inputs changed. From that point
+    on, all steps are run again. The journal is cleared once a run
+    finishes successfully.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._steps = None
+        self._replaying = True
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._steps is None:
+            self._steps = {}
+            if isfile(self._path):
+                # The journal may contain generated secrets, so it's only
+                # readable by root
+                self._steps = json.loads(sudo_read(self._path))
+        return self._steps
+
+    def _record(self, key, inputs_hash, status, result=None):
+        with self._lock:
+            self._load()[key] = {
+                'inputs': inputs_hash,
+                'status': status,
+                'result': result
+            }
+            write_to_file(self._steps, self._path, json_dump=True)
+
+    def run_step(self, step, inputs, func, *args, **kwargs):
+        """Call `func`, unless it already completed in a previous run.
+
+        :param step: The name of the step, unique within its component
+        :param inputs: Everything the step depends on. Must be JSON
+                       serializable
+        :return: The return value of `func`, or the value it returned in the
+                 previous run if the step is skipped. Steps that change the
+                 config should return the values they set, so they can be
+                 set again when the step is skipped.
+        """
+        key = '{0}/{1}/{2}'.format(current_component(), current_phase(), step)
+        inputs_hash = _hash_inputs(inputs)
+        with self._lock:
+            previous = self._load().get(key)
+            if self._replaying and previous \
+                    and previous['status'] == STEP_DONE \
+                    and previous['inputs'] == inputs_hash:
+                logger.info('Skipping {0}, it was completed in a previous '
+                            'run'.format(key))
+                return previous['result']
+            self._replaying = False
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self._record(key, inputs_hash, STEP_FAILED)
+            raise
+        self._record(key, inputs_hash, STEP_DONE, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._steps = {}
+            if isfile(self._path):
+                remove(self._path)
+
+
+journal = Journal(JOURNAL_FILE_PATH)
@@ -15,7 +15,7 @@
 
 from os.path import join, isdir
 
-from .files import deploy
+from .files import deploy, render_template
 from .common import chown, mkdir, chmod, remove
 
 from ..logger import get_logger
@@ -26,6 +26,20 @@ LOGROTATED_PATH = '/etc/logrotate.d'
 logger = get_logger('logrotate')
 
 
+def _get_logrotate_paths(service_name):
+    src = join(COMPONENTS_DIR, service_name, 'config', 'logrotate')
+    dst = join(LOGROTATED_PATH, service_name)
+    return src, dst
+
+
+def render_logrotate(service_name):
+    """Return the path of the service's logrotate config, and the contents
+    `set_logrotate` would deploy there
+    """
+    src, dst = _get_logrotate_paths(service_name)
+    return dst, render_template(src)
+
+
 def set_logrotate(service_name):
     """Deploys a logrotate config for a service.
 
@@ -35,9 +49,7 @@ def set_logrotate(service_name):
     its own logrotate configuration, we will override it.
     """
     logger.debug('Deploying logrotate config...')
-    src = join(COMPONENTS_DIR, service_name, 'config', 'logrotate')
-    dst = join(LOGROTATED_PATH, service_name)
-
+    src, dst = _get_logrotate_paths(service_name)
     deploy(src, dst)
     chmod('644', dst)
     chown('root', 'root', dst)
@@ -13,18 +13,14 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-import os
 import socket
 import base64
-import urllib2
 from time import sleep
-from tempfile import mkstemp
 from urlparse import urlparse
 
 from ..exceptions import NetworkError
 from ..components.service_names import MANAGER
 
-from .common import run
 from ..config import config
 from ..logger import get_logger
 
@@ -63,36 +59,6 @@ def wait_for_port(port, host='localhost'):
     )
 
 
-def curl_download(source, destination=None):
-    """Download file using the curl command.
-
-    :param source: Source URL for the file to download
-    :typ source: str
-    :param destination:
-        Path to the directory where the file should be downloaded.
-        If none is provided, a temp file will be used
-    :type destination: str
-
-    """
-    if not destination:
-        suffix = '.{0}'.format(source.split('.')[-1])
-        fd, destination = mkstemp(suffix=suffix)
-        os.close(fd)
-        config.add_temp_path_to_clean(destination)
-
-    curl_cmd = [
-        'curl',
-        '--silent',
-        '--show-error',
-        '--location', source,
-        '--create-dir',
-        '--output', destination,
-    ]
-    logger.info('Downloading: {0} into {1}'.format(source, destination))
-    run(curl_cmd)
-    return destination
-
-
 def get_auth_headers():
     security = config[MANAGER]['security']
     username = security['admin_username']
@@ -106,6 +72,7 @@ def get_auth_headers():
 
 
 def check_http_response(url, **request_kwargs):
+    import urllib2
     req = urllib2.Request(url, **request_kwargs)
     try:
         response = urllib2.urlopen(req)
@@ -0,0 +1,75 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import time
+import pstats
+import cProfile
+import threading
+from os.path import join
+
+from ..logger import get_logger, LOG_DIR
+
+logger = get_logger('Profile')
+
+PROFILE_SUMMARY_LIMIT = 50
+
+
+class CommandProfiler(object):
+    """cProfile a single `cfy_manager` command, for `--profile`.
+
+    Threads started while profiling (see `--jobs`) are profiled as well,
+    and their stats are merged with the main thread's.
+    """
+    def __init__(self):
+        self._command = None
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def start(self, namespace):
+        """argh `pre_call` hook: start profiling if --profile was passed"""
+        if not getattr(namespace, 'profile', False):
+            return
+        self._command = namespace.function.__name__
+        threading.setprofile(self._profile_thread)
+        self._new_profile().enable()
+
+    def _new_profile(self):
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def _profile_thread(self, frame, event, arg):
+        # Called once in every new thread; enabling the profile replaces
+        # this function as the thread's profiler
+        self._new_profile().enable()
+
+    def stop(self):
+        """Stop profiling and write the stats next to cfy_manager.log"""
+        if not self._profiles:
+            return
+        threading.setprofile(None)
+        self._profiles[0].disable()
+
+        base_path = join(LOG_DIR, 'cfy_manager-{0}-{1}'.format(
+            self._command, time.strftime('%Y%m%d-%H%M%S')))
+        stats_path = base_path + '.pstats'
+        summary_path = base_path + '.txt'
+        with open(summary_path, 'w') as f:
+            stats = pstats.Stats(*self._profiles, stream=f)
+            stats.dump_stats(stats_path)
+            stats.sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LIMIT)
+        logger.notice('Profile written to {0}, summary in {1}'.format(
+            stats_path, summary_path))
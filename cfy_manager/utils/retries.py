@@ -0,0 +1,113 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import re
+import time
+import random
+from functools import wraps
+
+from ..logger import get_logger
+
+logger = get_logger('retries')
+
+
+class RetryPolicy(object):
+    """How, and how long, to keep retrying something that failed.
+
+    The wait before the n-th retry is `delay * backoff ** (n - 1)`, capped
+    at `max_delay` and randomized by +/- `jitter` (a fraction of it).
+    Retrying stops after `attempts` retries, or once `max_total_wait`
+    seconds were spent waiting, whichever comes first.
+
+    For commands, `retry_on_codes` and `retry_on_stderr` (regexes) limit
+    retrying to the failures that are known to be transient; by default
+    any failure is retried.
+    """
+    def __init__(self,
+                 attempts=3,
+                 delay=1,
+                 backoff=2,
+                 max_delay=30,
+                 max_total_wait=120,
+                 jitter=0.2,
+                 retry_on_codes=None,
+                 retry_on_stderr=None):
+        self.attempts = attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.max_total_wait = max_total_wait
+        self.jitter = jitter
+        self.retry_on_codes = retry_on_codes
+        self.retry_on_stderr = [re.compile(pattern)
+                                for pattern in retry_on_stderr or []]
+
+    def delays(self):
+        """Yield the time to wait before each retry"""
+        waited = 0
+        delay = self.delay
+        for _ in range(self.attempts):
+            wait = min(delay, self.max_delay)
+            wait *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            if self.max_total_wait is not None:
+                remaining = self.max_total_wait - waited
+                if remaining <= 0:
+                    return
+                wait = min(wait, remaining)
+            waited += wait
+            yield wait
+            delay *= self.backoff
+
+    def should_retry(self, return_code, stderr=''):
+        """Is this failure of a command worth retrying?"""
+        if self.retry_on_codes is not None \
+                and return_code not in self.retry_on_codes:
+            return False
+        if self.retry_on_stderr:
+            return any(pattern.search(stderr or '')
+                       for pattern in self.retry_on_stderr)
+        return True
+
+    def retry_on(self, *exceptions):
+        """Decorator, retrying the function when it raises `exceptions`"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                delays = self.delays()
+                while True:
+                    try:
+                        return func(*args, **kwargs)
+                    except exceptions as e:
+                        delay = next(delays, None)
+                        if delay is None:
+                            raise
+                        logger.debug('{0} failed ({1}), retrying in '
+                                     '{2:.1f}s'.format(func.__name__, e,
+                                                       delay))
+                        time.sleep(delay)
+            return wrapper
+        return decorator
+
+
+NO_RETRIES = RetryPolicy(attempts=0)
+
+
+def get_retry_policy(retries):
+    """`retries` may be a RetryPolicy, or a number of retries"""
+    if isinstance(retries, RetryPolicy):
+        return retries
+    if not retries:
+        return NO_RETRIES
+    return RetryPolicy(attempts=retries)
@@ -0,0 +1,41 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import threading
+from contextlib import contextmanager
+
+_state = threading.local()
+
+
+@contextmanager
+def running(component, phase):
+    """Mark the current thread as running `phase` (e.g. `configure`) of
+    `component`, for anything that needs to know which component it is
+    acting on behalf of.
+    """
+    previous = current_component(), current_phase()
+    _state.component, _state.phase = component, phase
+    try:
+        yield
+    finally:
+        _state.component, _state.phase = previous
+
+
+def current_component():
+    return getattr(_state, 'component', None)
+
+
+def current_phase():
+    return getattr(_state, 'phase', None)
@@ -0,0 +1,241 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import json
+import errno
+import struct
+import hashlib
+import threading
+from fnmatch import fnmatch
+from os.path import join, dirname, abspath
+
+from ..logger import get_logger
+from ..exceptions import FileError
+from ..constants import CLOUDIFY_SOURCES_PATH, SOURCES_INDEX_PATH
+
+logger = get_logger('Sources')
+
+RPM_LEAD_MAGIC = b'\xed\xab\xee\xdb'
+RPM_LEAD_SIZE = 96
+RPM_HEADER_MAGIC = b'\x8e\xad\xe8'
+RPM_INT32_TYPE = 4
+RPM_STRING_TYPES = (6, 8, 9)  # string, string array, i18n string
+# The header tags we index, by tag number
+RPM_TAGS = {
+    1000: 'name',
+    1001: 'version',
+    1002: 'release',
+    1003: 'epoch',
+    1022: 'arch'
+}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _read_header(f):
+    """Read an rpm header structure (signature or main) from `f`, and
+    return its index entries and data store
+    """
+    intro = f.read(16)
+    if len(intro) != 16 or intro[:3] != RPM_HEADER_MAGIC:
+        raise ValueError('bad header magic')
+    entries_count, data_size = struct.unpack('>II', intro[8:])
+    index = f.read(16 * entries_count)
+    data = f.read(data_size)
+    if len(index) != 16 * entries_count or len(data) != data_size:
+        raise ValueError('truncated header')
+    entries = [struct.unpack('>iIiI', index[i:i + 16])
+               for i in range(0, len(index), 16)]
+    return entries, data
+
+
+def read_rpm_header(path):
+    """Return the name, version, release, epoch and arch of the rpm at
+    `path`, read from its header like `rpm -qp` would
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(RPM_LEAD_SIZE)[:4] != RPM_LEAD_MAGIC:
+                raise ValueError('bad lead magic')
+            # The signature header is padded to a multiple of 8 bytes
+            entries, data = _read_header(f)
+            f.read(-(16 * len(entries) + len(data)) % 8)
+            entries, data = _read_header(f)
+    except (IOError, ValueError, struct.error) as e:
+        raise FileError('Could not read the rpm header of {0}: {1}'
+                        .format(path, e))
+
+    header = dict((field, None) for field in RPM_TAGS.values())
+    for tag, value_type, offset, count in entries:
+        if tag not in RPM_TAGS:
+            continue
+        if value_type in RPM_STRING_TYPES:
+            value = data[offset:data.index(b'\0', offset)]
+        elif value_type == RPM_INT32_TYPE:
+            value = struct.unpack('>i', data[offset:offset + 4])[0]
+        else:
+            continue
+        header[RPM_TAGS[tag]] = value
+    return header
+
+
+def rpm_full_name(header):
+    """name-version-release.arch, as printed by `rpm -qp`"""
+    return '{name}-{version}-{release}.{arch}'.format(**header)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except IOError as e:
+        raise FileError('Could not read {0}: {1}'.format(path, e))
+    return digest.hexdigest()
+
+
+class SourcesIndex(object):
+    """The files in the sources directory, and the headers of its rpms.
+
+    The directory is listed once, and again only when its mtime changes,
+    to resolve globs. An rpm's name, version, release, epoch and arch are
+    read from its header the first time it is looked up, and saved to
+    `cache_path` along with its size and mtime; its sha256 only if it was
+    asked for. An entry is reused for as long as the file's size and mtime
+    are the same, so looking up packages doesn't need to run `rpm -qp`,
+    nor read the rpms again on later runs.
+    """
+    def __init__(self, directory, cache_path):
+        self._directory = directory
+        self._cache_path = cache_path
+        self._lock = threading.Lock()
+        self._filenames = None
+        self._directory_mtime = None
+        self._entries = None
+
+    def _load_cache(self):
+        from .files import read_deployed
+        try:
+            cached = json.loads(read_deployed(self._cache_path) or '{}')
+        except ValueError:
+            logger.debug('Ignoring the invalid sources index {0}'
+                         .format(self._cache_path))
+            cached = {}
+        return cached if isinstance(cached, dict) else {}
+
+    def _save_cache(self):
+        from .files import write_to_file
+        logger.debug('Saving the sources index to {0}...'
+                     .format(self._cache_path))
+        try:
+            write_to_file(self._entries, self._cache_path, json_dump=True)
+        except FileError as e:
+            # The index is only an optimization, it'll be rebuilt next time
+            logger.debug('Could not save the sources index: {0}'.format(e))
+
+    @staticmethod
+    def _is_current(entry, stat):
+        return isinstance(entry, dict) \
+            and entry.get('size') == stat.st_size \
+            and entry.get('mtime') == stat.st_mtime
+
+    def _refresh(self):
+        """List the directory, unless it didn't change since it was last
+        listed
+        """
+        try:
+            mtime = os.stat(self._directory).st_mtime
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            mtime = None
+        if self._filenames is not None and mtime == self._directory_mtime:
+            return
+        self._directory_mtime = mtime
+        self._filenames = sorted(os.listdir(self._directory)) \
+            if mtime is not None else []
+
+    def _get_entry(self, path):
+        """Return the index entry of the rpm at `path`, reading its header
+        if it isn't indexed yet, or was modified since
+        """
+        filename = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise FileError('Could not read the rpm header of {0}: {1}'
+                            .format(path, e))
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load_cache()
+            entry = self._entries.get(filename)
+            if self._is_current(entry, stat):
+                return entry
+            logger.debug('Indexing {0}...'.format(path))
+            entry = read_rpm_header(path)
+            entry.update({
+                'size': stat.st_size,
+                'mtime': stat.st_mtime
+            })
+            # Forget the rpms that aren't in the directory anymore
+            self._refresh()
+            self._entries = dict(
+                (name, self._entries[name]) for name in self._filenames
+                if name in self._entries)
+            self._entries[filename] = entry
+            self._save_cache()
+            return entry
+
+    def _in_directory(self, path):
+        return dirname(abspath(path)) == abspath(self._directory)
+
+    def match(self, pattern):
+        """Return the paths of the files in the directory whose names match
+        the glob `pattern`
+        """
+        filename_pattern = os.path.basename(pattern)
+        with self._lock:
+            self._refresh()
+            return [join(self._directory, filename)
+                    for filename in self._filenames
+                    if fnmatch(filename, filename_pattern)]
+
+    def get_rpm_header(self, path):
+        """Return the header fields of the rpm at `path`, plus its size and
+        mtime if it is in the directory
+        """
+        if not self._in_directory(path):
+            return read_rpm_header(path)
+        return dict(self._get_entry(path))
+
+    def get_sha256(self, path):
+        """Return the sha256 of the rpm at `path`, computed only once for
+        as long as the file is unchanged if it is in the directory
+        """
+        if not self._in_directory(path):
+            return _sha256(path)
+        entry = self._get_entry(path)
+        with self._lock:
+            sha256 = entry.get('sha256')
+        if sha256 is None:
+            sha256 = _sha256(path)
+            with self._lock:
+                entry['sha256'] = sha256
+                self._save_cache()
+        return sha256
+
+
+sources_index = SourcesIndex(CLOUDIFY_SOURCES_PATH, SOURCES_INDEX_PATH)
@@ -13,38 +13,134 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from os.path import join
+import threading
+from collections import OrderedDict
+from os.path import join, dirname, basename
 
 from .. import constants
 from ..logger import get_logger
 from ..exceptions import ValidationError
 
-from .files import deploy
-from .common import sudo, chmod, chown
+from .files import deploy, read_deployed
+from .common import sudo, chmod, chown, remove, rename, write
+from .convergence import convergence
 
 logger = get_logger('sudoers')
 
+SUDOERS_HEADER = '# Managed by cfy_manager, changes to this file will be lost'
+SEPARATOR = '#' * 60
+
+
+class SudoersBuilder(object):
+    """Collects the sudoers entries of a component, and writes them all at
+    once when it finishes.
+
+    The rendered file is validated once, and then atomically replaces the
+    current one, so sudo never sees a partially written or invalid file.
+    Entries already in the file (e.g. of components skipped by
+    `configure --converge`) are kept, unless `reset` was called; entries
+    written earlier in the same run are always kept.
+    """
+    def __init__(self, path=constants.CLOUDIFY_SUDOERS_FILE):
+        self.path = path
+        self._entries = OrderedDict()
+        self._flushed = OrderedDict()
+        self._reset = False
+        self._lock = threading.Lock()
+        # Held for the whole flush, so concurrent flushes can't drop each
+        # other's entries
+        self._flush_lock = threading.Lock()
+
+    def add(self, entry, description):
+        with self._lock:
+            self._entries[entry] = description
+
+    def reset(self):
+        """Don't keep the entries already in the file when flushing.
+
+        Ignored when converging, as the skipped components wouldn't add
+        their entries again.
+        """
+        if not convergence.enabled:
+            with self._lock:
+                self._reset = True
+
+    @staticmethod
+    def _parse(content):
+        """The (entry, description) pairs in a file written by `render`"""
+        lines = (content or '').splitlines()
+        if not lines or lines[0] != SUDOERS_HEADER:
+            return []
+        entries = []
+        for previous, line in zip(lines, lines[1:]):
+            if previous.startswith('# ') and line \
+                    and not line.startswith('#'):
+                entries.append((line, previous[2:]))
+        return entries
+
+    @staticmethod
+    def render(entries):
+        lines = [SUDOERS_HEADER, '']
+        for entry, description in entries.items():
+            lines += ['# {0}'.format(description), entry, SEPARATOR, '']
+        return '\n'.join(lines)
+
+    def flush(self):
+        """Write the collected entries, if they change the file"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            if not self._entries and not self._reset:
+                return
+            current = read_deployed(self.path)
+            entries = OrderedDict()
+            if self._reset:
+                entries.update(self._flushed)
+            else:
+                entries.update(self._parse(current))
+            entries.update(self._entries)
+            self._flushed.update(self._entries)
+            content = self.render(entries)
+            self._entries.clear()
+            self._reset = False
+        if content == current:
+            logger.debug('{0} is up to date'.format(self.path))
+            return
+
+        logger.debug('Writing {0} sudoers entries to {1}...'.format(
+            len(entries), self.path))
+        # sudo ignores files in sudoers.d whose name contains a dot, so the
+        # new file can't be picked up before it's been validated
+        new_path = join(dirname(self.path), '.{0}.new'.format(
+            basename(self.path)))
+        write(content, new_path)
+        chown('root', 'root', new_path)
+        chmod('440', new_path)
+        valid = sudo(['visudo', '-cf', new_path], ignore_failures=True)
+        if valid.returncode != 0:
+            remove(new_path)
+            raise ValidationError(
+                'Generated sudoers file {0} was invalid: {1}'.format(
+                    self.path, valid.aggr_stderr or valid.aggr_stdout))
+        rename(new_path, self.path)
+
+
+sudoers_builder = SudoersBuilder()
+
 
 def add_entry_to_sudoers(entry, description):
-    # Comment out the description and add a N/L after the entry for visibility
-    description = '# {0}'.format(description)
-    entry = '{0}\n'.format(entry)
-
-    for line in (description, entry, '#' * 60):
-        # `visudo` handles sudoers file. Setting EDITOR to `tee -a` means that
-        # whatever is piped should be appended to the file passed.
-        sudo(['/sbin/visudo', '-f', constants.CLOUDIFY_SUDOERS_FILE],
-             stdin=line, env={'EDITOR': '/bin/tee -a'})
-
-    valid = sudo(
-        ['visudo', '-cf', constants.CLOUDIFY_SUDOERS_FILE],
-        ignore_failures=False,
-    )
-    if valid.returncode != 0:
-        raise ValidationError(
-            "Generated sudoers entry containing \"{entry}\" was "
-            "invalid.".format(entry=entry)
-        )
+    """Add an entry to the sudoers file, when it is next flushed"""
+    sudoers_builder.add(entry, description)
+
+
+def reset():
+    sudoers_builder.reset()
+
+
+def flush():
+    sudoers_builder.flush()
 
 
 def allow_user_to_sudo_command(full_command, description, allow_as='root'):
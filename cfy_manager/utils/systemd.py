@@ -13,12 +13,15 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import threading
+from collections import OrderedDict
 from os.path import exists, join
 
-from retrying import retry
-
-from .files import deploy
+from .files import deploy, render_template
 from .common import sudo, remove, chown
+from .convergence import convergence
+from .retries import RetryPolicy
+from .run_context import current_component
 
 from ..logger import get_logger
 from ..constants import COMPONENTS_DIR, CLOUDIFY_USER, CLOUDIFY_GROUP
@@ -26,11 +29,30 @@ from ..exceptions import ValidationError
 
 logger = get_logger('SystemD')
 
+# systemctl exits with 1 when a job failed, e.g. when a unit timed out while
+# starting; other codes (unknown unit, inactive service) aren't transient
+SYSTEMCTL_RETRY_CODES = [1]
+VERIFY_ALIVE_RETRIES = RetryPolicy(attempts=2, delay=1, backoff=1)
+
 
 class SystemD(object):
+    def __init__(self):
+        # Restarts requested by each component, see `request_restart`
+        self._pending_restarts = {}
+        self._restarted = set()
+        self._restarts_lock = threading.Lock()
+
     @staticmethod
-    def systemctl(action, service='', retries=0, ignore_failure=False):
-        systemctl_cmd = ['systemctl', action]
+    def systemctl(action, service='', retries=0, ignore_failure=False,
+                  options=None):
+        """`retries` is a RetryPolicy, or a number of times to retry.
+
+        `options` are passed to systemctl before the service, e.g. `--now`
+        """
+        if not isinstance(retries, RetryPolicy) and retries:
+            retries = RetryPolicy(attempts=retries,
+                                  retry_on_codes=SYSTEMCTL_RETRY_CODES)
+        systemctl_cmd = ['systemctl', action] + list(options or [])
         if service:
             systemctl_cmd.append(service)
         return sudo(systemctl_cmd, retries=retries,
@@ -47,13 +69,7 @@ class SystemD(object):
 
         """
         sid = 'cloudify-{0}'.format(service_name)
-        env_dst = "/etc/sysconfig/{0}".format(sid)
-        srv_dst = "/usr/lib/systemd/system/{0}.service".format(sid)
-
-        service_dir_name = service_name.replace('-', '_')
-        src_dir = join(COMPONENTS_DIR, service_dir_name, 'config')
-        env_src = join(src_dir, sid)
-        srv_src = join(src_dir, '{0}.service'.format(sid))
+        env_src, env_dst, srv_src, srv_dst = self._get_unit_files(service_name)
 
         if exists(env_src):
             logger.debug('Deploying systemd EnvironmentFile...')
@@ -72,6 +88,29 @@ class SystemD(object):
 
         self.systemctl('daemon-reload')
 
+    @staticmethod
+    def _get_unit_files(service_name):
+        sid = 'cloudify-{0}'.format(service_name)
+        env_dst = "/etc/sysconfig/{0}".format(sid)
+        srv_dst = "/usr/lib/systemd/system/{0}.service".format(sid)
+
+        service_dir_name = service_name.replace('-', '_')
+        src_dir = join(COMPONENTS_DIR, service_dir_name, 'config')
+        env_src = join(src_dir, sid)
+        srv_src = join(src_dir, '{0}.service'.format(sid))
+        return env_src, env_dst, srv_src, srv_dst
+
+    def get_rendered_files(self, service_name):
+        """Return the contents `configure` would deploy for the service,
+        by destination path
+        """
+        env_src, env_dst, srv_src, srv_dst = self._get_unit_files(service_name)
+        rendered = OrderedDict()
+        for src, dst in [(env_src, env_dst), (srv_src, srv_dst)]:
+            if exists(src):
+                rendered[dst] = render_template(src)
+        return rendered
+
     def remove(self, service_name, service_file=True):
         """Stop and disable the service, and then delete its data
         """
@@ -135,6 +174,22 @@ class SystemD(object):
         self.systemctl('stop', full_service_name, retries,
                        ignore_failure=ignore_failure)
 
+    def reload(self, service_name, append_prefix=True, signal=None):
+        """Reload the service's configuration without restarting it.
+
+        :param signal: Send this signal to the service's main process,
+                       instead of running the unit's ExecReload
+        """
+        full_service_name = self._get_full_service_name(service_name,
+                                                        append_prefix)
+        logger.debug('Reloading systemd service {0}...'.format(
+            full_service_name))
+        if signal:
+            sudo(['systemctl', 'kill', '--kill-who=main', '-s', signal,
+                  full_service_name])
+        else:
+            self.systemctl('reload', full_service_name)
+
     def restart(self,
                 service_name,
                 retries=0,
@@ -142,15 +197,84 @@ class SystemD(object):
                 append_prefix=True):
         full_service_name = self._get_full_service_name(service_name,
                                                         append_prefix)
-        self.systemctl('restart', full_service_name, retries,
+        self._restart(full_service_name, 'restart', retries, ignore_failure)
+
+    def restart_once(self, service_name, append_prefix=True):
+        """Restart the service, unless it was already restarted in this run
+        """
+        full_service_name = self._get_full_service_name(service_name,
+                                                        append_prefix)
+        with self._restarts_lock:
+            if full_service_name in self._restarted:
+                logger.debug('{0} was already restarted'.format(
+                    full_service_name))
+                return
+        self._restart(full_service_name, 'restart')
+
+    def request_restart(self,
+                        service_name,
+                        append_prefix=True,
+                        reload=False,
+                        ignore_failure=False):
+        """Restart the service once the current component is done.
+
+        However many times a service is requested to be restarted, it is
+        only restarted once, when the component finishes (or calls
+        `apply_restarts`), and before any of the components that depend on
+        it start. If all the requests allow it, the service is reloaded
+        instead (`systemctl reload-or-restart`).
+        """
+        full_service_name = self._get_full_service_name(service_name,
+                                                        append_prefix)
+        with self._restarts_lock:
+            requests = self._pending_restarts.setdefault(
+                current_component(), OrderedDict())
+            request = requests.setdefault(full_service_name, {
+                'reload': reload,
+                'ignore_failure': ignore_failure
+            })
+            request['reload'] = request['reload'] and reload
+            request['ignore_failure'] = \
+                request['ignore_failure'] and ignore_failure
+
+    def apply_restarts(self):
+        """Restart the services requested by the current component, and
+        make sure they're running
+        """
+        with self._restarts_lock:
+            requests = self._pending_restarts.pop(current_component(), {})
+        for full_service_name, request in requests.items():
+            action = 'reload-or-restart' if request['reload'] else 'restart'
+            self._restart(full_service_name, action,
+                          ignore_failure=request['ignore_failure'])
+            self.verify_alive(full_service_name, append_prefix=False)
+
+    def _restart(self, full_service_name, action, retries=0,
+                 ignore_failure=False):
+        if convergence.enabled and not convergence.has_changes() \
+                and self.is_alive(full_service_name, append_prefix=False):
+            logger.info('Nothing changed for {0}, not restarting it'
+                        .format(full_service_name))
+            return
+        logger.debug('Restarting systemd service {0} ({1})...'.format(
+            full_service_name, action))
+        self.systemctl(action, full_service_name, retries,
                        ignore_failure=ignore_failure)
+        with self._restarts_lock:
+            self._restarted.add(full_service_name)
+
+    def is_enabled(self, service_name, append_prefix=True):
+        service_name = self._get_full_service_name(service_name, append_prefix)
+        result = self.systemctl('is-enabled', service_name,
+                                ignore_failure=True)
+        return result.returncode == 0
 
     def is_alive(self, service_name, append_prefix=True):
         service_name = self._get_full_service_name(service_name, append_prefix)
         result = self.systemctl('status', service_name, ignore_failure=True)
         return result.returncode == 0
 
-    @retry(stop_max_attempt_number=3, wait_fixed=1000)
+    @VERIFY_ALIVE_RETRIES.retry_on(ValidationError)
     def verify_alive(self, service_name, append_prefix=True):
         if self.is_alive(service_name, append_prefix):
             logger.debug('{0} is running'.format(service_name))
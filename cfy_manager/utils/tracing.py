@@ -0,0 +1,144 @@
+#########
+# Copyright (c) 2019 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from ..config import config
+from ..logger import get_logger
+from .run_context import current_component, current_phase
+
+logger = get_logger('Trace')
+
+REDACTED = '********'
+# Config keys whose values are never written to a trace
+SECRET_KEY = re.compile(r'password|secret|token', re.IGNORECASE)
+# Inline secrets, e.g. `-passin pass:xxx` or `PGPASSWORD=xxx`
+INLINE_SECRET = re.compile(
+    r'((?:^|[^a-z])pass:|password[=:]|PASSWORD=)(.+)$', re.IGNORECASE)
+
+
+def _config_secrets(section):
+    for key, value in section.items():
+        if isinstance(value, dict):
+            for secret in _config_secrets(value):
+                yield secret
+        elif SECRET_KEY.search(str(key)) and value \
+                and isinstance(value, basestring):
+            yield value
+
+
+def redact(command):
+    """Return the arguments of `command`, with passwords hidden"""
+    secrets = set(_config_secrets(config))
+    redacted = []
+    for arg in command:
+        arg = str(arg)
+        for secret in secrets:
+            arg = arg.replace(secret, REDACTED)
+        redacted.append(INLINE_SECRET.sub(
+            lambda m: m.group(1) + REDACTED, arg))
+    return redacted
+
+
+class Tracer(object):
+    """Record spans (e.g. every command run) as Chrome trace events.
+
+    The trace can be opened in chrome://tracing or https://ui.perfetto.dev.
+    Each component gets its own track, so it's easy to see which of them
+    the time is spent in.
+    """
+    def __init__(self):
+        self._events = None
+        self._tracks = {}
+        self._path = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._events is not None
+
+    def start(self, path):
+        """Start recording; the trace is written to `path` on `stop`"""
+        with self._lock:
+            self._events = []
+            self._tracks = {}
+            self._path = path
+
+    def _track(self):
+        # Must be called with the lock held
+        name = current_component() or 'cfy_manager'
+        if name not in self._tracks:
+            self._tracks[name] = len(self._tracks)
+            self._events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                'tid': self._tracks[name], 'args': {'name': name},
+            })
+        return self._tracks[name]
+
+    def add_span(self, name, category, start, duration, **args):
+        """Record a span that started at `start` (seconds since epoch)"""
+        if not self.enabled:
+            return
+        args.setdefault('component', current_component())
+        args.setdefault('phase', current_phase())
+        with self._lock:
+            self._events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': int(start * 1e6),
+                'dur': int(duration * 1e6),
+                'pid': os.getpid(),
+                'tid': self._track(),
+                'args': args,
+            })
+
+    @contextmanager
+    def span(self, name, category, **args):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.time() - start, **args)
+
+    def add_command(self, command, start, duration, exit_code,
+                    output_bytes):
+        if not self.enabled:
+            return
+        argv = redact(command)
+        self.add_span(
+            os.path.basename(argv[0]) if argv else '?', 'subprocess',
+            start, duration,
+            argv=argv,
+            exit_code=exit_code,
+            output_bytes=output_bytes,
+        )
+
+    def stop(self):
+        with self._lock:
+            events, self._events = self._events, None
+        if events is None:
+            return
+        with open(self._path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        logger.notice('Trace written to {0}'.format(self._path))
+
+
+tracer = Tracer()
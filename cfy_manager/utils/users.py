@@ -13,6 +13,7 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import threading
 from pwd import getpwnam
 from grp import getgrnam
 
@@ -21,6 +22,10 @@ from ..logger import get_logger
 
 logger = get_logger('Users')
 
+# useradd/groupadd/usermod all lock /etc/passwd and /etc/group, and fail
+# instead of waiting if another one is already holding the lock
+_users_db_lock = threading.Lock()
+
 
 def _user_exists(user):
     logger.debug('Checking whether user {0} exists...'.format(user))
@@ -50,7 +55,11 @@ def create_service_user(user, group, home):
     It will not create the home dir for it and assume that it already exists.
     This user will only be created if it didn't already exist.
     """
+    with _users_db_lock:
+        _create_service_user(user, group, home)
+
 
+def _create_service_user(user, group, home):
     if not _group_exists(group):
         logger.info('Creating group {group}'.format(group=group))
         # --force in groupadd causes it to return true if the group exists.
@@ -68,3 +77,8 @@ def create_service_user(user, group, home):
             '--gid', group,
             user,
         ])
+
+
+def add_user_to_group(user, group):
+    with _users_db_lock:
+        sudo(['usermod', '-aG', group, user])
@@ -25,9 +25,19 @@ mkdir %{buildroot}/opt
 mkdir -p %{buildroot}/usr/bin
 mkdir -p %{buildroot}/etc/cloudify
 mkdir -p %{buildroot}/opt/cloudify
+%if 0%{?CFY_MANAGER_TREE:1}
+mkdir -p %{buildroot}/opt/cloudify/cfy_manager
+%endif
 cp ${RPM_SOURCE_DIR}/config.yaml %{buildroot}/etc/cloudify/config.yaml
 cp ${RPM_SOURCE_DIR}/rpms %{buildroot}/opt/cloudify/sources -Lfr
+# Build with -D "CFY_MANAGER_TREE 1" to ship the tree created by
+# packaging/build_tree (pre-extracted and byte-compiled) instead of the PEX
+%if 0%{?CFY_MANAGER_TREE:1}
+cp -a ${RPM_SOURCE_DIR}/tree/lib %{buildroot}/opt/cloudify/cfy_manager/lib
+cp ${RPM_SOURCE_DIR}/tree/bin/cfy_manager %{buildroot}/usr/bin/cfy_manager
+%else
 cp ${RPM_SOURCE_DIR}/pex/cfy_manager %{buildroot}/usr/bin/cfy_manager
+%endif
 
 
 %post